@@ -1,3 +1,4 @@
+import os
 from flask import Flask, request
 from flask_cors import CORS
 
@@ -5,14 +6,36 @@ from flask_cors import CORS
 from controllers.beverage_controller import BeverageController
 from controllers.order_controller import OrderController
 from controllers.ai_controller import AiController
+from controllers.analytics_controller import AnalyticsController
+from services.catalog_service import get_catalog, start_catalog_watcher
+from views.response import ApiResponse
 
 app = Flask(__name__)
 CORS(app)
+# 请求体大小上限（字节）
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_REQUEST_BYTES", "262144"))
+
+@app.before_request
+def reject_oversized_request():
+    """声明的请求体超过上限时直接返回413，不读取请求体"""
+    content_length = request.content_length
+    if content_length is not None and content_length > app.config["MAX_CONTENT_LENGTH"]:
+        return ApiResponse.error("请求体过大", 413), 413
+
+@app.errorhandler(413)
+def request_entity_too_large(e):
+    return ApiResponse.error("请求体过大", 413), 413
+
+# 预加载商品目录（gunicorn --preload 时在fork前完成，各worker共享）
+get_catalog()
+# 监视目录配置文件，修改后自动热加载
+start_catalog_watcher()
 
 # 初始化控制器
 beverage_controller = BeverageController()
 order_controller = OrderController()
 ai_controller = AiController()
+analytics_controller = AnalyticsController(order_controller.order_service)
 
 # 饮料相关路由
 @app.route("/api/beverages", methods=["GET"])
@@ -23,15 +46,52 @@ def get_beverages():
 def get_condiments():
     return beverage_controller.get_all_condiments()
 
+@app.route("/api/inventory", methods=["GET"])
+def get_inventory():
+    return beverage_controller.get_inventory()
+
+# 管理相关路由
+@app.route("/api/admin/catalog/reload", methods=["POST"])
+def reload_catalog():
+    return beverage_controller.reload_catalog()
+
+@app.route("/api/admin/inventory/restock", methods=["POST"])
+def restock_inventory():
+    return beverage_controller.restock_inventory()
+
+@app.route("/api/admin/analytics/rebuild", methods=["POST"])
+def rebuild_analytics():
+    return analytics_controller.rebuild()
+
+@app.route("/api/admin/ai/metrics", methods=["GET"])
+def get_ai_metrics():
+    return ai_controller.get_metrics()
+
 # 订单相关路由
 @app.route("/api/orders", methods=["POST"])
 def place_order():
     return order_controller.place_order()
 
+@app.route("/api/quote", methods=["POST"])
+def quote():
+    return order_controller.quote()
+
+@app.route("/api/orders/batch", methods=["POST"])
+def place_orders_batch():
+    return order_controller.place_orders_batch()
+
 @app.route("/api/orders/history", methods=["GET"])
 def get_order_history():
     return order_controller.get_order_history()
 
+@app.route("/api/orders/stream", methods=["GET"])
+def stream_orders():
+    return order_controller.stream_orders()
+
+@app.route("/api/orders/next", methods=["GET"])
+def claim_next_order():
+    return order_controller.claim_next_order()
+
 @app.route("/api/orders/<order_id>", methods=["GET"])
 def get_order(order_id: str):
     return order_controller.get_order(order_id)
@@ -41,7 +101,16 @@ def update_order_status(order_id: str):
     data = request.get_json()
     if not data or "status" not in data:
         return {"success": False, "error": "无效的状态更新请求"}
-    return order_controller.update_order_status(order_id, data["status"])
+    return order_controller.update_order_status(order_id, data["status"], data.get("expected_status"))
+
+# 统计相关路由
+@app.route("/api/analytics/summary", methods=["GET"])
+def get_analytics_summary():
+    return analytics_controller.get_summary()
+
+@app.route("/api/analytics/reprice", methods=["POST"])
+def simulate_pricing():
+    return analytics_controller.simulate_pricing()
 
 # AI相关路由
 @app.route("/api/models/available", methods=["GET"])
@@ -0,0 +1,183 @@
+"""ASGI入口
+
+AI对话和推荐接口以及订单事件流在事件循环上异步处理，等待大模型响应或订单事件期间不占用线程，
+大量进行中的请求和长连接共享一个事件循环；其余接口仍由Flask应用处理，在独立的线程池中运行。
+
+运行: uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Mapping, Optional, Tuple, Union
+from urllib.parse import parse_qsl
+
+from asgiref.sync import SyncToAsync
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import app, ai_controller, order_controller
+from services.ai_service import get_model_providers
+from views.response import ApiResponse, EventStream
+
+# 异步路由处理函数：接收解析后的JSON请求体、查询参数和请求头（名称小写），
+# 返回响应字典、(响应字典, 状态码)或SSE事件流
+AsyncHandler = Callable[[Optional[Dict[str, Any]], Mapping[str, str], Mapping[str, str]],
+                        Awaitable[Union[Dict[str, Any], Tuple[Dict[str, Any], int], AsyncIterator[bytes]]]]
+
+class _PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """在指定线程池中运行WSGI应用
+
+    asgiref默认把所有WSGI调用放到同一个线程执行，Flask请求会被串行处理。
+    """
+
+    def __init__(self, wsgi_application, executor: ThreadPoolExecutor):
+        super().__init__(wsgi_application)
+        self.run_wsgi_app = SyncToAsync(
+            functools.partial(WsgiToAsgiInstance.run_wsgi_app.__wrapped__, self),
+            thread_sensitive=False,
+            executor=executor
+        )
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """将WSGI应用包装为ASGI应用，请求在线程池中并发处理"""
+
+    def __init__(self, wsgi_application, max_workers: int):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope, receive, send):
+        await _PooledWsgiToAsgiInstance(self.wsgi_application, self.executor)(scope, receive, send)
+
+class Application:
+    """ASGI应用：匹配异步路由的请求在事件循环上处理，其余请求转交Flask"""
+
+    def __init__(self, wsgi_app, routes: Dict[Tuple[str, str], AsyncHandler],
+                 max_body: int, wsgi_threads: int):
+        self.wsgi = PooledWsgiToAsgi(wsgi_app, wsgi_threads)
+        self.routes = routes
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        handler = self.routes.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if handler is None:
+            await self.wsgi(scope, receive, send)
+            return
+        await self._handle(handler, scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for provider in get_model_providers().values():
+                    await provider.aclose()
+                self.wsgi.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle(self, handler: AsyncHandler, scope, receive, send):
+        headers = {name.decode("latin1").lower(): value.decode("latin1") for name, value in scope["headers"]}
+        content_length = headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body:
+            await self._send_json(send, ApiResponse.error("请求体过大", 413), 413)
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if len(body) > self.max_body:
+                await self._send_json(send, ApiResponse.error("请求体过大", 413), 413)
+                return
+            if not message.get("more_body"):
+                break
+
+        # 与Flask的get_json一致：只解析JSON类型的请求体
+        data = None
+        if "json" in headers.get("content-type", ""):
+            try:
+                data = json.loads(body)
+            except ValueError:
+                data = None
+        params = dict(parse_qsl(scope.get("query_string", b"").decode("latin1")))
+        result = await handler(data, params, headers)
+        if isinstance(result, dict):
+            await self._send_json(send, result)
+        elif isinstance(result, tuple):
+            await self._send_json(send, *result)
+        else:
+            await self._send_stream(receive, send, result)
+
+    async def _send_stream(self, receive, send, events: AsyncIterator[bytes]):
+        """逐个发送SSE事件；等待下一个事件时同时监听断开，客户端断开后立即关闭事件流"""
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", EventStream.CONTENT_TYPE.encode("latin1")),
+                (b"access-control-allow-origin", b"*"),
+                *((name.lower().encode("latin1"), value.encode("latin1"))
+                  for name, value in EventStream.HEADERS.items())
+            ]
+        })
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(events.__anext__())
+                await asyncio.wait((next_chunk, disconnected), return_when=asyncio.FIRST_COMPLETED)
+                if not next_chunk.done():
+                    # 取消等待中的生成器，使其执行清理（取消订阅、关闭上游连接）
+                    next_chunk.cancel()
+                    with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                        await next_chunk
+                    return
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                if disconnected.done():
+                    return
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            await events.aclose()
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def _send_json(self, send, payload: Dict[str, Any], status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin1")),
+                (b"access-control-allow-origin", b"*")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+application = Application(
+    app,
+    routes={
+        ("POST", "/api/chat"): ai_controller.achat,
+        ("POST", "/api/ai-recommendation"): ai_controller.aget_ai_recommendation,
+        # 事件流长连接不占用Flask线程池，断开后立即取消订阅
+        ("GET", "/api/orders/stream"): order_controller.astream_orders
+    },
+    max_body=app.config["MAX_CONTENT_LENGTH"],
+    # 处理Flask接口的线程数
+    wsgi_threads=int(os.environ.get("WSGI_THREADS", "32"))
+)
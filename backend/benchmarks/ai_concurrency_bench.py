@@ -0,0 +1,159 @@
+"""AI对话并发压测：同步worker（gunicorn）与ASGI入口（uvicorn）对比
+
+用法（在backend目录下运行）:
+    python benchmarks/ai_concurrency_bench.py --chats 200 --latency 1.0 --workers 4
+    python benchmarks/ai_concurrency_bench.py --stream    # 流式对话（?stream=1），统计首字节时间
+    python benchmarks/ai_concurrency_bench.py --identical # 所有请求消息相同，统计合并的上游调用
+
+启动本地模拟大模型服务（benchmarks/fake_llm_server.py），分别以gunicorn同步worker和
+uvicorn运行后端，同时发出 --chats 个AI聊天请求，期间持续请求报价接口，
+输出聊天总耗时、吞吐量、首个文本片段的到达时间（TTFT）和报价接口的延迟分位数。
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 压测时后端使用的管理令牌，用于读取AI请求统计
+ADMIN_TOKEN = "bench"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"端口 {port} 未就绪")
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+async def run_load(port: int, chats: int, stream: bool, identical: bool) -> Dict[str, float]:
+    base = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=chats + 10, max_keepalive_connections=chats + 10)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        async def chat(i: int) -> Tuple[bool, float]:
+            """返回是否成功和首个文本片段的到达时间"""
+            payload = {"message": "推荐一款饮料" if identical else f"推荐一款饮料 {i}", "use_ai": True}
+            started = time.perf_counter()
+            if not stream:
+                response = await client.post("/api/chat", json=payload)
+                info = response.json().get("data", {}).get("model_info") or {}
+                return "error" not in info, time.perf_counter() - started
+
+            first_token = None
+            info = {}
+            async with client.stream("POST", "/api/chat?stream=1", json=payload) as response:
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        if event == "done":
+                            info = json.loads(line[5:]).get("model_info") or {}
+            return "error" not in info, first_token or 0.0
+
+        quote_latencies: List[float] = []
+        in_flight = True
+
+        async def probe_quotes():
+            # 聊天请求进行期间持续请求报价，测量普通接口是否被阻塞
+            while in_flight:
+                started = time.perf_counter()
+                await client.post("/api/quote", json={"beverage": "latte", "condiments": [{"id": "milk", "quantity": 1}]})
+                quote_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        prober = asyncio.create_task(probe_quotes())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(chat(i) for i in range(chats)))
+        elapsed = time.perf_counter() - started
+        in_flight = False
+        await prober
+        # 多进程部署时只是响应该请求的worker的统计
+        metrics = (await client.get("/api/admin/ai/metrics", headers={"X-Admin-Token": ADMIN_TOKEN})).json()["data"]["chat"]
+
+    ttfts = [ttft for _, ttft in results]
+    return {
+        "elapsed": elapsed,
+        "ok": sum(ok for ok, _ in results),
+        "ttft_p50": percentile(ttfts, 0.5),
+        "ttft_p95": percentile(ttfts, 0.95),
+        "quote_p50": percentile(quote_latencies, 0.5),
+        "quote_p95": percentile(quote_latencies, 0.95),
+        "quote_max": max(quote_latencies, default=0.0),
+        "coalesced": metrics["coalesced"]
+    }
+
+def start_backend(mode: str, port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    if mode == "sync":
+        command = [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "app:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "asgi:application", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def main():
+    parser = argparse.ArgumentParser(description="AI对话并发压测")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0, help="模拟大模型的响应时间（秒）")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn同步worker数")
+    parser.add_argument("--stream", action="store_true", help="使用流式对话")
+    parser.add_argument("--identical", action="store_true", help="所有请求使用相同的消息")
+    args = parser.parse_args()
+
+    llm_port = free_port()
+    llm = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_llm_server.py"),
+         "--port", str(llm_port), "--latency", str(args.latency)],
+        stdout=subprocess.DEVNULL
+    )
+    env = dict(
+        os.environ,
+        GPTPROVIDER_API_KEY="fake",
+        GPTPROVIDER_BASE_URL=f"http://127.0.0.1:{llm_port}/v1/chat/completions",
+        DEEPSEEKPROVIDER_API_KEY="",
+        ORDER_STORE="memory",
+        CATALOG_RELOAD_INTERVAL="0",
+        ADMIN_TOKEN=ADMIN_TOKEN
+    )
+    try:
+        wait_for_port(llm_port)
+        print(f"chats={args.chats} latency={args.latency}s workers={args.workers} stream={args.stream} identical={args.identical}")
+        for mode, label in (("sync", f"gunicorn sync x{args.workers}"), ("asgi", "uvicorn asgi")):
+            port = free_port()
+            backend = start_backend(mode, port, args.workers, env)
+            try:
+                wait_for_port(port)
+                result = asyncio.run(run_load(port, args.chats, args.stream, args.identical))
+            finally:
+                backend.terminate()
+                backend.wait()
+            print(f"  {label:<20} chats {result['elapsed']:7.2f}s  {args.chats / result['elapsed']:7.1f} req/s"
+                  f"  ok={int(result['ok'])}"
+                  f"  ttft p50={result['ttft_p50'] * 1000:7.1f}ms p95={result['ttft_p95'] * 1000:7.1f}ms"
+                  f"  quote p50={result['quote_p50'] * 1000:7.1f}ms p95={result['quote_p95'] * 1000:7.1f}ms"
+                  f" max={result['quote_max'] * 1000:7.1f}ms  coalesced={int(result['coalesced'])}")
+    finally:
+        llm.terminate()
+        llm.wait()
+
+if __name__ == "__main__":
+    main()
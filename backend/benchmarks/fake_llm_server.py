@@ -0,0 +1,120 @@
+"""本地模拟大模型服务（OpenAI兼容的对话补全接口）
+
+用法（在backend目录下运行）:
+    python benchmarks/fake_llm_server.py --port 8900 --latency 1.0
+
+每个请求等待 --latency 秒后返回固定回复，用于压测和本地调试，不消耗真实的API额度。
+请求带 "stream": true 时以SSE分块返回，--latency 平均分摊到 --chunks 个分块上。
+将 GPTPROVIDER_BASE_URL 指向 http://127.0.0.1:8900/v1/chat/completions 并设置任意API密钥即可使用。
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+# 回复内容为推荐JSON，推荐和聊天接口都能正常解析
+REPLY = json.dumps({
+    "beverage": "latte",
+    "beverageName": "拿铁咖啡",
+    "condiments": [{"id": "vanilla", "name": "香草", "quantity": 1}],
+    "reason": "口感香浓",
+    "explanation": "模拟服务的固定回复"
+}, ensure_ascii=False)
+
+def completion(model: str) -> bytes:
+    return json.dumps({
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}]
+    }, ensure_ascii=False).encode("utf-8")
+
+def stream_chunks(model: str, chunks: int) -> List[bytes]:
+    """将回复切分为流式响应的SSE分块"""
+    size = max(1, -(-len(REPLY) // chunks))
+    events = []
+    for i in range(0, len(REPLY), size):
+        events.append(json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": REPLY[i:i + size]}, "finish_reason": None}]
+        }, ensure_ascii=False))
+    events.append("[DONE]")
+    return [f"data: {event}\n\n".encode("utf-8") for event in events]
+
+async def write_stream(writer: asyncio.StreamWriter, model: str, latency: float, chunks: int):
+    """以分块传输编码逐段发送SSE"""
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+    events = stream_chunks(model, chunks)
+    for event in events:
+        await asyncio.sleep(latency / len(events))
+        writer.write(f"{len(event):x}\r\n".encode("latin1") + event + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+async def read_request(reader: asyncio.StreamReader):
+    """读取一个HTTP/1.1请求，连接关闭时抛出IncompleteReadError"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    request_line, *header_lines = head.decode("latin1").split("\r\n")
+    headers = {}
+    for line in header_lines:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", "0")))
+    method, path, _ = request_line.split(" ", 2)
+    return method, path, headers, body
+
+def make_handler(latency: float, chunks: int):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # 长连接：同一连接上依次处理多个请求
+            while True:
+                method, path, headers, body = await read_request(reader)
+                if method == "POST" and path.endswith("/chat/completions"):
+                    request = json.loads(body or b"{}")
+                    model = request.get("model", "fake")
+                    if request.get("stream"):
+                        await write_stream(writer, model, latency, chunks)
+                        continue
+                    await asyncio.sleep(latency)
+                    status, payload = "200 OK", completion(model)
+                else:
+                    status, payload = "404 Not Found", b'{"error": "not found"}'
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode("latin1") + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+async def serve(host: str, port: int, latency: float, chunks: int):
+    server = await asyncio.start_server(make_handler(latency, chunks), host, port, backlog=1024)
+    print(f"fake LLM listening on http://{host}:{port}/v1/chat/completions latency={latency}s", flush=True)
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--chunks", type=int, default=20, help="流式响应的分块数")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency, args.chunks))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""订单存储多线程压测
+
+用法（在backend目录下运行）:
+    python benchmarks/order_store_bench.py --store memory --threads 1,2,4,8
+    python benchmarks/order_store_bench.py --store sqlite --db /tmp/bench_orders.db
+
+每个线程循环执行：下单、比较并交换状态（pending -> processing）、读取一页历史订单，
+结束后校验订单数和状态转换次数，输出各线程数下的吞吐量。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.order import OrderStatus
+from repositories.inventory_repository import InMemoryInventoryRepository
+from repositories.order_repository import InMemoryOrderRepository
+from repositories.sqlite_order_repository import SqliteOrderRepository
+from services.inventory_service import InventoryService
+from services.order_service import OrderService
+
+def create_service(store: str, db_path: str) -> OrderService:
+    # 不登记任何库存，压测不受库存限制
+    inventory = InventoryService(InMemoryInventoryRepository({}))
+    if store == "sqlite":
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        return OrderService(SqliteOrderRepository(db_path), inventory)
+    return OrderService(InMemoryOrderRepository(), inventory)
+
+def worker(service: OrderService, ops: int, barrier: threading.Barrier, counters: list, slot: int):
+    barrier.wait()
+    created = transitions = 0
+    for i in range(ops):
+        order = service.create_order("latte", [{"id": "milk", "quantity": 1}, {"id": "sugar", "quantity": 2}])
+        created += 1
+        if service.update_order_status(order.id, OrderStatus.PROCESSING, OrderStatus.PENDING):
+            transitions += 1
+        # 重复交换必须失败
+        if service.update_order_status(order.id, OrderStatus.PROCESSING, OrderStatus.PENDING):
+            raise AssertionError("比较并交换重复成功")
+        if i % 10 == 0:
+            service.get_order_history(limit=20)
+    counters[slot] = (created, transitions)
+
+def run(store: str, db_path: str, threads: int, ops: int) -> float:
+    service = create_service(store, db_path)
+    barrier = threading.Barrier(threads + 1)
+    counters = [None] * threads
+    pool = [threading.Thread(target=worker, args=(service, ops, barrier, counters, i)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    created = sum(c[0] for c in counters)
+    transitions = sum(c[1] for c in counters)
+    stored = len(service.repository.list_all())
+    if not (created == transitions == stored == threads * ops):
+        raise AssertionError(f"数据不一致: created={created} transitions={transitions} stored={stored}")
+    service.repository.close()
+    return threads * ops / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="订单存储多线程压测")
+    parser.add_argument("--store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_orders.db"))
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--ops", type=int, default=2000, help="每个线程的下单次数")
+    args = parser.parse_args()
+
+    baseline = None
+    for threads in [int(n) for n in args.threads.split(",")]:
+        throughput = run(args.store, args.db, threads, args.ops)
+        baseline = baseline or throughput
+        print(f"{args.store:>6} threads={threads:<3} {throughput:10.0f} orders/s  x{throughput / baseline:.2f}")
+
+if __name__ == "__main__":
+    main()
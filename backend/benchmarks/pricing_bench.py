@@ -0,0 +1,84 @@
+"""调价模拟压测：逐单Python循环与向量化计价对比
+
+用法（在backend目录下运行）:
+    python benchmarks/pricing_bench.py --orders 300000 --scenarios 10
+
+随机生成历史订单，分别用逐单循环和PricingEngine计算多组调价方案的营收，
+校验结果一致并输出耗时。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.order import Order, compose_order_line
+from services.catalog_service import get_catalog
+from services.pricing_engine import PricingEngine
+
+def generate_orders(count: int):
+    catalog = get_catalog()
+    beverages = list(catalog.beverages.values())
+    condiments = list(catalog.condiments.values())
+    now = datetime.now()
+    return [
+        Order(str(i), compose_order_line(
+            random.choice(beverages),
+            [(c, random.randint(1, 3)) for c in random.sample(condiments, random.randint(0, 3))]
+        ), created_at=now)
+        for i in range(count)
+    ]
+
+def generate_scenarios(count: int):
+    catalog = get_catalog()
+    return [
+        ({b.id: round(b.price * random.uniform(0.8, 1.2), 1) for b in random.sample(list(catalog.beverages.values()), 3)},
+         {c.id: round(c.price * random.uniform(0.5, 1.5), 1) for c in random.sample(list(catalog.condiments.values()), 2)})
+        for _ in range(count)
+    ]
+
+def loop_revenue(orders, beverage_prices, condiment_prices) -> float:
+    total = 0.0
+    for order in orders:
+        line = order.line
+        price = beverage_prices.get(line.beverage.id, line.beverage.price)
+        for condiment, quantity in line.condiments:
+            price += condiment_prices.get(condiment.id, condiment.price) * quantity
+        total += price
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="调价模拟压测")
+    parser.add_argument("--orders", type=int, default=300000)
+    parser.add_argument("--scenarios", type=int, default=10)
+    args = parser.parse_args()
+
+    orders = generate_orders(args.orders)
+    scenarios = generate_scenarios(args.scenarios)
+
+    started = time.perf_counter()
+    expected = [loop_revenue(orders, b, c) for b, c in scenarios]
+    loop_elapsed = time.perf_counter() - started
+
+    engine = PricingEngine(get_catalog())
+    started = time.perf_counter()
+    encoded = engine.encode(orders)
+    encode_elapsed = time.perf_counter() - started
+    result = engine.what_if(encoded, scenarios)
+    vector_elapsed = time.perf_counter() - started
+
+    for value, scenario in zip(expected, result["scenarios"]):
+        if abs(round(value, 2) - scenario["projected_revenue"]) > 0.01:
+            raise AssertionError(f"结果不一致: {value} != {scenario['projected_revenue']}")
+    print(f"orders={args.orders} scenarios={args.scenarios}")
+    print(f"  python loop  {loop_elapsed:8.3f}s")
+    replay_elapsed = vector_elapsed - encode_elapsed
+    print(f"  vectorized   {vector_elapsed:8.3f}s  x{loop_elapsed / vector_elapsed:.1f}")
+    print(f"    encode     {encode_elapsed:8.3f}s")
+    print(f"    replay     {replay_elapsed:8.3f}s  x{loop_elapsed / replay_elapsed:.1f}  (编码已缓存时)")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
-from flask import request
-from typing import Dict, Any
-from views.response import ApiResponse
+from flask import Response, request
+from typing import AsyncIterator, Dict, Any, Mapping, Optional, Tuple, Union
+from views.auth import require_admin_token
+from views.response import ApiResponse, EventStream
 from services.ai_service import AiRecommendationService, BeverageChatbot
 
 class AiController:
-    """AI控制器"""
+    """AI控制器
+    
+    同步方法用于Flask路由；a开头的异步方法接收已解析的请求数据和查询参数，供ASGI入口在事件循环上调用。
+    """
     
     def __init__(self):
         self.recommendation_service = AiRecommendationService()
@@ -20,6 +24,34 @@ class AiController:
         except Exception as e:
             return ApiResponse.error(str(e))
     
+    @require_admin_token
+    def get_metrics(self) -> Dict[str, Any]:
+        """AI请求统计：合并的并发请求数和推荐缓存命中情况（管理接口）"""
+        try:
+            cache = self.recommendation_service.cache
+            return ApiResponse.success(data={
+                "recommendation": {
+                    **self.recommendation_service.flight_stats(),
+                    "cache": cache.stats() if cache is not None else None
+                },
+                "chat": self.chatbot.flight_stats()
+            })
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    def _recommendation_args(self, data: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[str], Optional[str]]:
+        """解析推荐请求：喜好、提供商、模型、代码模板"""
+        return data.get("preference", ""), data.get("provider"), data.get("model"), data.get("template")
+    
+    def _chat_args(self, data: Dict[str, Any]) -> Tuple[str, bool, Optional[str], Optional[str]]:
+        """解析聊天请求：消息、是否使用AI、提供商、模型"""
+        return data.get("message", ""), data.get("use_ai", False), data.get("provider"), data.get("model")
+    
+    @staticmethod
+    def _wants_stream(params: Mapping[str, str]) -> bool:
+        """查询参数stream=1时以SSE流式返回"""
+        return params.get("stream", "").lower() in ("1", "true")
+    
     def get_ai_recommendation(self) -> Dict[str, Any]:
         """获取AI推荐"""
         try:
@@ -27,30 +59,39 @@ class AiController:
             if not data:
                 return ApiResponse.error("无效的请求数据")
             
-            preference = data.get("preference", "")
-            provider = data.get("provider")
-            model = data.get("model")
-            template = data.get("template")
+            result = self.recommendation_service.get_ai_recommendation(*self._recommendation_args(data))
+            
+            return ApiResponse.success(data=result)
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    async def aget_ai_recommendation(self, data: Optional[Dict[str, Any]],
+                                     params: Optional[Mapping[str, str]] = None,
+                                     headers: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+        """异步获取AI推荐"""
+        try:
+            if not data:
+                return ApiResponse.error("无效的请求数据")
             
-            result = self.recommendation_service.get_ai_recommendation(
-                preference, provider, model, template
-            )
+            result = await self.recommendation_service.aget_ai_recommendation(*self._recommendation_args(data))
             
             return ApiResponse.success(data=result)
         except Exception as e:
             return ApiResponse.error(str(e))
     
-    def chat(self) -> Dict[str, Any]:
-        """聊天对话"""
+    def chat(self) -> Union[Dict[str, Any], Response]:
+        """聊天对话，stream=1时以SSE逐段返回回复"""
         try:
             data = request.get_json()
             if not data:
                 return ApiResponse.error("无效的请求数据")
             
-            message = data.get("message", "")
-            use_ai = data.get("use_ai", False)
-            provider = data.get("provider")
-            model = data.get("model")
+            message, use_ai, provider, model = self._chat_args(data)
+            
+            if self._wants_stream(request.args):
+                events = (self.chatbot.stream_ai_response(message, provider, model) if use_ai
+                          else self.chatbot.stream_reply(message))
+                return EventStream.make_response(events)
             
             if use_ai:
                 result = self.chatbot.get_ai_response(message, provider, model)
@@ -59,4 +100,34 @@ class AiController:
             
             return ApiResponse.success(data=result)
         except Exception as e:
-            return ApiResponse.error(str(e)) 
\ No newline at end of file
+            return ApiResponse.error(str(e))
+    
+    async def achat(self, data: Optional[Dict[str, Any]], params: Optional[Mapping[str, str]] = None,
+                    headers: Optional[Mapping[str, str]] = None) -> Union[Dict[str, Any], AsyncIterator[bytes]]:
+        """异步聊天对话，stream=1时返回SSE编码的事件流"""
+        try:
+            if not data:
+                return ApiResponse.error("无效的请求数据")
+            
+            message, use_ai, provider, model = self._chat_args(data)
+            
+            if self._wants_stream(params or {}):
+                return self._aencode_events(message, use_ai, provider, model)
+            
+            if use_ai:
+                result = await self.chatbot.aget_ai_response(message, provider, model)
+            else:
+                result = {"content": self.chatbot.get_response(message)}
+            
+            return ApiResponse.success(data=result)
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    async def _aencode_events(self, message: str, use_ai: bool, provider: Optional[str],
+                              model: Optional[str]) -> AsyncIterator[bytes]:
+        if use_ai:
+            async for event, data in self.chatbot.astream_ai_response(message, provider, model):
+                yield EventStream.encode(event, data)
+        else:
+            for event, data in self.chatbot.stream_reply(message):
+                yield EventStream.encode(event, data) 
\ No newline at end of file
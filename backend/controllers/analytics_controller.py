@@ -0,0 +1,82 @@
+from typing import Dict, Any
+from flask import request
+from services.order_service import OrderService
+from services.pricing_engine import PriceScenario
+from utils.helpers import parse_datetime
+from views.auth import require_admin_token
+from views.response import ApiResponse
+
+class AnalyticsController:
+    """销售统计控制器"""
+    
+    # 热销饮料榜单长度上限
+    MAX_TOP = 50
+    # 单次调价模拟的最大方案数
+    MAX_SCENARIOS = 20
+    
+    def __init__(self, order_service: OrderService):
+        # 与订单控制器共用同一个订单服务，统计随下单增量更新
+        self.order_service = order_service
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """按小时或天获取销售汇总"""
+        try:
+            args = request.args
+            try:
+                since = parse_datetime(args.get("since"))
+                until = parse_datetime(args.get("until"))
+                top = int(args.get("top", 5))
+            except ValueError:
+                return ApiResponse.bad_request("无效的时间或榜单参数")
+            if top < 1 or top > self.MAX_TOP:
+                return ApiResponse.bad_request(f"top 必须在 1 到 {self.MAX_TOP} 之间")
+            
+            granularity = args.get("granularity", "hour")
+            if granularity not in self.order_service.analytics.GRANULARITIES:
+                return ApiResponse.bad_request("granularity 只能是 hour 或 day")
+            
+            return ApiResponse.success(data=self.order_service.analytics.summary(granularity, since, until, top))
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    @require_admin_token
+    def rebuild(self) -> Dict[str, Any]:
+        """从订单存储和归档重建销售统计（管理接口）"""
+        try:
+            return ApiResponse.success(data={"orders": self.order_service.rebuild_analytics()})
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    @require_admin_token
+    def simulate_pricing(self) -> Dict[str, Any]:
+        """调价模拟：按一组或多组新单价回放历史订单（管理接口）"""
+        try:
+            data = request.get_json()
+            if not isinstance(data, dict):
+                return ApiResponse.error("无效的请求数据")
+            
+            entries = data.get("scenarios") or [data]
+            if not isinstance(entries, list) or len(entries) > self.MAX_SCENARIOS:
+                return ApiResponse.bad_request(f"scenarios 最多 {self.MAX_SCENARIOS} 组")
+            try:
+                since = parse_datetime(data.get("since"))
+                until = parse_datetime(data.get("until"))
+                scenarios = [self._parse_scenario(entry) for entry in entries]
+            except (AttributeError, TypeError, ValueError):
+                return ApiResponse.bad_request("无效的时间或单价参数")
+            
+            result = self.order_service.simulate_pricing(
+                scenarios, since, until, bool(data.get("use_current_prices"))
+            )
+            return ApiResponse.success(data=result)
+        except ValueError as e:
+            return ApiResponse.bad_request(str(e))
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    @staticmethod
+    def _parse_scenario(entry: Dict[str, Any]) -> PriceScenario:
+        """解析一组调价：{"beverages": {ID: 单价}, "condiments": {ID: 单价}}"""
+        beverages = entry.get("beverages") or {}
+        condiments = entry.get("condiments") or {}
+        return ({k: float(v) for k, v in beverages.items()}, {k: float(v) for k, v in condiments.items()})
\ No newline at end of file
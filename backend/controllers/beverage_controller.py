@@ -1,37 +1,50 @@
-import json
-import os
-from typing import Dict, Any
-from flask import jsonify
+from typing import Dict, Any, Mapping, Tuple, Union
+from flask import request, Response
 from models.beverage import Beverage, Condiment
-from views.response import ApiResponse
+from services.catalog_service import Catalog, get_catalog, reload_catalog
+from services.inventory_service import get_inventory
+from views.auth import require_admin_token
+from views.response import ApiResponse, CachedJsonBody
 
 class BeverageController:
     """饮料控制器"""
     
     def __init__(self):
-        # 获取当前文件所在目录
-        current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        
-        # 加载饮料和配料数据
-        with open(os.path.join(current_dir, "config/beverages.json"), "r", encoding="utf-8") as f:
-            self.beverages = {k: Beverage.from_dict(v) for k, v in json.load(f).items()}
-            
-        with open(os.path.join(current_dir, "config/condiments.json"), "r", encoding="utf-8") as f:
-            self.condiments = {k: Condiment.from_dict(v) for k, v in json.load(f).items()}
+        # 预编码的目录响应体，按目录快照缓存
+        self._cached_bodies: Dict[str, Tuple[Catalog, CachedJsonBody]] = {}
+    
+    @property
+    def beverages(self) -> Mapping[str, Beverage]:
+        """共享目录中的饮料"""
+        return get_catalog().beverages
+    
+    @property
+    def condiments(self) -> Mapping[str, Condiment]:
+        """共享目录中的配料"""
+        return get_catalog().condiments
     
-    def get_all_beverages(self) -> Dict[str, Any]:
+    def _get_cached_body(self, name: str) -> CachedJsonBody:
+        """获取目录的预编码响应体，目录快照变化时重新生成"""
+        catalog = get_catalog()
+        cached = self._cached_bodies.get(name)
+        if cached is None or cached[0] is not catalog:
+            items = getattr(catalog, name)
+            body = CachedJsonBody(ApiResponse.success(data={k: v.to_dict() for k, v in items.items()}))
+            cached = (catalog, body)
+            self._cached_bodies[name] = cached
+        return cached[1]
+    
+    def get_all_beverages(self) -> Union[Response, Dict[str, Any]]:
         """获取所有饮料"""
         try:
-            beverages_dict = {k: v.to_dict() for k, v in self.beverages.items()}
-            return ApiResponse.success(data=beverages_dict)
+            return self._get_cached_body("beverages").make_response(request)
         except Exception as e:
             return ApiResponse.error(str(e))
     
-    def get_all_condiments(self) -> Dict[str, Any]:
+    def get_all_condiments(self) -> Union[Response, Dict[str, Any]]:
         """获取所有配料"""
         try:
-            condiments_dict = {k: v.to_dict() for k, v in self.condiments.items()}
-            return ApiResponse.success(data=condiments_dict)
+            return self._get_cached_body("condiments").make_response(request)
         except Exception as e:
             return ApiResponse.error(str(e))
     
@@ -51,4 +64,46 @@ class BeverageController:
                 return ApiResponse.error("配料不存在")
             return ApiResponse.success(data=self.condiments[condiment_id].to_dict())
         except Exception as e:
-            return ApiResponse.error(str(e)) 
\ No newline at end of file
+            return ApiResponse.error(str(e))
+    
+    @require_admin_token
+    def reload_catalog(self) -> Dict[str, Any]:
+        """重新加载商品目录（管理接口）"""
+        try:
+            catalog = reload_catalog()
+            return ApiResponse.success(data={
+                "version": catalog.version,
+                "beverages": len(catalog.beverages),
+                "condiments": len(catalog.condiments)
+            })
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    def get_inventory(self) -> Dict[str, Any]:
+        """获取库存和可售状态"""
+        try:
+            return ApiResponse.success(data=get_inventory().get_availability())
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    @require_admin_token
+    def restock_inventory(self) -> Dict[str, Any]:
+        """补充库存（管理接口）"""
+        try:
+            data = request.get_json()
+            if not data:
+                return ApiResponse.error("无效的请求数据")
+            
+            kind = data.get("type", "beverage")
+            item_id = data.get("id")
+            if not item_id:
+                return ApiResponse.error("未指定商品")
+            catalog = get_catalog()
+            items = catalog.beverages if kind == "beverage" else catalog.condiments
+            if item_id not in items:
+                return ApiResponse.not_found("商品不存在")
+            
+            stock = get_inventory().restock(kind, item_id, int(data.get("quantity", 0)))
+            return ApiResponse.success(data={"type": kind, "id": item_id, "stock": stock})
+        except Exception as e:
+            return ApiResponse.error(str(e))
\ No newline at end of file
@@ -1,42 +1,159 @@
-from typing import Dict, Any
+import asyncio
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, Any, Mapping, Optional, Tuple, Union
 from flask import request
 from models.order import OrderStatus
-from services.order_service import OrderService
-from views.response import ApiResponse
+from services.catalog_service import Catalog, get_catalog
+from services.inventory_service import OutOfStockError
+from services.order_events import Subscription, TooManySubscribersError
+from services.order_service import IdempotencyConflictError, OrderService
+from utils.validators import OrderRequest, OrderSchema, ValidationError
+from views.response import ApiResponse, EventStream
 
 class OrderController:
     """订单控制器"""
     
+    # 历史订单分页大小
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+    # 批量下单的最大订单数
+    MAX_BATCH_SIZE = 100
+    # 幂等键最大长度
+    MAX_IDEMPOTENCY_KEY_LENGTH = 255
+    # 事件流心跳间隔（秒）
+    STREAM_HEARTBEAT = 15
+    
     def __init__(self):
         self.order_service = OrderService()
+        # 下单请求的份数上限（每种配料）和配料种数上限
+        self.max_condiment_quantity = int(os.environ.get("ORDER_MAX_CONDIMENT_QUANTITY", "10"))
+        self.max_condiments = int(os.environ.get("ORDER_MAX_CONDIMENTS", "10"))
+        # 下单请求结构，按目录快照构建
+        self._schema: Optional[Tuple[Catalog, OrderSchema]] = None
+        self._get_order_schema()
+    
+    def _get_order_schema(self) -> OrderSchema:
+        """获取当前目录对应的下单请求结构，目录重载后重新构建"""
+        catalog = get_catalog()
+        cached = self._schema
+        if cached is None or cached[0] is not catalog:
+            schema = OrderSchema(catalog.beverages, catalog.condiments,
+                                 self.max_condiment_quantity, self.max_condiments)
+            cached = self._schema = (catalog, schema)
+        return cached[1]
+    
+    def _validate_order_request(self, data: Any) -> OrderRequest:
+        """在调用服务前校验下单请求，失败时抛出ValidationError"""
+        return self._get_order_schema().validate(data)
     
-    def place_order(self) -> Dict[str, Any]:
+    @staticmethod
+    def _use_lean_format() -> bool:
+        """请求是否使用精简订单格式（?format=lean）"""
+        return request.args.get("format") == "lean"
+    
+    def place_order(self) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
         """提交订单"""
         try:
-            data = request.get_json()
-            if not data:
-                return ApiResponse.error("无效的请求数据")
-            
-            beverage_id = data.get("beverage")
-            condiments = data.get("condiments", [])
+            order_request = self._validate_order_request(request.get_json(silent=True))
             
-            if not beverage_id:
-                return ApiResponse.error("未指定饮料")
+            idempotency_key = request.headers.get("Idempotency-Key")
+            if idempotency_key is not None and not 0 < len(idempotency_key) <= self.MAX_IDEMPOTENCY_KEY_LENGTH:
+                return ApiResponse.bad_request("无效的Idempotency-Key"), 400
             
             # 创建订单
-            order = self.order_service.create_order(beverage_id, condiments)
-            if not order:
-                return ApiResponse.error("创建订单失败")
+            order = self.order_service.create_order(
+                order_request.beverage, order_request.condiment_list(), idempotency_key
+            )
+            return ApiResponse.success(data={"order": order.to_dict(self._use_lean_format())})
+        except ValidationError as e:
+            return ApiResponse.validation_error(str(e), e.details), 400
+        except IdempotencyConflictError as e:
+            return ApiResponse.error(str(e), 422), 422
+        except OutOfStockError as e:
+            return ApiResponse.error(str(e), 409), 409
+        except ValueError as e:
+            # 校验后目录热加载导致商品不存在
+            return ApiResponse.bad_request(str(e)), 400
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    def quote(self) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+        """报价：计算所选饮料和配料的价格和卡路里，不创建订单"""
+        try:
+            order_request = self._validate_order_request(request.get_json(silent=True))
+            quote = self.order_service.quote(order_request.beverage, order_request.condiment_list())
+            return ApiResponse.success(data=quote)
+        except ValidationError as e:
+            return ApiResponse.validation_error(str(e), e.details), 400
+        except ValueError as e:
+            return ApiResponse.bad_request(str(e)), 400
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    def place_orders_batch(self) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int]]:
+        """批量提交订单，无效的订单在调用服务前逐项拒绝"""
+        try:
+            data = request.get_json(silent=True)
+            entries = data.get("orders") if isinstance(data, dict) else data
+            if not isinstance(entries, list) or not entries:
+                return ApiResponse.bad_request("无效的请求数据"), 400
+            if len(entries) > self.MAX_BATCH_SIZE:
+                return ApiResponse.bad_request(f"单次最多提交 {self.MAX_BATCH_SIZE} 个订单"), 400
+            
+            results: list = [None] * len(entries)
+            valid_indexes = []
+            valid_entries = []
+            for index, entry in enumerate(entries):
+                try:
+                    order_request = self._validate_order_request(entry)
+                except ValidationError as e:
+                    results[index] = {"index": index, "success": False, "error": str(e), "details": e.details}
+                    continue
+                valid_indexes.append(index)
+                valid_entries.append({"beverage": order_request.beverage,
+                                      "condiments": order_request.condiment_list()})
             
-            return ApiResponse.success(data={"order": order.to_dict()})
+            lean = self._use_lean_format()
+            created = self.order_service.create_orders(valid_entries) if valid_entries else []
+            for index, (order, error) in zip(valid_indexes, created):
+                if order:
+                    results[index] = {"index": index, "success": True, "order": order.to_dict(lean)}
+                else:
+                    results[index] = {"index": index, "success": False, "error": error}
+            
+            return ApiResponse.success(data={
+                "results": results,
+                "created": sum(1 for result in results if result["success"])
+            })
         except Exception as e:
             return ApiResponse.error(str(e))
     
     def get_order_history(self) -> Dict[str, Any]:
-        """获取历史订单"""
+        """获取历史订单（分页）"""
         try:
-            history = self.order_service.get_order_history()
-            return ApiResponse.success(data={"history": [order.to_dict() for order in history]})
+            args = request.args
+            try:
+                limit = int(args.get("limit", self.DEFAULT_PAGE_SIZE))
+                since = datetime.fromisoformat(args["since"]) if args.get("since") else None
+                until = datetime.fromisoformat(args["until"]) if args.get("until") else None
+            except ValueError:
+                return ApiResponse.bad_request("无效的分页或时间参数")
+            if limit < 1 or limit > self.MAX_PAGE_SIZE:
+                return ApiResponse.bad_request(f"limit 必须在 1 到 {self.MAX_PAGE_SIZE} 之间")
+            
+            status = args.get("status")
+            if status and status not in OrderStatus.ALL:
+                return ApiResponse.bad_request("无效的订单状态")
+            
+            history, next_cursor = self.order_service.get_order_history(
+                limit, args.get("cursor"), status, since, until
+            )
+            lean = self._use_lean_format()
+            return ApiResponse.success(data={
+                "history": [order.to_dict(lean) for order in history],
+                "next_cursor": next_cursor
+            })
         except Exception as e:
             return ApiResponse.error(str(e))
     
@@ -46,21 +163,105 @@ class OrderController:
             order = self.order_service.get_order(order_id)
             if not order:
                 return ApiResponse.error("订单不存在")
-            return ApiResponse.success(data=order.to_dict())
+            return ApiResponse.success(data=order.to_dict(self._use_lean_format()))
         except Exception as e:
             return ApiResponse.error(str(e))
     
-    def update_order_status(self, order_id: str, status: str) -> Dict[str, Any]:
-        """更新订单状态"""
+    def update_order_status(self, order_id: str, status: str,
+                            expected_status: Optional[str] = None) -> Dict[str, Any]:
+        """更新订单状态，可通过expected_status做比较并交换"""
         try:
-            if status not in [OrderStatus.PENDING, OrderStatus.PROCESSING, 
-                            OrderStatus.COMPLETED, OrderStatus.CANCELLED]:
+            if status not in OrderStatus.ALL:
                 return ApiResponse.error("无效的订单状态")
             
-            order = self.order_service.update_order_status(order_id, status)
+            order = self.order_service.update_order_status(order_id, status, expected_status)
             if not order:
                 return ApiResponse.error("更新订单状态失败")
             
-            return ApiResponse.success(data=order.to_dict())
+            return ApiResponse.success(data=order.to_dict(self._use_lean_format()))
+        except ValueError as e:
+            return ApiResponse.error(str(e), 409)
+        except Exception as e:
+            return ApiResponse.error(str(e))
+    
+    def claim_next_order(self) -> Dict[str, Any]:
+        """领取最早的待处理订单（供出料设备使用）"""
+        try:
+            order = self.order_service.claim_next_order()
+            return ApiResponse.success(data={"order": order.to_dict(self._use_lean_format()) if order else None})
         except Exception as e:
-            return ApiResponse.error(str(e)) 
\ No newline at end of file
+            return ApiResponse.error(str(e))
+    
+    def _subscribe(self, params: Mapping[str, str], last_event_id: Optional[str],
+                   loop: Optional[asyncio.AbstractEventLoop] = None) -> Union[Subscription, Dict[str, Any]]:
+        """按查询参数订阅订单事件，参数无效时返回错误响应"""
+        status = params.get("status")
+        if status and status not in OrderStatus.ALL:
+            return ApiResponse.bad_request("无效的订单状态")
+        return self.order_service.events.subscribe(
+            order_id=params.get("order_id"), status=status,
+            last_event_id=last_event_id or params.get("last_event_id") or None, loop=loop
+        )
+    
+    def stream_orders(self):
+        """订单状态变更事件流（Server-Sent Events）"""
+        try:
+            subscription = self._subscribe(request.args, request.headers.get("Last-Event-ID"))
+            if isinstance(subscription, dict):
+                return subscription
+        except TooManySubscribersError as e:
+            return ApiResponse.error(str(e), 503), 503
+        except Exception as e:
+            return ApiResponse.error(str(e))
+        
+        events = self.order_service.events
+        heartbeat = self.STREAM_HEARTBEAT
+        
+        def generate():
+            try:
+                yield EventStream.retry(3000)
+                while True:
+                    if subscription.overflowed:
+                        # 客户端需重新拉取订单状态后再订阅
+                        yield EventStream.encode("reset", {})
+                        return
+                    event = subscription.get(timeout=heartbeat)
+                    if event is None:
+                        yield EventStream.KEEP_ALIVE
+                    else:
+                        yield EventStream.encode(event.type, event.data, event.id)
+            finally:
+                events.unsubscribe(subscription)
+        
+        return EventStream.stream(generate())
+    
+    async def astream_orders(self, data: Optional[Dict[str, Any]], params: Mapping[str, str],
+                             headers: Mapping[str, str]
+                             ) -> Union[Dict[str, Any], Tuple[Dict[str, Any], int], AsyncIterator[bytes]]:
+        """订单状态变更事件流（ASGI入口），等待事件期间不占用线程"""
+        try:
+            subscription = self._subscribe(params, headers.get("last-event-id"), asyncio.get_running_loop())
+            if isinstance(subscription, dict):
+                return subscription
+        except TooManySubscribersError as e:
+            return ApiResponse.error(str(e), 503), 503
+        except Exception as e:
+            return ApiResponse.error(str(e))
+        return self._aencode_events(subscription)
+    
+    async def _aencode_events(self, subscription: Subscription) -> AsyncIterator[bytes]:
+        """把订阅的事件编码为SSE，关闭时取消订阅"""
+        try:
+            yield EventStream.retry(3000)
+            while True:
+                if subscription.overflowed:
+                    yield EventStream.encode("reset", {})
+                    return
+                event = await subscription.aget(self.STREAM_HEARTBEAT)
+                if event is None:
+                    if not subscription.overflowed:
+                        yield EventStream.KEEP_ALIVE
+                else:
+                    yield EventStream.encode(event.type, event.data, event.id)
+        finally:
+            self.order_service.events.unsubscribe(subscription)
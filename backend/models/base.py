@@ -26,6 +26,8 @@ class BaseModel(ABC):
 class Serializable(ABC):
     """可序列化基类"""
     
+    __slots__ = ()
+    
     @abstractmethod
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
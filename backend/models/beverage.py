@@ -5,6 +5,8 @@ from models.base import Serializable
 class Beverage(Serializable):
     """饮料基类"""
     
+    __slots__ = ("id", "category", "name", "price", "description", "calories", "hot", "image")
+    
     def __init__(self, id: str, category: str, name: str, price: float, description: str = "", 
                  calories: int = 0, hot: bool = True, image: str = ""):
         self.id = id
@@ -46,6 +48,8 @@ class Beverage(Serializable):
 class Condiment(Serializable):
     """配料基类"""
     
+    __slots__ = ("id", "category", "name", "price", "description", "calories", "image")
+    
     def __init__(self, id: str, category: str, name: str, price: float, description: str = "",
                  calories: int = 0, image: str = ""):
         self.id = id
@@ -84,6 +88,8 @@ class Condiment(Serializable):
 class BeverageDecorator(Beverage):
     """饮料装饰器基类"""
     
+    __slots__ = ("_beverage", "_condiment", "quantity", "condiments")
+    
     def __init__(self, beverage: Beverage, condiment: Condiment, quantity: int = 1):
         super().__init__(
             id=beverage.id,
@@ -112,6 +118,8 @@ class BeverageDecorator(Beverage):
 class Coffee(Beverage):
     """咖啡类"""
     
+    __slots__ = ()
+    
     def __init__(self, id: str, name: str, price: float, description: str = "", calories: int = 0):
         super().__init__(id, "coffee", name, price, description, calories, True, "")
     
@@ -124,6 +132,8 @@ class Coffee(Beverage):
 class Tea(Beverage):
     """茶类"""
     
+    __slots__ = ()
+    
     def __init__(self, id: str, name: str, price: float, description: str = "", calories: int = 0):
         super().__init__(id, "tea", name, price, description, calories, True, "")
     
@@ -136,6 +146,8 @@ class Tea(Beverage):
 class Soda(Beverage):
     """汽水类"""
     
+    __slots__ = ()
+    
     def __init__(self, id: str, name: str, price: float, description: str = "", calories: int = 0):
         super().__init__(id, "soda", name, price, description, calories, False, "")
     
@@ -148,6 +160,8 @@ class Soda(Beverage):
 class Juice(Beverage):
     """果汁类"""
     
+    __slots__ = ()
+    
     def __init__(self, id: str, name: str, price: float, description: str = "", calories: int = 0):
         super().__init__(id, "juice", name, price, description, calories, False, "")
     
@@ -159,6 +173,8 @@ class Juice(Beverage):
 
 class Milk(BeverageDecorator):
     """牛奶装饰器"""
+    __slots__ = ()
+    
     def __init__(self, beverage: Beverage):
         super().__init__(
             beverage=beverage,
@@ -176,6 +192,8 @@ class Milk(BeverageDecorator):
 
 class Sugar(BeverageDecorator):
     """糖装饰器"""
+    __slots__ = ()
+    
     def __init__(self, beverage: Beverage):
         super().__init__(
             beverage=beverage,
@@ -193,6 +211,8 @@ class Sugar(BeverageDecorator):
 
 class Ice(BeverageDecorator):
     """冰块装饰器"""
+    __slots__ = ()
+    
     def __init__(self, beverage: Beverage):
         super().__init__(
             beverage=beverage,
@@ -1,7 +1,12 @@
-from typing import Dict, Any, List, Optional
+import os
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
 from datetime import datetime
 from models.base import Serializable
 from models.beverage import Beverage, Condiment
+from utils.cache import TTLCache
+
+# 序列化结果放在订单对象之外的有界LRU中，键包含状态，状态变化后旧条目自然失效
+_serialized_cache = TTLCache(max_size=int(os.environ.get("ORDER_DICT_CACHE_SIZE", "2048")))
 
 class OrderStatus:
     """订单状态"""
@@ -9,29 +14,102 @@ class OrderStatus:
     PROCESSING = "processing"  # 处理中
     COMPLETED = "completed"  # 已完成
     CANCELLED = "cancelled"  # 已取消
+    
+    ALL = (PENDING, PROCESSING, COMPLETED, CANCELLED)
+    
+    # 允许的状态转换：待处理 -> 处理中 -> 已完成/已取消，待处理的订单也可直接取消
+    TRANSITIONS = {
+        PENDING: (PROCESSING, CANCELLED),
+        PROCESSING: (COMPLETED, CANCELLED),
+        COMPLETED: (),
+        CANCELLED: (),
+    }
+    
+    @classmethod
+    def can_transition(cls, current: str, new: str) -> bool:
+        """判断状态转换是否允许"""
+        return new in cls.TRANSITIONS.get(current, ())
+
+class OrderLine(NamedTuple):
+    """订单行：基础饮料引用、配料及份数和合计"""
+    beverage: Beverage
+    condiments: Tuple[Tuple[Condiment, int], ...]
+    price: float  # 优惠前的合计
+    calories: int
+    discount: float = 0.0
+    promotions: Tuple[Tuple[str, float], ...] = ()  # 命中的促销规则及优惠金额
+
+def compose_order_line(beverage: Beverage, condiments: Iterable[Tuple[Condiment, int]]) -> OrderLine:
+    """一次遍历合计价格和卡路里，生成不可变的订单行"""
+    items = tuple(condiments)
+    price = beverage.price
+    calories = beverage.calories
+    for condiment, quantity in items:
+        price += condiment.price * quantity
+        calories += condiment.calories * quantity
+    return OrderLine(beverage, items, price, calories)
 
 class Order(Serializable):
-    """订单类"""
+    """订单类
+    
+    饮料和配料以引用方式共享目录中的对象，不复制配置数据。
+    """
+    
+    __slots__ = ("id", "line", "status", "created_at")
     
-    def __init__(self, id: str, beverage: Beverage, condiments: List[Dict[str, Any]], 
-                 status: str = OrderStatus.PENDING, created_at: Optional[datetime] = None):
+    # 精简格式保留的字段（去掉重复的兼容字段）
+    LEAN_FIELDS = ("id", "items", "total", "discount", "status", "createdAt", "updatedAt", "total_calories")
+    
+    def __init__(self, id: str, line: OrderLine, status: str = OrderStatus.PENDING,
+                 created_at: Optional[datetime] = None):
         self.id = id
-        self.beverage = beverage
-        self.condiments = condiments
+        self.line = line
         self.status = status
         self.created_at = created_at or datetime.now()
+    
+    @property
+    def subtotal(self) -> float:
+        """优惠前的合计"""
+        return self.line.price
+    
+    @property
+    def total_price(self) -> float:
+        """订单总价（扣除优惠）"""
+        return round(self.line.price - self.line.discount, 2)
+    
+    @property
+    def total_calories(self) -> int:
+        """订单总卡路里"""
+        return self.line.calories
+    
+    @property
+    def beverage(self) -> Beverage:
+        """基础饮料"""
+        return self.line.beverage
+    
+    @property
+    def condiments(self) -> List[Dict[str, Any]]:
+        """配料列表（含份数）"""
+        return [{**condiment.to_dict(), "quantity": quantity} for condiment, quantity in self.line.condiments]
+    
+    def to_dict(self, lean: bool = False) -> Dict[str, Any]:
+        """转换为字典格式，适配前端期望的格式
         
-        # 计算总价和总卡路里
-        self.total_price = beverage.price
-        self.total_calories = beverage.calories
-        
-        for condiment in condiments:
-            quantity = condiment.get("quantity", 1)
-            self.total_price += condiment["price"] * quantity
-            self.total_calories += condiment["calories"] * quantity
+        结果会被缓存并在多次调用间共享，调用方不应修改返回的字典。
+        lean为True时返回不含重复兼容字段的精简格式。
+        """
+        # 先取一次状态快照，构建和缓存键都基于同一个值，并发改状态也不会缓存到过期结果
+        status = self.status
+        key = (self.id, status)
+        serialized = _serialized_cache.get(key)
+        if serialized is None:
+            full = self._build_dict(status)
+            serialized = (full, {field: full[field] for field in self.LEAN_FIELDS})
+            _serialized_cache.set(key, serialized)
+        return serialized[1] if lean else serialized[0]
     
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式，适配前端期望的格式"""
+    def _build_dict(self, status: str) -> Dict[str, Any]:
+        """生成完整格式的字典"""
         # 创建订单项列表
         items = []
         
@@ -44,25 +122,29 @@ class Order(Serializable):
         })
         
         # 添加配料项
-        for condiment in self.condiments:
+        for condiment, quantity in self.line.condiments:
             items.append({
-                "id": condiment["id"],
-                "quantity": condiment.get("quantity", 1),
+                "id": condiment.id,
+                "quantity": quantity,
                 "type": "condiment",
-                "price": condiment["price"]
+                "price": condiment.price
             })
         
+        created_at = self.created_at.isoformat()
         return {
             "id": self.id,
             "items": items,
             "total": self.total_price,
-            "status": self.status,
-            "createdAt": self.created_at.isoformat(),
-            "updatedAt": self.created_at.isoformat(),
+            "subtotal": self.subtotal,
+            "discount": self.line.discount,
+            "promotions": [{"id": rule_id, "amount": amount} for rule_id, amount in self.line.promotions],
+            "status": status,
+            "createdAt": created_at,
+            "updatedAt": created_at,
             # 保留原有字段以便兼容
             "beverage": self.beverage.to_dict(),
             "condiments": self.condiments,
-            "created_at": self.created_at.isoformat(),
+            "created_at": created_at,
             "total_price": self.total_price,
             "total_calories": self.total_calories
         }
@@ -70,10 +152,18 @@ class Order(Serializable):
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Order':
         """从字典创建实例"""
+        line = compose_order_line(
+            Beverage.from_dict(data["beverage"]),
+            ((Condiment.from_dict(c), c.get("quantity", 1)) for c in data["condiments"])
+        )
+        if data.get("discount"):
+            line = line._replace(
+                discount=data["discount"],
+                promotions=tuple((p["id"], p["amount"]) for p in data.get("promotions", ()))
+            )
         return cls(
             id=data["id"],
-            beverage=Beverage.from_dict(data["beverage"]),
-            condiments=data["condiments"],
+            line=line,
             status=data.get("status", OrderStatus.PENDING),
             created_at=datetime.fromisoformat(data["created_at"]) if "created_at" in data else None
         ) 
\ No newline at end of file
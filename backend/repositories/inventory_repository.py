@@ -0,0 +1,71 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+# 库存键：(类型, 目录ID)，类型为beverage或condiment
+StockKey = Tuple[str, str]
+
+class InventoryRepository(ABC):
+    """库存存储抽象，未登记的商品视为不限量"""
+
+    @abstractmethod
+    def reserve(self, items: Dict[StockKey, int]) -> Optional[StockKey]:
+        """原子地扣减多项库存，全部充足时扣减并返回None，否则不做修改并返回不足的一项"""
+        pass
+
+    @abstractmethod
+    def release(self, items: Dict[StockKey, int]):
+        """归还已扣减的库存"""
+        pass
+
+    @abstractmethod
+    def restock(self, key: StockKey, quantity: int) -> int:
+        """补充库存，返回补充后的数量"""
+        pass
+
+    @abstractmethod
+    def levels(self) -> Dict[StockKey, int]:
+        """获取所有登记商品的当前库存"""
+        pass
+
+class InMemoryInventoryRepository(InventoryRepository):
+    """内存库存存储（仅限单进程）"""
+
+    def __init__(self, initial: Dict[StockKey, int]):
+        self._stock: Dict[StockKey, int] = dict(initial)
+        self._lock = threading.Lock()
+
+    def reserve(self, items: Dict[StockKey, int]) -> Optional[StockKey]:
+        with self._lock:
+            for key, quantity in items.items():
+                stock = self._stock.get(key)
+                if stock is not None and stock < quantity:
+                    return key
+            for key, quantity in items.items():
+                if key in self._stock:
+                    self._stock[key] -= quantity
+        return None
+
+    def release(self, items: Dict[StockKey, int]):
+        with self._lock:
+            for key, quantity in items.items():
+                if key in self._stock:
+                    self._stock[key] += quantity
+
+    def restock(self, key: StockKey, quantity: int) -> int:
+        with self._lock:
+            self._stock[key] = self._stock.get(key, 0) + quantity
+            return self._stock[key]
+
+    def levels(self) -> Dict[StockKey, int]:
+        return dict(self._stock)
+
+def create_inventory_repository(initial: Dict[StockKey, int]) -> InventoryRepository:
+    """根据ORDER_STORE配置创建库存存储，使用SQLite时与订单共用数据库"""
+    store = os.environ.get("ORDER_STORE", "memory").lower()
+    if store == "sqlite":
+        from repositories.sqlite_connection import get_default_db_path
+        from repositories.sqlite_inventory_repository import SqliteInventoryRepository
+        return SqliteInventoryRepository(get_default_db_path(), initial)
+    return InMemoryInventoryRepository(initial)
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+from models.order import Order
+from repositories.sqlite_connection import SqliteConnectionPool
+
+class OrderArchive:
+    """订单归档（JSON Lines文件，按订单创建日期分文件）
+
+    订单ID到(文件名, 行偏移)的索引存放在归档目录下的SQLite文件中，不随归档量占用内存。
+    """
+
+    FILE_PREFIX = "orders-"
+    FILE_SUFFIX = ".jsonl"
+    INDEX_FILE = "index.db"
+
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS archive_index (
+            id TEXT PRIMARY KEY,
+            file TEXT NOT NULL,
+            offset INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        # 各归档文件已建立索引的字节数，索引落后于文件时从该位置补建
+        """
+        CREATE TABLE IF NOT EXISTS indexed_files (
+            name TEXT PRIMARY KEY,
+            size INTEGER NOT NULL
+        )
+        """,
+    )
+    _UPSERT_INDEX = "INSERT OR REPLACE INTO archive_index (id, file, offset) VALUES (?, ?, ?)"
+    _UPSERT_FILE = "INSERT OR REPLACE INTO indexed_files (name, size) VALUES (?, ?)"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pool = SqliteConnectionPool(os.path.join(directory, self.INDEX_FILE), schema=self._SCHEMA)
+        # 本进程是否已补建过索引（首次写入或查询时进行）
+        self._index_ready = False
+
+    def _file_name(self, order: Order) -> str:
+        return f"{self.FILE_PREFIX}{order.created_at.strftime('%Y-%m-%d')}{self.FILE_SUFFIX}"
+
+    def _list_files(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith(self.FILE_PREFIX) and name.endswith(self.FILE_SUFFIX))
+
+    def fingerprint(self) -> Tuple[Tuple[str, int], ...]:
+        """归档文件及大小，归档只追加，指纹不变即内容不变"""
+        return tuple((name, os.path.getsize(os.path.join(self.directory, name))) for name in self._list_files())
+
+    def _ensure_index(self):
+        """为索引落后的归档文件补建索引，例如建立索引前已有的归档（调用方需持有锁）"""
+        if self._index_ready:
+            return
+        conn = self._pool.get()
+        indexed = dict(conn.execute("SELECT name, size FROM indexed_files"))
+        for name, size in self.fingerprint():
+            offset = indexed.get(name, 0)
+            if offset >= size:
+                continue
+            rows = []
+            with open(os.path.join(self.directory, name), "rb") as f:
+                f.seek(offset)
+                for line in iter(f.readline, b""):
+                    if not line.endswith(b"\n"):
+                        break
+                    if line.strip():
+                        rows.append((json.loads(line)["id"], name, offset))
+                    offset += len(line)
+            with conn:
+                conn.executemany(self._UPSERT_INDEX, rows)
+                conn.execute(self._UPSERT_FILE, (name, offset))
+        self._index_ready = True
+
+    def append(self, orders: List[Order]):
+        """追加归档订单并写入索引"""
+        groups: Dict[str, List[Order]] = {}
+        for order in orders:
+            groups.setdefault(self._file_name(order), []).append(order)
+
+        with self._lock:
+            self._ensure_index()
+            conn = self._pool.get()
+            for name, group in groups.items():
+                rows = []
+                with open(os.path.join(self.directory, name), "ab") as f:
+                    for order in group:
+                        rows.append((order.id, name, f.tell()))
+                        line = json.dumps(order.to_dict(), ensure_ascii=False, separators=(",", ":"))
+                        f.write(line.encode("utf-8") + b"\n")
+                    size = f.tell()
+                with conn:
+                    conn.executemany(self._UPSERT_INDEX, rows)
+                    conn.execute(self._UPSERT_FILE, (name, size))
+
+    def get(self, order_id: str) -> Optional[Order]:
+        """按ID查询归档订单"""
+        if not self._index_ready:
+            with self._lock:
+                self._ensure_index()
+        location = self._pool.get().execute(
+            "SELECT file, offset FROM archive_index WHERE id = ?", (order_id,)
+        ).fetchone()
+        if location is None:
+            return None
+
+        name, offset = location
+        with open(os.path.join(self.directory, name), "rb") as f:
+            f.seek(offset)
+            return Order.from_dict(json.loads(f.readline()))
+
+    def file_sizes(self) -> Dict[str, int]:
+        """各归档文件的当前大小（字节）"""
+        return dict(self.fingerprint())
+
+    def read_from(self, name: str, offset: int = 0) -> Tuple[List[Order], int]:
+        """从指定文件的字节偏移处读取新追加的订单，返回订单和已读到的偏移
+
+        只读取完整的行，正在写入的末行留到下次读取。
+        """
+        orders: List[Order] = []
+        with open(os.path.join(self.directory, name), "rb") as f:
+            f.seek(offset)
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if line.strip():
+                    orders.append(Order.from_dict(json.loads(line)))
+        return orders, offset
+
+    def iter_orders(self) -> Iterator[Order]:
+        """按文件日期顺序遍历全部归档订单"""
+        for name in self._list_files():
+            with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield Order.from_dict(json.loads(line))
@@ -0,0 +1,338 @@
+import bisect
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from models.order import Order, OrderStatus
+from repositories.order_archive import OrderArchive
+
+# 分页游标：(创建时间戳, 订单ID)
+Cursor = Tuple[float, str]
+class IdempotencyRecord(NamedTuple):
+    """幂等键对应的订单"""
+    order: Order
+    fingerprint: Optional[str]  # 创建订单的请求指纹，早期记录没有指纹时为None
+
+# 按小时聚合的订单：(小时, 状态, 饮料ID, 订单数, 营收)
+HourlySales = Tuple[datetime, str, str, int, float]
+# 按小时聚合的配料添加：(小时, 配料ID, 添加了该配料的未取消订单数)
+HourlyCondiments = Tuple[datetime, str, int]
+
+def order_sort_key(order: Order) -> Cursor:
+    """订单在时间索引中的排序键"""
+    return (order.created_at.timestamp(), order.id)
+
+class OrderRepository(ABC):
+    """订单存储抽象"""
+
+    @abstractmethod
+    def add(self, order: Order):
+        """保存新订单"""
+        pass
+
+    def add_many(self, orders: List[Order]):
+        """批量保存新订单"""
+        for order in orders:
+            self.add(order)
+
+    def add_idempotent(self, order: Order, idempotency_key: str, ttl: float,
+                       fingerprint: Optional[str] = None) -> IdempotencyRecord:
+        """按幂等键保存订单及请求指纹，键在有效期内已使用时返回原记录而不保存
+
+        默认实现不持久化幂等键，由服务层的缓存去重。
+        """
+        self.add(order)
+        return IdempotencyRecord(order, fingerprint)
+
+    def find_by_idempotency_key(self, idempotency_key: str, ttl: float) -> Optional[IdempotencyRecord]:
+        """按幂等键查找有效期内创建的订单"""
+        return None
+
+    @abstractmethod
+    def get(self, order_id: str) -> Optional[Order]:
+        """按ID获取订单"""
+        pass
+
+    @abstractmethod
+    def update_status(self, order_id: str, status: str) -> Optional[Order]:
+        """更新订单状态，订单不存在时返回None"""
+        pass
+
+    @abstractmethod
+    def compare_and_set_status(self, order_id: str, expected: str, status: str) -> Optional[Order]:
+        """仅当订单当前状态为expected时更新为status，成功时返回订单，否则返回None"""
+        pass
+
+    @abstractmethod
+    def claim_next(self, from_status: str, to_status: str) -> Optional[Order]:
+        """原子地取出from_status中最早的订单并更新为to_status，没有订单时返回None"""
+        pass
+
+    @abstractmethod
+    def list_all(self) -> List[Order]:
+        """按创建时间获取全部订单"""
+        pass
+
+    # 存储是否随写入维护按小时的销售汇总；为True时销售统计直接查询存储，多worker共享同一份结果
+    maintains_sales_rollup = False
+
+    def sales_by_hour(self, since: Optional[datetime] = None, until: Optional[datetime] = None
+                      ) -> Optional[Tuple[List[HourlySales], List[HourlyCondiments]]]:
+        """读取按小时的销售汇总，since/until按小时粗略过滤（调用方再按分桶精确过滤）
+
+        不维护汇总的存储返回None，由销售统计服务在进程内计数。
+        """
+        return None
+
+    def rebuild_sales_by_hour(self) -> int:
+        """按全部订单重建按小时的销售汇总，返回统计的订单数"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_page(self, limit: int, cursor: Optional[Cursor] = None, status: Optional[str] = None,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None
+                  ) -> Tuple[List[Order], Optional[Cursor]]:
+        """按创建时间倒序分页获取订单
+
+        cursor为上一页最后一条订单的排序键，since包含、until不包含。
+        返回本页订单和下一页游标（没有更多时为None）。
+        """
+        pass
+
+    def close(self):
+        """释放存储资源"""
+        pass
+
+class InMemoryOrderRepository(OrderRepository):
+    """内存订单存储（仅限单进程）
+
+    写操作和索引遍历在同一把锁内完成，临界区只涉及本次变更或本页订单；
+    按ID读取不加锁。每种状态维护一个按进入该状态先后排列的队列，
+    取最早的待处理订单为O(1)；另按状态维护按创建时间排列的索引，按状态分页只访问该状态的订单。配置保留策略后，超出数量上限或保留时长的已完成/已取消订单按创建时间
+    从旧到新移出内存，在锁外写入归档，写入后仍可按ID查询。
+    """
+
+    # 超出数量上限时一次淘汰到上限的该比例，避免每次下单都触发淘汰
+    EVICT_LOW_WATERMARK = 0.9
+    # 按时长淘汰的检查间隔（秒）
+    AGE_SWEEP_INTERVAL = 60
+    # 淘汰数量乘以该倍数仍小于索引长度时逐个删除时间索引条目，否则整体重建
+    EVICT_REBUILD_RATIO = 32
+
+    TERMINAL_STATUSES = (OrderStatus.COMPLETED, OrderStatus.CANCELLED)
+
+    def __init__(self, max_orders: Optional[int] = None, max_age: Optional[float] = None,
+                 archive: Optional[OrderArchive] = None):
+        self._orders: Dict[str, Order] = {}
+        # 按(创建时间, ID)升序排列的时间索引
+        self._time_index: List[Cursor] = []
+        # 状态 -> 按进入该状态先后排列的订单ID
+        self._status_queues: Dict[str, "OrderedDict[str, None]"] = {
+            status: OrderedDict() for status in OrderStatus.ALL
+        }
+        # 状态 -> 该状态订单按(创建时间, ID)升序排列的时间索引
+        self._status_time_index: Dict[str, List[Cursor]] = {status: [] for status in OrderStatus.ALL}
+        self._lock = threading.RLock()
+
+        self.max_orders = max_orders
+        self.max_age = max_age
+        self.archive = archive
+        # 已移出内存、正在写入归档的订单
+        self._archiving: Dict[str, Order] = {}
+        self._last_age_sweep = time.time()
+
+    def _insert(self, order: Order):
+        """写入订单及索引（调用方需持有锁）"""
+        self._orders[order.id] = order
+        key = order_sort_key(order)
+        bisect.insort(self._time_index, key)
+        bisect.insort(self._status_time_index.setdefault(order.status, []), key)
+        self._status_queues.setdefault(order.status, OrderedDict())[order.id] = None
+
+    def _move_status_index(self, order: Order, status: str):
+        """把订单从原状态的时间索引移到新状态的时间索引（调用方需持有锁）"""
+        key = order_sort_key(order)
+        index = self._status_time_index[order.status]
+        i = bisect.bisect_left(index, key)
+        if i < len(index) and index[i] == key:
+            del index[i]
+        bisect.insort(self._status_time_index.setdefault(status, []), key)
+
+    def _set_status(self, order: Order, status: str):
+        """更新订单状态并移动到对应的状态队列（调用方需持有锁）"""
+        self._status_queues[order.status].pop(order.id, None)
+        self._move_status_index(order, status)
+        order.status = status
+        self._status_queues.setdefault(status, OrderedDict())[order.id] = None
+
+    def add(self, order: Order):
+        with self._lock:
+            self._insert(order)
+            evicted = self._collect_evictions()
+        self._archive_evicted(evicted)
+
+    def add_many(self, orders: List[Order]):
+        with self._lock:
+            for order in orders:
+                self._insert(order)
+            evicted = self._collect_evictions()
+        self._archive_evicted(evicted)
+
+    def get(self, order_id: str) -> Optional[Order]:
+        order = self._orders.get(order_id)
+        if order is None:
+            order = self._archiving.get(order_id)
+        if order is None and self.archive:
+            order = self.archive.get(order_id)
+        return order
+
+    def _collect_evictions(self) -> List[Order]:
+        """按保留策略把已结束的订单移出内存，返回待归档的订单（调用方需持有锁）
+
+        已完成和已取消的订单各有按创建时间排列的索引，从两个索引的头部按创建时间合并取出，
+        耗时只与淘汰数量有关，与未结束订单的数量无关。
+        """
+        now = time.time()
+        over_count = self.max_orders is not None and len(self._orders) > self.max_orders
+        age_due = self.max_age is not None and now - self._last_age_sweep >= self.AGE_SWEEP_INTERVAL
+        if not over_count and not age_due:
+            return []
+
+        if age_due:
+            self._last_age_sweep = now
+        target = len(self._orders)
+        if over_count:
+            target = int(self.max_orders * self.EVICT_LOW_WATERMARK)
+        cutoff = now - self.max_age if self.max_age is not None else None
+
+        indexes = [self._status_time_index[status] for status in self.TERMINAL_STATUSES]
+        heads = [0] * len(indexes)
+        evicted: List[Order] = []
+        remaining = len(self._orders)
+        while True:
+            # 取创建时间最早的已结束订单
+            oldest = None
+            for j, index in enumerate(indexes):
+                if heads[j] < len(index) and (oldest is None or index[heads[j]] < indexes[oldest][heads[oldest]]):
+                    oldest = j
+            if oldest is None:
+                break
+            created_at, order_id = indexes[oldest][heads[oldest]]
+            if remaining <= target and not (cutoff is not None and created_at < cutoff):
+                break
+            heads[oldest] += 1
+            evicted.append(self._orders[order_id])
+            remaining -= 1
+
+        if not evicted:
+            return []
+        for index, head in zip(indexes, heads):
+            del index[:head]
+        for order in evicted:
+            del self._orders[order.id]
+            self._status_queues[order.status].pop(order.id, None)
+            if self.archive:
+                self._archiving[order.id] = order
+        if len(evicted) * self.EVICT_REBUILD_RATIO < len(self._time_index):
+            for order in evicted:
+                del self._time_index[bisect.bisect_left(self._time_index, order_sort_key(order))]
+        else:
+            evicted_ids = {order.id for order in evicted}
+            self._time_index = [key for key in self._time_index if key[1] not in evicted_ids]
+        return evicted
+
+    def _archive_evicted(self, evicted: List[Order]):
+        """把移出内存的订单写入归档（不持有存储锁），写入完成前仍可按ID查到
+
+        归档写入失败时订单放回内存，下次淘汰时重试。
+        """
+        if not evicted or not self.archive:
+            return
+        try:
+            self.archive.append(evicted)
+        except Exception as e:
+            print(f"订单归档失败: {str(e)}")
+            with self._lock:
+                for order in evicted:
+                    self._insert(order)
+        finally:
+            with self._lock:
+                for order in evicted:
+                    self._archiving.pop(order.id, None)
+
+    def update_status(self, order_id: str, status: str) -> Optional[Order]:
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order:
+                self._set_status(order, status)
+            return order
+
+    def compare_and_set_status(self, order_id: str, expected: str, status: str) -> Optional[Order]:
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None or order.status != expected:
+                return None
+            self._set_status(order, status)
+            return order
+
+    def claim_next(self, from_status: str, to_status: str) -> Optional[Order]:
+        with self._lock:
+            queue = self._status_queues.get(from_status)
+            if not queue:
+                return None
+            order_id, _ = queue.popitem(last=False)
+            order = self._orders[order_id]
+            self._move_status_index(order, to_status)
+            order.status = to_status
+            self._status_queues.setdefault(to_status, OrderedDict())[order_id] = None
+            return order
+
+    def list_all(self) -> List[Order]:
+        with self._lock:
+            return [self._orders[key[1]] for key in self._time_index]
+
+    def list_page(self, limit: int, cursor: Optional[Cursor] = None, status: Optional[str] = None,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None
+                  ) -> Tuple[List[Order], Optional[Cursor]]:
+        with self._lock:
+            # 指定状态时只扫描该状态的时间索引
+            index = self._time_index if status is None else self._status_time_index.get(status, [])
+            lo = bisect.bisect_left(index, (since.timestamp(),)) if since else 0
+            hi = len(index)
+            if until:
+                hi = bisect.bisect_left(index, (until.timestamp(),))
+            if cursor:
+                hi = min(hi, bisect.bisect_left(index, tuple(cursor)))
+
+            # 从游标位置向前扫描，只访问本页需要的订单
+            orders: List[Order] = []
+            i = hi - 1
+            while i >= lo and len(orders) < limit:
+                orders.append(self._orders[index[i][1]])
+                i -= 1
+
+        # 本页已满且范围内仍有未扫描的订单时返回下一页游标
+        next_cursor = order_sort_key(orders[-1]) if len(orders) == limit and i >= lo else None
+        return orders, next_cursor
+
+def create_order_repository() -> OrderRepository:
+    """根据ORDER_STORE配置创建订单存储（memory或sqlite）"""
+    store = os.environ.get("ORDER_STORE", "memory").lower()
+    if store == "sqlite":
+        from repositories.sqlite_connection import get_default_db_path
+        from repositories.sqlite_order_repository import SqliteOrderRepository
+        return SqliteOrderRepository(get_default_db_path())
+    if store == "memory":
+        max_orders = os.environ.get("ORDER_RETENTION_MAX_ORDERS", "10000")
+        max_age = os.environ.get("ORDER_RETENTION_MAX_AGE", "86400")
+        archive_dir = os.environ.get("ORDER_ARCHIVE_DIR") or os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "archive")
+        return InMemoryOrderRepository(
+            max_orders=int(max_orders) if int(max_orders) > 0 else None,
+            max_age=float(max_age) if float(max_age) > 0 else None,
+            archive=OrderArchive(archive_dir)
+        )
+    raise ValueError(f"不支持的订单存储类型: {store}")
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable, List
+
+def get_default_db_path() -> str:
+    """SQLite数据库路径，由ORDER_DB_PATH配置，默认 data/orders.db"""
+    return os.environ.get("ORDER_DB_PATH") or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "orders.db")
+
+class SqliteConnectionPool:
+    """SQLite连接池（WAL模式），每个线程复用一个连接"""
+
+    def __init__(self, db_path: str, timeout: float = 5.0, schema: Iterable[str] = ()):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self.get()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in schema:
+                conn.execute(statement)
+
+    def get(self) -> sqlite3.Connection:
+        """获取当前线程的连接"""
+        if self._pid != os.getpid():
+            # fork后的子进程不能复用父进程的连接
+            self._pid = os.getpid()
+            self._local = threading.local()
+            self._connections = []
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # 连接只在创建它的线程中使用，关闭时可能来自其他线程
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, cached_statements=64,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,65 @@
+from typing import Dict, Optional
+from repositories.inventory_repository import InventoryRepository, StockKey
+from repositories.sqlite_connection import SqliteConnectionPool
+
+class SqliteInventoryRepository(InventoryRepository):
+    """SQLite库存存储，多个worker共享同一份库存"""
+
+    _SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS inventory (
+            kind TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            stock INTEGER NOT NULL,
+            PRIMARY KEY (kind, item_id)
+        )""",
+    )
+    # 已有记录不覆盖，重启后保留当前库存
+    _SEED = "INSERT OR IGNORE INTO inventory (kind, item_id, stock) VALUES (?, ?, ?)"
+    _DECREMENT = "UPDATE inventory SET stock = stock - ? WHERE kind = ? AND item_id = ? AND stock >= ?"
+    _INCREMENT = "UPDATE inventory SET stock = stock + ? WHERE kind = ? AND item_id = ?"
+    _UPSERT = ("INSERT INTO inventory (kind, item_id, stock) VALUES (?, ?, ?) "
+               "ON CONFLICT (kind, item_id) DO UPDATE SET stock = stock + excluded.stock")
+    _SELECT_ONE = "SELECT stock FROM inventory WHERE kind = ? AND item_id = ?"
+    _SELECT_ALL = "SELECT kind, item_id, stock FROM inventory"
+
+    def __init__(self, db_path: str, initial: Dict[StockKey, int], timeout: float = 5.0):
+        self._pool = SqliteConnectionPool(db_path, timeout, self._SCHEMA)
+        conn = self._pool.get()
+        with conn:
+            conn.executemany(self._SEED, [(kind, item_id, stock) for (kind, item_id), stock in initial.items()])
+        # 登记商品集合，未登记的商品不限量
+        self._tracked = set(self.levels())
+
+    def reserve(self, items: Dict[StockKey, int]) -> Optional[StockKey]:
+        conn = self._pool.get()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for (kind, item_id), quantity in items.items():
+                if (kind, item_id) not in self._tracked:
+                    continue
+                cursor = conn.execute(self._DECREMENT, (quantity, kind, item_id, quantity))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return (kind, item_id)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return None
+
+    def release(self, items: Dict[StockKey, int]):
+        conn = self._pool.get()
+        with conn:
+            conn.executemany(self._INCREMENT, [(quantity, kind, item_id)
+                                               for (kind, item_id), quantity in items.items()])
+
+    def restock(self, key: StockKey, quantity: int) -> int:
+        conn = self._pool.get()
+        with conn:
+            conn.execute(self._UPSERT, (key[0], key[1], quantity))
+        self._tracked.add(key)
+        return conn.execute(self._SELECT_ONE, key).fetchone()[0]
+
+    def levels(self) -> Dict[StockKey, int]:
+        rows = self._pool.get().execute(self._SELECT_ALL).fetchall()
+        return {(kind, item_id): stock for kind, item_id, stock in rows}
@@ -0,0 +1,309 @@
+import json
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from models.order import Order, OrderStatus
+from repositories.order_repository import Cursor, HourlyCondiments, HourlySales, IdempotencyRecord, OrderRepository
+from repositories.sqlite_connection import SqliteConnectionPool
+
+class SqliteOrderRepository(OrderRepository):
+    """SQLite订单存储（WAL模式，多进程/多线程共享）"""
+
+    # 语句保持固定文本，由sqlite3按连接缓存预编译结果
+    _SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS orders (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            payload TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at, id)",
+        """CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            order_id TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            fingerprint TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at)",
+        # 按小时的销售汇总，与订单在同一事务中更新；小时为本地创建时间的前13个字符（YYYY-MM-DDTHH）
+        """CREATE TABLE IF NOT EXISTS sales_hourly (
+            hour TEXT NOT NULL,
+            status TEXT NOT NULL,
+            beverage_id TEXT NOT NULL,
+            orders INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (hour, status, beverage_id)
+        ) WITHOUT ROWID""",
+        # 按小时的配料添加数，只统计未取消的订单
+        """CREATE TABLE IF NOT EXISTS condiments_hourly (
+            hour TEXT NOT NULL,
+            condiment_id TEXT NOT NULL,
+            orders INTEGER NOT NULL,
+            PRIMARY KEY (hour, condiment_id)
+        ) WITHOUT ROWID""",
+    )
+    # 汇总表的版本，低于该值的数据库在启动时从订单回填汇总
+    _SCHEMA_VERSION = 1
+    _INSERT = "INSERT INTO orders (id, status, created_at, payload) VALUES (?, ?, ?, ?)"
+    _SELECT_ONE = "SELECT payload, status FROM orders WHERE id = ?"
+    _SELECT_ALL = "SELECT payload, status FROM orders ORDER BY created_at, id"
+    _UPDATE_STATUS = "UPDATE orders SET status = ? WHERE id = ?"
+    _INSERT_KEY = "INSERT OR IGNORE INTO idempotency_keys (key, order_id, created_at, fingerprint) VALUES (?, ?, ?, ?)"
+    _SELECT_KEY = "SELECT order_id, fingerprint FROM idempotency_keys WHERE key = ? AND created_at >= ?"
+    _DELETE_EXPIRED_KEY = "DELETE FROM idempotency_keys WHERE key = ? AND created_at < ?"
+    _DELETE_EXPIRED_KEYS = "DELETE FROM idempotency_keys WHERE created_at < ?"
+    _SELECT_OLDEST_BY_STATUS = "SELECT id FROM orders WHERE status = ? ORDER BY created_at, id LIMIT 1"
+    _ADD_SALES = (
+        "INSERT INTO sales_hourly (hour, status, beverage_id, orders, revenue) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (hour, status, beverage_id) DO UPDATE SET "
+        "orders = orders + excluded.orders, revenue = revenue + excluded.revenue"
+    )
+    _ADD_CONDIMENT = (
+        "INSERT INTO condiments_hourly (hour, condiment_id, orders) VALUES (?, ?, ?) "
+        "ON CONFLICT (hour, condiment_id) DO UPDATE SET orders = orders + excluded.orders"
+    )
+    _SELECT_SALES = "SELECT hour, status, beverage_id, orders, revenue FROM sales_hourly WHERE hour >= ? AND hour <= ?"
+    _SELECT_CONDIMENTS = "SELECT hour, condiment_id, orders FROM condiments_hourly WHERE hour >= ? AND hour <= ?"
+    # 回填汇总：小时取自订单JSON中的本地创建时间，与增量更新的分桶一致
+    _BACKFILL_SALES = (
+        "INSERT INTO sales_hourly (hour, status, beverage_id, orders, revenue) "
+        "SELECT substr(json_extract(payload, '$.created_at'), 1, 13), status, "
+        "json_extract(payload, '$.beverage.id'), COUNT(*), COALESCE(SUM(json_extract(payload, '$.total')), 0) "
+        "FROM orders GROUP BY 1, 2, 3"
+    )
+    _BACKFILL_CONDIMENTS = (
+        "INSERT INTO condiments_hourly (hour, condiment_id, orders) "
+        "SELECT substr(json_extract(orders.payload, '$.created_at'), 1, 13), json_extract(condiment.value, '$.id'), "
+        "COUNT(DISTINCT orders.id) FROM orders, json_each(orders.payload, '$.condiments') AS condiment "
+        "WHERE orders.status != ? GROUP BY 1, 2"
+    )
+    # 汇总查询的小时范围默认值，覆盖全部小时
+    _MIN_HOUR = "0000-00-00T00"
+    _MAX_HOUR = "9999-99-99T99"
+
+    def __init__(self, db_path: str, timeout: float = 5.0):
+        self.db_path = db_path
+        self._pool = SqliteConnectionPool(db_path, timeout, self._SCHEMA)
+        self._last_key_cleanup = 0.0
+        self._migrate()
+
+    def _migrate(self):
+        """为旧版本创建的数据库补充新增的列，并从已有订单回填销售汇总"""
+        conn = self._get_connection()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(idempotency_keys)")}
+        if "fingerprint" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE idempotency_keys ADD COLUMN fingerprint TEXT")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < self._SCHEMA_VERSION:
+            # 多个worker同时启动时由写锁串行，只有第一个执行回填
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] < self._SCHEMA_VERSION:
+                    self._backfill_sales(conn)
+                    conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _backfill_sales(self, conn) -> int:
+        """清空并按全部订单重新计算销售汇总（调用方需已开启写事务），返回订单数"""
+        conn.execute("DELETE FROM sales_hourly")
+        conn.execute("DELETE FROM condiments_hourly")
+        conn.execute(self._BACKFILL_SALES)
+        conn.execute(self._BACKFILL_CONDIMENTS, (OrderStatus.CANCELLED,))
+        return conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def _add_sales(self, conn, order: Order, status: str, sign: int):
+        """把订单按指定状态计入（sign=1）或移出（sign=-1）销售汇总"""
+        hour = order.created_at.strftime("%Y-%m-%dT%H")
+        conn.execute(self._ADD_SALES, (hour, status, order.line.beverage.id, sign, sign * order.total_price))
+        if status != OrderStatus.CANCELLED:
+            conn.executemany(self._ADD_CONDIMENT, [
+                (hour, condiment_id, sign) for condiment_id in {condiment.id for condiment, _ in order.line.condiments}
+            ])
+
+    def _insert(self, conn, order: Order):
+        """写入订单并计入销售汇总（调用方需在事务中）"""
+        conn.execute(self._INSERT, self._to_row(order))
+        self._add_sales(conn, order, order.status, 1)
+
+    def _transition(self, conn, order: Order, status: str):
+        """更新订单状态并调整销售汇总（调用方需持有写锁）"""
+        conn.execute(self._UPDATE_STATUS, (status, order.id))
+        if order.status != OrderStatus.CANCELLED or status != OrderStatus.CANCELLED:
+            self._add_sales(conn, order, order.status, -1)
+            self._add_sales(conn, order, status, 1)
+        order.status = status
+
+    def _change_status(self, order_id: str, status: str, expected: Optional[str] = None) -> Optional[Order]:
+        """在写事务中读取订单并更新状态，指定expected时仅在当前状态匹配时更新"""
+        conn = self._get_connection()
+        # 立即获取写锁，读取的旧状态与汇总的调整保持一致
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(self._SELECT_ONE, (order_id,)).fetchone()
+            order = None
+            if row and (expected is None or row[1] == expected):
+                order = self._load(*row)
+                self._transition(conn, order, status)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return order
+
+    def _get_connection(self):
+        return self._pool.get()
+
+    @staticmethod
+    def _load(payload: str, status: str) -> Order:
+        """从存储的JSON恢复订单"""
+        order = Order.from_dict(json.loads(payload))
+        order.status = status
+        return order
+
+    @staticmethod
+    def _to_row(order: Order) -> tuple:
+        return (
+            order.id,
+            order.status,
+            order.created_at.timestamp(),
+            json.dumps(order.to_dict(), ensure_ascii=False)
+        )
+
+    def add(self, order: Order):
+        conn = self._get_connection()
+        with conn:
+            self._insert(conn, order)
+
+    def add_many(self, orders: List[Order]):
+        # 同一事务内批量插入
+        conn = self._get_connection()
+        with conn:
+            conn.executemany(self._INSERT, [self._to_row(order) for order in orders])
+            for order in orders:
+                self._add_sales(conn, order, order.status, 1)
+
+    # 清理过期幂等键的间隔（秒）
+    KEY_CLEANUP_INTERVAL = 300
+
+    def add_idempotent(self, order: Order, idempotency_key: str, ttl: float,
+                       fingerprint: Optional[str] = None) -> IdempotencyRecord:
+        now = time.time()
+        conn = self._get_connection()
+        # 键和订单在同一事务中写入，并发的重复请求只有一个能插入成功
+        with conn:
+            if now - self._last_key_cleanup >= self.KEY_CLEANUP_INTERVAL:
+                self._last_key_cleanup = now
+                conn.execute(self._DELETE_EXPIRED_KEYS, (now - ttl,))
+            else:
+                conn.execute(self._DELETE_EXPIRED_KEY, (idempotency_key, now - ttl))
+            cursor = conn.execute(self._INSERT_KEY, (idempotency_key, order.id, now, fingerprint))
+            if cursor.rowcount:
+                self._insert(conn, order)
+                return IdempotencyRecord(order, fingerprint)
+            existing_id, existing_fingerprint = conn.execute(self._SELECT_KEY, (idempotency_key, now - ttl)).fetchone()
+        return IdempotencyRecord(self.get(existing_id), existing_fingerprint)
+
+    def find_by_idempotency_key(self, idempotency_key: str, ttl: float) -> Optional[IdempotencyRecord]:
+        row = self._get_connection().execute(self._SELECT_KEY, (idempotency_key, time.time() - ttl)).fetchone()
+        return IdempotencyRecord(self.get(row[0]), row[1]) if row else None
+
+    def get(self, order_id: str) -> Optional[Order]:
+        row = self._get_connection().execute(self._SELECT_ONE, (order_id,)).fetchone()
+        return self._load(*row) if row else None
+
+    def update_status(self, order_id: str, status: str) -> Optional[Order]:
+        return self._change_status(order_id, status)
+
+    def compare_and_set_status(self, order_id: str, expected: str, status: str) -> Optional[Order]:
+        return self._change_status(order_id, status, expected)
+
+    def claim_next(self, from_status: str, to_status: str) -> Optional[Order]:
+        conn = self._get_connection()
+        # 立即获取写锁，保证多个worker不会取到同一订单
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            order = None
+            row = conn.execute(self._SELECT_OLDEST_BY_STATUS, (from_status,)).fetchone()
+            if row:
+                order = self._load(*conn.execute(self._SELECT_ONE, (row[0],)).fetchone())
+                self._transition(conn, order, to_status)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return order
+
+    def list_all(self) -> List[Order]:
+        rows = self._get_connection().execute(self._SELECT_ALL).fetchall()
+        return [self._load(payload, status) for payload, status in rows]
+
+    @staticmethod
+    def _parse_hour(value: str) -> datetime:
+        return datetime.strptime(value, "%Y-%m-%dT%H")
+
+    maintains_sales_rollup = True
+
+    def sales_by_hour(self, since: Optional[datetime] = None, until: Optional[datetime] = None
+                      ) -> Tuple[List[HourlySales], List[HourlyCondiments]]:
+        # 读取随写入维护的汇总表，行数只与小时数和商品数相关
+        bounds = (since.strftime("%Y-%m-%dT%H") if since else self._MIN_HOUR,
+                  until.strftime("%Y-%m-%dT%H") if until else self._MAX_HOUR)
+        conn = self._get_connection()
+        with conn:
+            # 两张表在同一个读事务中读取，结果对应同一时刻
+            conn.execute("BEGIN")
+            sales = [(self._parse_hour(hour), status, beverage_id, count, revenue)
+                     for hour, status, beverage_id, count, revenue in conn.execute(self._SELECT_SALES, bounds)]
+            condiments = [(self._parse_hour(hour), condiment_id, count)
+                          for hour, condiment_id, count in conn.execute(self._SELECT_CONDIMENTS, bounds)]
+        return sales, condiments
+
+    def rebuild_sales_by_hour(self) -> int:
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = self._backfill_sales(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return count
+
+    def list_page(self, limit: int, cursor: Optional[Cursor] = None, status: Optional[str] = None,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None
+                  ) -> Tuple[List[Order], Optional[Cursor]]:
+        conditions = []
+        params: list = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if since:
+            conditions.append("created_at >= ?")
+            params.append(since.timestamp())
+        if until:
+            conditions.append("created_at < ?")
+            params.append(until.timestamp())
+        if cursor:
+            conditions.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+
+        # 条件组合有限，生成的语句文本固定，可命中语句缓存
+        sql = "SELECT payload, status, created_at, id FROM orders"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._get_connection().execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][2], rows[-1][3])
+        return [self._load(payload, row_status) for payload, row_status, _, _ in rows], next_cursor
+
+    def close(self):
+        self._pool.close()
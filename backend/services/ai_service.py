@@ -1,26 +1,289 @@
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Any, Tuple
+import asyncio
+import hashlib
 import os
 import json
+import threading
+import weakref
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import random
 import re
 from constants import AUTO_SELECT_TEMPLATE
+from services.catalog_service import get_catalog
+from services.recommendation_cache import PreferenceNormalizer, RecommendationCache, RecommendationKey
+from utils.singleflight import AsyncSingleFlight, SingleFlight
 
 # 加载环境变量
 load_dotenv()
 
+# 流式对话事件：(事件名, 数据)
+ChatEvent = Tuple[str, Dict[str, Any]]
+
+# 上游限流或临时故障时重试的状态码
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class BoundedRetry(Retry):
+    """限制Retry-After等待时间的重试策略
+
+    上游要求等待的时间超过max_retry_after时不再重试，直接返回该响应，避免长时间占用worker。
+    """
+
+    def __init__(self, *args, max_retry_after: float = 60.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs) -> 'BoundedRetry':
+        retry = super().new(**kwargs)
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None and self.respect_retry_after_header:
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None and retry_after > self.max_retry_after:
+                raise MaxRetryError(_pool, url, ResponseError(f"Retry-After {retry_after:g}s 超过等待上限"))
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+def create_http_session(pool_size: int, max_retries: int, backoff: float,
+                        max_retry_after: float) -> requests.Session:
+    """创建带连接池和重试的HTTP会话，连接保持长连接复用，避免每次请求重新握手"""
+    retry = BoundedRetry(
+        total=max_retries,
+        connect=max_retries,
+        # 请求已发出后的读取失败不重试，避免上游卡住时等待时间成倍增加
+        read=0,
+        status=max_retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS_CODES,
+        # 对话补全请求没有副作用，允许重试POST
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+        max_retry_after=max_retry_after,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 class ModelProvider:
-    """大模型提供者基类"""
+    """大模型提供者基类
+    
+    每个提供者持有一个带连接池的HTTP会话，所有请求复用连接；
+    异步接口使用独立的httpx异步客户端，供ASGI入口在事件循环上并发调用。
+    """
+    
+    # 子类覆盖：提供商名称、错误前缀、默认接口地址
+    PROVIDER_NAME = ""
+    ERROR_LABEL = ""
+    DEFAULT_BASE_URL = ""
     
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.environ.get(f"{self.__class__.__name__.upper()}_API_KEY")
+        prefix = self.__class__.__name__.upper()
+        self.api_key = api_key or os.environ.get(f"{prefix}_API_KEY")
         self.is_available = bool(self.api_key)
         self.models = []
+        # 接口地址可通过环境变量覆盖（如指向本地的模拟服务）
+        self.base_url = os.environ.get(f"{prefix}_BASE_URL") or self.DEFAULT_BASE_URL
+        # 连接和读取超时（秒），上游无响应时不会一直占用worker
+        self.timeout: Tuple[float, float] = (
+            float(os.environ.get("AI_CONNECT_TIMEOUT", "5")),
+            float(os.environ.get("AI_READ_TIMEOUT", "60"))
+        )
+        self.max_retries = int(os.environ.get("AI_MAX_RETRIES", "2"))
+        self.retry_backoff = float(os.environ.get("AI_RETRY_BACKOFF", "0.5"))
+        # 重试前按Retry-After等待的上限（秒），默认为读取超时；上游要求等待更久时不再重试
+        self.max_retry_after = float(os.environ.get("AI_MAX_RETRY_AFTER") or self.timeout[1])
+        self.session = create_http_session(
+            pool_size=int(os.environ.get("AI_POOL_SIZE", "10")),
+            max_retries=self.max_retries,
+            backoff=self.retry_backoff,
+            max_retry_after=self.max_retry_after
+        )
+        # 异步客户端的连接绑定创建它的事件循环，按事件循环分别创建，事件循环被回收后客户端随之释放
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._async_lock = threading.Lock()
+    
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+    
+    def _post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """通过连接池发送请求并返回JSON结果，HTTP错误时抛出异常"""
+        response = self.session.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环上的异步客户端"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            pool_size = int(os.environ.get("AI_ASYNC_POOL_SIZE", "100"))
+            connect_timeout, read_timeout = self.timeout
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            )
+            with self._async_lock:
+                # 已关闭的事件循环上的客户端无法再使用，不再保留
+                for closed in [other for other in self._async_clients if other.is_closed()]:
+                    del self._async_clients[closed]
+                self._async_clients[loop] = client
+        return client
+    
+    async def _asend(self, url: str, payload: Dict[str, Any], stream: bool = False) -> httpx.Response:
+        """异步发送请求，重试策略与同步会话一致；HTTP错误时抛出异常"""
+        client = self._get_async_client()
+        request = client.build_request("POST", url, headers=self._headers(), json=payload)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.send(request, stream=stream)
+            except httpx.ConnectError:
+                # 只重试连接失败，请求已发出后的读取失败不重试
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                continue
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = self._retry_delay(response, attempt)
+                if delay is not None:
+                    await response.aclose()
+                    await asyncio.sleep(delay)
+                    continue
+            if response.is_error:
+                await response.aclose()
+                response.raise_for_status()
+            return response
+    
+    async def _apost(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """异步发送请求并返回JSON结果"""
+        response = await self._asend(url, payload)
+        return response.json()
+    
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> Optional[float]:
+        """重试等待时间，优先使用上游返回的Retry-After；超过等待上限时返回None，不再重试"""
+        retry_after = response.headers.get("Retry-After")
+        try:
+            delay = max(float(retry_after), 0.0) if retry_after else None
+        except ValueError:
+            delay = None
+        if delay is None:
+            return self.retry_backoff * (2 ** attempt)
+        return delay if delay <= self.max_retry_after else None
+    
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+    
+    async def aclose(self):
+        """关闭当前事件循环上的异步客户端"""
+        with self._async_lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    def resolve_model(self, model: Optional[str]) -> str:
+        """使用指定模型或默认使用第一个模型"""
+        return model if model and model in self.models else self.models[0]
+    
+    def _build_payload(self, prompt: str, model: Optional[str], **kwargs) -> Tuple[str, Dict[str, Any]]:
+        """选择模型并构造对话补全请求"""
+        use_model = self.resolve_model(model)
+        payload = {
+            "model": use_model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": kwargs.get("temperature", 0.7),
+            "max_tokens": kwargs.get("max_tokens", 500)
+        }
+        return use_model, payload
+    
+    def _parse_result(self, result: Dict[str, Any], use_model: str) -> Dict[str, Any]:
+        return {
+            "content": result["choices"][0]["message"]["content"],
+            "model": use_model,
+            "provider": self.PROVIDER_NAME
+        }
         
     def get_response(self, prompt: str, model: Optional[str] = None, **kwargs) -> Dict[str, Any]:
         """获取模型响应"""
-        raise NotImplementedError("子类必须实现此方法")
+        if not self.is_available:
+            return {"error": "API密钥未配置"}
+        
+        use_model, payload = self._build_payload(prompt, model, **kwargs)
+        try:
+            return self._parse_result(self._post(self.base_url, payload), use_model)
+        except Exception as e:
+            return {"error": f"{self.ERROR_LABEL}: {str(e)}"}
+    
+    async def aget_response(self, prompt: str, model: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """异步获取模型响应，等待上游期间不占用线程"""
+        if not self.is_available:
+            return {"error": "API密钥未配置"}
+        
+        use_model, payload = self._build_payload(prompt, model, **kwargs)
+        try:
+            return self._parse_result(await self._apost(self.base_url, payload), use_model)
+        except Exception as e:
+            # httpx的超时异常没有消息，改用异常类型名
+            return {"error": f"{self.ERROR_LABEL}: {str(e) or type(e).__name__}"}
+    
+    @staticmethod
+    def _parse_stream_line(line: str) -> Optional[str]:
+        """解析流式响应的一行SSE数据，返回本段文本；流结束时返回None"""
+        if not line.startswith("data:"):
+            return ""
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None
+        choices = json.loads(data).get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+    
+    def stream_response(self, prompt: str, model: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """流式获取模型响应，逐段返回生成的文本；上游出错时抛出异常"""
+        if not self.is_available:
+            raise ValueError("API密钥未配置")
+        
+        _, payload = self._build_payload(prompt, model, **kwargs)
+        payload["stream"] = True
+        with self.session.post(self.base_url, headers=self._headers(), json=payload,
+                               timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            # chunk_size=None：按上游发送的分块读取，收到即转发
+            for line in response.iter_lines(chunk_size=None):
+                content = self._parse_stream_line(line.decode("utf-8"))
+                if content is None:
+                    break
+                if content:
+                    yield content
+    
+    async def astream_response(self, prompt: str, model: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        """异步流式获取模型响应，逐段返回生成的文本；上游出错时抛出异常"""
+        if not self.is_available:
+            raise ValueError("API密钥未配置")
+        
+        _, payload = self._build_payload(prompt, model, **kwargs)
+        payload["stream"] = True
+        response = await self._asend(self.base_url, payload, stream=True)
+        try:
+            async for line in response.aiter_lines():
+                content = self._parse_stream_line(line)
+                if content is None:
+                    break
+                if content:
+                    yield content
+        finally:
+            await response.aclose()
     
     def generate_code(self, prompt: str, model: Optional[str] = None) -> str:
         """生成JavaScript代码"""
@@ -33,6 +296,10 @@ class ModelProvider:
 class GPTProvider(ModelProvider):
     """OpenAI GPT API提供者"""
     
+    PROVIDER_NAME = "OpenAI"
+    ERROR_LABEL = "GPT API错误"
+    DEFAULT_BASE_URL = "https://api.openai.com/v1/chat/completions"
+    
     def __init__(self, api_key: Optional[str] = None):
         super().__init__(api_key)
         # 从环境变量加载模型列表
@@ -41,41 +308,6 @@ class GPTProvider(ModelProvider):
             self.models = json.loads(models_str)
         except json.JSONDecodeError:
             self.models = ["gpt-3.5-turbo"]
-        
-        self.base_url = "https://api.openai.com/v1/chat/completions"
-        
-    def get_response(self, prompt: str, model: Optional[str] = None, **kwargs) -> Dict[str, Any]:
-        """获取GPT响应"""
-        if not self.is_available:
-            return {"error": "API密钥未配置"}
-        
-        # 使用指定模型或默认使用第一个模型
-        use_model = model if model and model in self.models else self.models[0]
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": use_model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": kwargs.get("temperature", 0.7),
-            "max_tokens": kwargs.get("max_tokens", 500)
-        }
-        
-        try:
-            response = requests.post(self.base_url, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            
-            return {
-                "content": result["choices"][0]["message"]["content"],
-                "model": use_model,
-                "provider": "OpenAI"
-            }
-        except Exception as e:
-            return {"error": f"GPT API错误: {str(e)}"}
             
     def generate_code(self, prompt: str, model: Optional[str] = None) -> str:
         """生成JavaScript代码，使用AUTO_SELECT_TEMPLATE模板"""
@@ -179,6 +411,10 @@ class GPTProvider(ModelProvider):
 class DeepseekProvider(ModelProvider):
     """Deepseek API提供者"""
     
+    PROVIDER_NAME = "Deepseek"
+    ERROR_LABEL = "Deepseek API错误"
+    DEFAULT_BASE_URL = "https://api.deepseek.com/v1/chat/completions"  # 示例URL，可能需要调整
+    
     def __init__(self, api_key: Optional[str] = None):
         super().__init__(api_key)
         # 从环境变量加载模型列表
@@ -188,46 +424,54 @@ class DeepseekProvider(ModelProvider):
         except json.JSONDecodeError:
             self.models = ["deepseek-chat"]
             
-        self.base_url = "https://api.deepseek.com/v1/chat/completions"  # 示例URL，可能需要调整
-        
-    def get_response(self, prompt: str, model: Optional[str] = None, **kwargs) -> Dict[str, Any]:
-        """获取Deepseek响应"""
-        if not self.is_available:
-            return {"error": "API密钥未配置"}
-        
-        # 使用指定模型或默认使用第一个模型
-        use_model = model if model and model in self.models else self.models[0]
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": use_model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": kwargs.get("temperature", 0.7),
-            "max_tokens": kwargs.get("max_tokens", 500)
-        }
-        
-        try:
-            response = requests.post(self.base_url, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            
-            return {
-                "content": result["choices"][0]["message"]["content"],
-                "model": use_model,
-                "provider": "Deepseek"
-            }
-        except Exception as e:
-            return {"error": f"Deepseek API错误: {str(e)}"}
-            
     def generate_code(self, prompt: str, model: Optional[str] = None) -> str:
         """生成JavaScript代码，使用AUTO_SELECT_TEMPLATE模板"""
-        # 复用GPTProvider的代码生成逻辑
-        gpt_provider = GPTProvider(self.api_key)
-        return gpt_provider.generate_code(prompt, model)
+        # 复用GPTProvider的代码生成逻辑，请求仍通过本提供者的连接池发送
+        return GPTProvider.generate_code(self, prompt, model)
+
+# 进程内共享的大模型提供者（推荐服务和聊天机器人共用连接池）
+_model_providers: Optional[Dict[str, ModelProvider]] = None
+_model_providers_lock = threading.Lock()
+
+def get_model_providers() -> Dict[str, ModelProvider]:
+    """获取共享的大模型提供者，首次调用时创建"""
+    global _model_providers
+    providers = _model_providers
+    if providers is None:
+        with _model_providers_lock:
+            if _model_providers is None:
+                _model_providers = {
+                    'gpt': GPTProvider(),
+                    'deepseek': DeepseekProvider()
+                }
+            providers = _model_providers
+    return providers
+
+def select_provider(model_providers: Dict[str, ModelProvider], available_providers: List[str],
+                    provider_name: Optional[str],
+                    model_name: Optional[str]) -> Tuple[Optional[ModelProvider], Optional[str]]:
+    """选择提供者和模型：未指定或不可用的提供商改用第一个可用的，不支持的模型改用默认模型"""
+    if not provider_name or provider_name not in available_providers:
+        provider_name = next(iter(available_providers)) if available_providers else None
+    if not provider_name:
+        return None, None
+    
+    provider = model_providers[provider_name]
+    if model_name and model_name not in provider.get_available_models():
+        model_name = None
+    return provider, model_name
+
+def prompt_key(provider: ModelProvider, model_name: Optional[str], prompt: str, **kwargs) -> Tuple[str, str, str]:
+    """合并并发请求的键：(提供商, 模型, 提示词和参数的哈希)"""
+    digest = hashlib.sha256(json.dumps([prompt, kwargs], ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    return provider.PROVIDER_NAME, provider.resolve_model(model_name), digest
+
+def flight_stats(*flights) -> Dict[str, int]:
+    """合并请求的统计：calls为请求次数，coalesced为等待其他相同请求结果、未单独调用上游的次数"""
+    return {
+        "calls": sum(flight.calls for flight in flights),
+        "coalesced": sum(flight.coalesced for flight in flights)
+    }
 
 class AiRecommendationService:
     """饮料推荐AI服务"""
@@ -241,11 +485,8 @@ class AiRecommendationService:
             data = json.load(f)
             self.default_recommendations = data.get("recommendations", [])
         
-        # 初始化大模型提供者
-        self.model_providers = {
-            'gpt': GPTProvider(),
-            'deepseek': DeepseekProvider()
-        }
+        # 共享的大模型提供者
+        self.model_providers = get_model_providers()
         
         # 获取可用的提供商和模型
         self.available_providers = [name for name, provider in self.model_providers.items() 
@@ -253,35 +494,29 @@ class AiRecommendationService:
         self.provider_models = {name: provider.get_available_models() 
                               for name, provider in self.model_providers.items() 
                               if provider.is_available}
+        
+        # 推荐缓存：容量为0时不缓存，设置数据库路径时启用磁盘层
+        cache_size = int(os.environ.get("RECOMMENDATION_CACHE_SIZE", "1024"))
+        self.normalizer = PreferenceNormalizer.load()
+        self.cache = RecommendationCache(
+            max_size=cache_size,
+            ttl=float(os.environ.get("RECOMMENDATION_CACHE_TTL", "3600")),
+            db_path=os.environ.get("RECOMMENDATION_CACHE_DB") or None
+        ) if cache_size > 0 else None
+        # 相同提示词的并发请求只调用一次上游
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+    
+    def flight_stats(self) -> Dict[str, int]:
+        return flight_stats(self.flight, self.async_flight)
     
     def get_recommendation(self):
         """获取随机推荐"""
         return random.choice(self.default_recommendations)
     
-    def get_ai_recommendation(self, user_preference: str, provider_name: Optional[str] = None, 
-                            model_name: Optional[str] = None, template: Optional[str] = None):
-        """使用大模型生成推荐"""
-        # 如果未指定或指定的提供商不可用，则使用默认提供商
-        if not provider_name or provider_name not in self.available_providers:
-            provider_name = next(iter(self.available_providers)) if self.available_providers else None
-        
-        # 如果没有可用提供商，返回默认推荐
-        if not provider_name:
-            default_rec = self.get_recommendation()
-            return {
-                "recommendation": default_rec, 
-                "code": None, 
-                "model_info": {"error": "没有可用的AI模型提供商"}
-            }
-        
-        provider = self.model_providers[provider_name]
-        
-        # 检查模型是否可用
-        if model_name and model_name not in provider.get_available_models():
-            model_name = None
-        
-        # 生成推荐提示
-        prompt = f"""根据用户喜好，推荐一款饮料和配料组合。
+    def build_prompt(self, user_preference: str) -> str:
+        """生成推荐提示"""
+        return f"""根据用户喜好，推荐一款饮料和配料组合。
 可用的饮料: coffee(经典咖啡), latte(拿铁咖啡), mocha(摩卡咖啡), americano(美式咖啡), blackTea(红茶), cola(可乐), sprite(雪碧), orangeJuice(鲜榨橙汁), appleJuice(苹果汁)
 可用的配料: milk(牛奶), cream(奶油), sugar(糖), honey(蜂蜜), ice(冰块), vanilla(香草), caramel(焦糖), chocolate(巧克力), cinnamon(肉桂), soymilk(豆浆), coconut(椰子)
 
@@ -301,91 +536,170 @@ class AiRecommendationService:
 
 用户喜好: {user_preference}
 """
+    
+    def _no_provider_result(self) -> Dict[str, Any]:
+        """没有可用提供商时返回默认推荐"""
+        return {
+            "recommendation": self.get_recommendation(), 
+            "code": None, 
+            "model_info": {"error": "没有可用的AI模型提供商"}
+        }
+    
+    def _cache_key(self, provider: ModelProvider, model_name: Optional[str],
+                   user_preference: str) -> Optional[RecommendationKey]:
+        """推荐缓存的键，未启用缓存时返回None"""
+        if self.cache is None:
+            return None
+        return (provider.PROVIDER_NAME, provider.resolve_model(model_name),
+                self.normalizer.normalize(user_preference), get_catalog().version)
+    
+    def _cached_result(self, key: Optional[RecommendationKey], template: Optional[str]) -> Optional[Dict[str, Any]]:
+        """命中缓存时用缓存的推荐重新生成代码（模板可能不同）"""
+        if key is None:
+            return None
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        recommendation = entry["recommendation"]
+        return {
+            "recommendation": recommendation,
+            "code": self.render_code(recommendation, template),
+            "model_info": dict(entry["model_info"], cached=True)
+        }
+    
+    def get_ai_recommendation(self, user_preference: str, provider_name: Optional[str] = None, 
+                            model_name: Optional[str] = None, template: Optional[str] = None):
+        """使用大模型生成推荐，相同喜好的推荐优先从缓存返回"""
+        provider, model_name = select_provider(self.model_providers, self.available_providers,
+                                               provider_name, model_name)
+        if provider is None:
+            return self._no_provider_result()
+        
+        key = self._cache_key(provider, model_name, user_preference)
+        cached = self._cached_result(key, template)
+        if cached is not None:
+            return cached
+        
+        prompt = self.build_prompt(user_preference)
+        response = self.flight.do(prompt_key(provider, model_name, prompt),
+                                  lambda: provider.get_response(prompt, model_name))
+        return self._build_result(response, template, key)
+    
+    async def aget_ai_recommendation(self, user_preference: str, provider_name: Optional[str] = None,
+                                     model_name: Optional[str] = None, template: Optional[str] = None):
+        """使用大模型异步生成推荐，相同喜好的推荐优先从缓存返回"""
+        provider, model_name = select_provider(self.model_providers, self.available_providers,
+                                               provider_name, model_name)
+        if provider is None:
+            return self._no_provider_result()
+        
+        key = self._cache_key(provider, model_name, user_preference)
+        cached = self._cached_result(key, template)
+        if cached is not None:
+            return cached
+        
+        prompt = self.build_prompt(user_preference)
+        response = await self.async_flight.do(prompt_key(provider, model_name, prompt),
+                                              lambda: provider.aget_response(prompt, model_name))
+        return self._build_result(response, template, key)
+    
+    @staticmethod
+    def parse_recommendation(content: str) -> Dict[str, Any]:
+        """从模型回复中提取推荐JSON"""
+        # 查找JSON内容
+        json_match = re.search(r'({[\s\S]*})', content)
+        if json_match:
+            content = json_match.group(1)
+        return json.loads(content)
+    
+    @staticmethod
+    def render_code(recommendation: Dict[str, Any], template: Optional[str] = None) -> str:
+        """根据推荐生成自动选择的JavaScript代码"""
+        beverage_id = recommendation.get('beverage', '')
+        condiments_list = recommendation.get('condiments', [])
         
-        response = provider.get_response(prompt, model_name)
-        code = None
+        # 准备配料数据
+        condiments = []
+        for condiment_item in condiments_list:
+            if isinstance(condiment_item, dict):
+                condiment_id = condiment_item.get('id', '')
+                quantity = condiment_item.get('quantity', 1)
+                condiments.append({"id": condiment_id, "quantity": quantity})
+            elif isinstance(condiment_item, str):
+                # 处理旧格式的配料列表
+                condiments.append({"id": condiment_item, "quantity": 1})
         
-        if "error" not in response:
-            # 尝试解析JSON响应
-            try:
-                content = response.get("content", "{}")
-                # 查找JSON内容
-                json_match = re.search(r'({[\s\S]*})', content)
-                if json_match:
-                    content = json_match.group(1)
-                
-                recommendation = json.loads(content)
-                
-                # 生成自动选择的JavaScript代码
-                beverage_id = recommendation.get('beverage', '')
-                condiments_list = recommendation.get('condiments', [])
-                
-                # 准备配料数据
-                condiments = []
-                for condiment_item in condiments_list:
-                    if isinstance(condiment_item, dict):
-                        condiment_id = condiment_item.get('id', '')
-                        quantity = condiment_item.get('quantity', 1)
-                        condiments.append({"id": condiment_id, "quantity": quantity})
-                    elif isinstance(condiment_item, str):
-                        # 处理旧格式的配料列表
-                        condiments.append({"id": condiment_item, "quantity": 1})
-                
-                # 使用模板生成代码（优先使用传入的模板）
-                code_template = template or AUTO_SELECT_TEMPLATE
-                
-                # 替换饮料ID
-                code = code_template.replace("{{BEVERAGE_ID}}", beverage_id)
-                
-                # 处理配料部分
-                if not condiments:
-                    # 如果没有配料，清空配料数组
-                    code = re.sub(r'const targetCondiments = \[.*?\n  \/\/ 可以添加更多配料...\n\];', 
-                                'const targetCondiments = [];', 
-                                code, 
-                                flags=re.DOTALL)
-                else:
-                    # 替换第一个配料
-                    first_condiment = condiments[0]
-                    code = code.replace("{{CONDIMENT_ID}}", first_condiment["id"])
-                    code = code.replace("{{QUANTITY}}", str(first_condiment["quantity"]))
-                    
-                    # 如果有多个配料，添加额外的配料
-                    if len(condiments) > 1:
-                        additional_condiments = ""
-                        for i in range(1, len(condiments)):
-                            additional_condiments += f'  {{ id: "{condiments[i]["id"]}", quantity: {condiments[i]["quantity"]} }},\n'
-                        
-                        code = code.replace("  // 可以添加更多配料...", additional_condiments + "  // 可以添加更多配料...")
-                
-                return {
-                    "recommendation": recommendation,
-                    "code": code,
-                    "model_info": {
-                        "provider": response.get("provider"),
-                        "model": response.get("model")
-                    }
-                }
-            except Exception as e:
-                return {
-                    "recommendation": self.get_recommendation(), 
-                    "code": None,
-                    "model_info": {
-                        "error": f"解析推荐失败: {str(e)}",
-                        "provider": response.get("provider"),
-                        "model": response.get("model")
-                    }
-                }
+        # 使用模板生成代码（优先使用传入的模板）
+        code_template = template or AUTO_SELECT_TEMPLATE
+        
+        # 替换饮料ID
+        code = code_template.replace("{{BEVERAGE_ID}}", beverage_id)
+        
+        # 处理配料部分
+        if not condiments:
+            # 如果没有配料，清空配料数组
+            code = re.sub(r'const targetCondiments = \[.*?\n  \/\/ 可以添加更多配料...\n\];', 
+                        'const targetCondiments = [];', 
+                        code, 
+                        flags=re.DOTALL)
         else:
+            # 替换第一个配料
+            first_condiment = condiments[0]
+            code = code.replace("{{CONDIMENT_ID}}", first_condiment["id"])
+            code = code.replace("{{QUANTITY}}", str(first_condiment["quantity"]))
+            
+            # 如果有多个配料，添加额外的配料
+            if len(condiments) > 1:
+                additional_condiments = ""
+                for i in range(1, len(condiments)):
+                    additional_condiments += f'  {{ id: "{condiments[i]["id"]}", quantity: {condiments[i]["quantity"]} }},\n'
+                
+                code = code.replace("  // 可以添加更多配料...", additional_condiments + "  // 可以添加更多配料...")
+        
+        return code
+    
+    def _build_result(self, response: Dict[str, Any], template: Optional[str],
+                      cache_key: Optional[RecommendationKey] = None) -> Dict[str, Any]:
+        """解析模型响应并生成自动选择代码，解析成功的推荐写入缓存"""
+        if "error" in response:
             return {
                 "recommendation": self.get_recommendation(),
                 "code": None,
                 "model_info": {"error": response.get("error")}
             }
+        
+        try:
+            recommendation = self.parse_recommendation(response.get("content", "{}"))
+            code = self.render_code(recommendation, template)
+        except Exception as e:
+            return {
+                "recommendation": self.get_recommendation(), 
+                "code": None,
+                "model_info": {
+                    "error": f"解析推荐失败: {str(e)}",
+                    "provider": response.get("provider"),
+                    "model": response.get("model")
+                }
+            }
+        
+        model_info = {
+            "provider": response.get("provider"),
+            "model": response.get("model")
+        }
+        if cache_key is not None:
+            self.cache.set(cache_key, {"recommendation": recommendation, "model_info": model_info})
+        return {
+            "recommendation": recommendation,
+            "code": code,
+            "model_info": model_info
+        }
 
 class BeverageChatbot:
     """饮料聊天机器人"""
     
+    # 对话补全参数
+    CHAT_OPTIONS = {"temperature": 0.7, "max_tokens": 300}
+    
     def __init__(self):
         self.greetings = [
             '您好！欢迎使用智能饮料售货机，需要什么饮料？',
@@ -409,16 +723,19 @@ class BeverageChatbot:
             '您可以告诉我您的口味偏好，我可以为您推荐合适的饮品。'
         ]
         
-        # 初始化大模型提供者
-        self.model_providers = {
-            'gpt': GPTProvider(),
-            'deepseek': DeepseekProvider()
-        }
+        # 共享的大模型提供者
+        self.model_providers = get_model_providers()
         self.available_providers = [name for name, provider in self.model_providers.items() 
                                   if provider.is_available]
         self.provider_models = {name: provider.get_available_models() 
                               for name, provider in self.model_providers.items() 
                               if provider.is_available}
+        # 相同消息的并发请求只调用一次上游（流式回复不合并）
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+    
+    def flight_stats(self) -> Dict[str, int]:
+        return flight_stats(self.flight, self.async_flight)
     
     def get_greeting(self) -> str:
         """获取随机问候语"""
@@ -440,25 +757,9 @@ class BeverageChatbot:
         # 默认回复
         return random.choice(self.default_responses)
     
-    def get_ai_response(self, message: str, provider_name: Optional[str] = None, 
-                       model_name: Optional[str] = None):
-        """使用大模型回答用户消息"""
-        # 选择模型提供者
-        if not provider_name or provider_name not in self.available_providers:
-            provider_name = next(iter(self.available_providers)) if self.available_providers else None
-        
-        # 如果没有可用模型，使用默认回答
-        if not provider_name:
-            return {"content": self.get_response(message), "model_info": None}
-        
-        provider = self.model_providers[provider_name]
-        
-        # 检查模型是否可用
-        if model_name and model_name not in provider.get_available_models():
-            model_name = None
-        
-        # 生成提示
-        prompt = f"""你是一个饮料售货机的AI助手。请用简短、友好的方式回答用户关于饮料的问题。
+    def build_prompt(self, message: str) -> str:
+        """生成对话提示"""
+        return f"""你是一个饮料售货机的AI助手。请用简短、友好的方式回答用户关于饮料的问题。
 可用的饮料: coffee(咖啡), latte(拿铁), mocha(摩卡), americano(美式), blackTea(红茶), greenTea(绿茶), cola(可乐), sprite(雪碧), orangeJuice(橙汁), appleJuice(苹果汁)
 可用的配料: milk(牛奶), cream(奶油), sugar(糖), honey(蜂蜜), ice(冰块), vanilla(香草), caramel(焦糖), chocolate(巧克力), cinnamon(肉桂), soymilk(豆浆), coconut(椰子)
 
@@ -468,8 +769,98 @@ class BeverageChatbot:
 
 用户消息: {message}
 """
+    
+    def get_ai_response(self, message: str, provider_name: Optional[str] = None, 
+                       model_name: Optional[str] = None):
+        """使用大模型回答用户消息"""
+        provider, model_name = select_provider(self.model_providers, self.available_providers,
+                                               provider_name, model_name)
+        # 如果没有可用模型，使用默认回答
+        if provider is None:
+            return {"content": self.get_response(message), "model_info": None}
+        
+        prompt = self.build_prompt(message)
+        response = self.flight.do(prompt_key(provider, model_name, prompt, **self.CHAT_OPTIONS),
+                                  lambda: provider.get_response(prompt, model_name, **self.CHAT_OPTIONS))
+        return self._build_reply(message, response)
+    
+    async def aget_ai_response(self, message: str, provider_name: Optional[str] = None,
+                               model_name: Optional[str] = None):
+        """使用大模型异步回答用户消息"""
+        provider, model_name = select_provider(self.model_providers, self.available_providers,
+                                               provider_name, model_name)
+        if provider is None:
+            return {"content": self.get_response(message), "model_info": None}
         
-        response = provider.get_response(prompt, model_name, temperature=0.7, max_tokens=300)
+        prompt = self.build_prompt(message)
+        response = await self.async_flight.do(prompt_key(provider, model_name, prompt, **self.CHAT_OPTIONS),
+                                              lambda: provider.aget_response(prompt, model_name, **self.CHAT_OPTIONS))
+        return self._build_reply(message, response)
+    
+    def stream_reply(self, message: str, model_info: Optional[Dict[str, Any]] = None) -> Iterator[ChatEvent]:
+        """以流式事件返回关键词回复"""
+        content = self.get_response(message)
+        yield "delta", {"content": content}
+        yield "done", {"content": content, "model_info": model_info}
+    
+    def _stream_fallback(self, message: str, error: str, streamed: bool) -> Iterator[ChatEvent]:
+        """上游出错时改用关键词回复；已输出部分内容时只在done事件中给出替换内容"""
+        model_info = {"error": error}
+        if not streamed:
+            yield from self.stream_reply(message, model_info)
+            return
+        yield "done", {"content": self.get_response(message), "model_info": model_info}
+    
+    def stream_ai_response(self, message: str, provider_name: Optional[str] = None,
+                           model_name: Optional[str] = None) -> Iterator[ChatEvent]:
+        """使用大模型流式回答用户消息
+        
+        依次产生 ("delta", {"content": 文本片段}) 事件，最后产生
+        ("done", {"content": 完整回复, "model_info": ...})；客户端以done事件的content为准。
+        """
+        provider, model_name = select_provider(self.model_providers, self.available_providers,
+                                               provider_name, model_name)
+        if provider is None:
+            yield from self.stream_reply(message)
+            return
+        
+        use_model = provider.resolve_model(model_name)
+        parts: List[str] = []
+        try:
+            for chunk in provider.stream_response(self.build_prompt(message), use_model, **self.CHAT_OPTIONS):
+                parts.append(chunk)
+                yield "delta", {"content": chunk}
+        except Exception as e:
+            yield from self._stream_fallback(message, f"{provider.ERROR_LABEL}: {str(e) or type(e).__name__}", bool(parts))
+            return
+        yield "done", {"content": "".join(parts),
+                       "model_info": {"provider": provider.PROVIDER_NAME, "model": use_model}}
+    
+    async def astream_ai_response(self, message: str, provider_name: Optional[str] = None,
+                                  model_name: Optional[str] = None) -> AsyncIterator[ChatEvent]:
+        """使用大模型异步流式回答用户消息，事件格式同stream_ai_response"""
+        provider, model_name = select_provider(self.model_providers, self.available_providers,
+                                               provider_name, model_name)
+        if provider is None:
+            for event in self.stream_reply(message):
+                yield event
+            return
+        
+        use_model = provider.resolve_model(model_name)
+        parts: List[str] = []
+        try:
+            async for chunk in provider.astream_response(self.build_prompt(message), use_model, **self.CHAT_OPTIONS):
+                parts.append(chunk)
+                yield "delta", {"content": chunk}
+        except Exception as e:
+            for event in self._stream_fallback(message, f"{provider.ERROR_LABEL}: {str(e) or type(e).__name__}", bool(parts)):
+                yield event
+            return
+        yield "done", {"content": "".join(parts),
+                       "model_info": {"provider": provider.PROVIDER_NAME, "model": use_model}}
+    
+    def _build_reply(self, message: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        """将模型响应包装为回复，出错时改用关键词回复"""
         if "error" in response:
             return {"content": self.get_response(message), "model_info": {"error": response.get("error")}}
         
@@ -0,0 +1,195 @@
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from models.order import Order, OrderStatus
+from repositories.order_repository import HourlyCondiments, HourlySales
+
+class SalesBucket:
+    """一个小时内的销售汇总"""
+
+    __slots__ = ("orders", "revenue", "cancelled", "statuses", "beverages", "condiments")
+
+    def __init__(self):
+        # 有效订单（不含已取消）的数量和营收
+        self.orders = 0
+        self.revenue = 0.0
+        self.cancelled = 0
+        self.statuses: Dict[str, int] = {}
+        # 饮料ID -> 有效订单数
+        self.beverages: Dict[str, int] = {}
+        # 配料ID -> 添加了该配料的有效订单数
+        self.condiments: Dict[str, int] = {}
+
+    def apply(self, order: Order, sign: int):
+        """计入（sign=1）或扣除（sign=-1）一个有效订单"""
+        self.orders += sign
+        self.revenue += sign * order.total_price
+        beverage_id = order.line.beverage.id
+        self.beverages[beverage_id] = self.beverages.get(beverage_id, 0) + sign
+        for condiment_id in {condiment.id for condiment, _ in order.line.condiments}:
+            self.condiments[condiment_id] = self.condiments.get(condiment_id, 0) + sign
+
+    def merge(self, other: 'SalesBucket'):
+        self.orders += other.orders
+        self.revenue += other.revenue
+        self.cancelled += other.cancelled
+        for target, source in ((self.statuses, other.statuses), (self.beverages, other.beverages),
+                               (self.condiments, other.condiments)):
+            for key, count in source.items():
+                target[key] = target.get(key, 0) + count
+
+# 按时间范围读取存储中按小时的销售汇总
+SalesSource = Callable[[Optional[datetime], Optional[datetime]], Tuple[List[HourlySales], List[HourlyCondiments]]]
+
+class AnalyticsService:
+    """销售统计：按小时分桶汇总营收、订单数、热销饮料和配料添加率
+
+    查询只合并时间范围内的分桶，复杂度与分桶数相关而与订单数无关。
+    指定source时（存储随写入维护按小时汇总，如SQLite）每次查询都从存储读取，多worker共享同一份统计，
+    进程内不计数；否则在下单和状态变更时增量更新进程内的计数器，可通过rebuild从订单存储和归档重建。
+    """
+
+    GRANULARITIES = ("hour", "day")
+
+    def __init__(self, source: Optional[SalesSource] = None):
+        self._buckets: Dict[datetime, SalesBucket] = {}
+        self._lock = threading.Lock()
+        self._source = source
+
+    @staticmethod
+    def _bucket_key(created_at: datetime) -> datetime:
+        return created_at.replace(minute=0, second=0, microsecond=0)
+
+    def _bucket_for(self, order: Order) -> SalesBucket:
+        key = self._bucket_key(order.created_at)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = SalesBucket()
+        return bucket
+
+    def _record(self, order: Order):
+        bucket = self._bucket_for(order)
+        bucket.statuses[order.status] = bucket.statuses.get(order.status, 0) + 1
+        if order.status == OrderStatus.CANCELLED:
+            bucket.cancelled += 1
+        else:
+            bucket.apply(order, 1)
+
+    def record_created(self, order: Order):
+        """统计新订单"""
+        if self._source is not None:
+            return
+        with self._lock:
+            self._record(order)
+
+    def record_status_change(self, order: Order, old_status: str):
+        """统计订单状态变更，取消的订单不再计入营收"""
+        if self._source is not None:
+            return
+        with self._lock:
+            bucket = self._bucket_for(order)
+            bucket.statuses[old_status] = bucket.statuses.get(old_status, 0) - 1
+            bucket.statuses[order.status] = bucket.statuses.get(order.status, 0) + 1
+            if order.status == OrderStatus.CANCELLED:
+                bucket.cancelled += 1
+                bucket.apply(order, -1)
+
+    def rebuild(self, orders: Iterable[Order]):
+        """从订单全量重建统计（离线操作），重复的订单ID只统计一次"""
+        buckets = self._buckets
+        seen: Set[str] = set()
+        with self._lock:
+            self._buckets = {}
+            try:
+                for order in orders:
+                    if order.id not in seen:
+                        seen.add(order.id)
+                        self._record(order)
+            except Exception:
+                self._buckets = buckets
+                raise
+        return len(seen)
+
+    @staticmethod
+    def _from_aggregates(sales: Iterable[HourlySales], condiments: Iterable[HourlyCondiments]
+                         ) -> Dict[datetime, SalesBucket]:
+        """用存储按小时汇总的结果生成分桶，与逐条统计的结果相同"""
+        buckets: Dict[datetime, SalesBucket] = {}
+        for hour, status, beverage_id, count, revenue in sales:
+            bucket = buckets.get(hour)
+            if bucket is None:
+                bucket = buckets[hour] = SalesBucket()
+            bucket.statuses[status] = bucket.statuses.get(status, 0) + count
+            if status == OrderStatus.CANCELLED:
+                bucket.cancelled += count
+            else:
+                bucket.orders += count
+                bucket.revenue += revenue
+                bucket.beverages[beverage_id] = bucket.beverages.get(beverage_id, 0) + count
+        for hour, condiment_id, count in condiments:
+            bucket = buckets.get(hour)
+            if bucket is None:
+                bucket = buckets[hour] = SalesBucket()
+            bucket.condiments[condiment_id] = bucket.condiments.get(condiment_id, 0) + count
+        return buckets
+
+    def summary(self, granularity: str = "hour", since: Optional[datetime] = None,
+                until: Optional[datetime] = None, top: int = 5) -> Dict[str, Any]:
+        """按小时或天汇总营收、订单数、热销饮料和配料添加率
+
+        since/until按分桶起始时间过滤（since包含，until不包含），均为不带时区的本地时间。
+        """
+        if granularity not in self.GRANULARITIES:
+            raise ValueError("无效的统计粒度")
+
+        if self._source is not None:
+            buckets = self._from_aggregates(*self._source(since, until))
+            groups, total = self._group(buckets, granularity, since, until)
+        else:
+            with self._lock:
+                groups, total = self._group(self._buckets, granularity, since, until)
+
+        return {
+            "granularity": granularity,
+            "buckets": [{"start": key.isoformat(), **self._format(bucket, top)}
+                        for key, bucket in sorted(groups.items())],
+            "total": self._format(total, top)
+        }
+
+    def _group(self, buckets: Dict[datetime, SalesBucket], granularity: str, since: Optional[datetime],
+               until: Optional[datetime]) -> Tuple[Dict[datetime, SalesBucket], SalesBucket]:
+        """按粒度合并时间范围内的分桶，返回各组和总计"""
+        groups: Dict[datetime, SalesBucket] = {}
+        total = SalesBucket()
+        for key, bucket in buckets.items():
+            if (since is not None and key < self._bucket_key(since)) or (until is not None and key >= until):
+                continue
+            if granularity == "day":
+                key = key.replace(hour=0)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = SalesBucket()
+            group.merge(bucket)
+            total.merge(bucket)
+        return groups, total
+
+    @staticmethod
+    def _format(bucket: SalesBucket, top: int) -> Dict[str, Any]:
+        top_beverages: List[Dict[str, Any]] = [
+            {"id": beverage_id, "count": count}
+            for beverage_id, count in sorted(bucket.beverages.items(), key=lambda item: (-item[1], item[0]))[:top]
+            if count > 0
+        ]
+        attach_rates = {
+            condiment_id: round(count / bucket.orders, 4)
+            for condiment_id, count in sorted(bucket.condiments.items())
+            if count > 0 and bucket.orders > 0
+        }
+        return {
+            "orders": bucket.orders,
+            "revenue": round(bucket.revenue, 2),
+            "cancelled": bucket.cancelled,
+            "statuses": {status: count for status, count in bucket.statuses.items() if count},
+            "top_beverages": top_beverages,
+            "condiment_attach_rates": attach_rates
+        }
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Callable, List, Mapping, Optional, Tuple
+from models.beverage import Beverage, Condiment
+from services.promotion_engine import PromotionRules
+from utils.helpers import get_config_path, load_json_config
+
+# 目录对应的配置文件
+CATALOG_FILES = ("beverages.json", "condiments.json", "promotions.json")
+
+class Catalog:
+    """商品目录（饮料、配料和促销规则的只读快照）"""
+
+    def __init__(self, beverages_data: Dict[str, Any], condiments_data: Dict[str, Any],
+                 promotions_data: Optional[Dict[str, Any]] = None):
+        beverages = {k: Beverage.from_dict(v) for k, v in beverages_data.items()}
+        condiments = {k: Condiment.from_dict(v) for k, v in condiments_data.items()}
+
+        # 目录版本，由配置内容计算
+        content = json.dumps([beverages_data, condiments_data, promotions_data],
+                             sort_keys=True, ensure_ascii=False)
+        self.version = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+        # 按ID索引
+        self.beverages: Mapping[str, Beverage] = MappingProxyType(beverages)
+        self.condiments: Mapping[str, Condiment] = MappingProxyType(condiments)
+
+        # 按分类索引
+        self.beverages_by_category = self._group_by_category(beverages)
+        self.condiments_by_category = self._group_by_category(condiments)
+
+        # 按冷热索引
+        self.hot_beverages: Tuple[Beverage, ...] = tuple(b for b in beverages.values() if b.hot)
+        self.cold_beverages: Tuple[Beverage, ...] = tuple(b for b in beverages.values() if not b.hot)
+
+        # 编译后的促销规则
+        self.promotions = PromotionRules.from_config(promotions_data)
+
+    @staticmethod
+    def _group_by_category(items: Dict[str, Any]) -> Mapping[str, Tuple[Any, ...]]:
+        """按分类分组，返回只读映射"""
+        groups: Dict[str, list] = {}
+        for item in items.values():
+            groups.setdefault(item.category, []).append(item)
+        return MappingProxyType({k: tuple(v) for k, v in groups.items()})
+
+    def get_beverage(self, beverage_id: str) -> Optional[Beverage]:
+        """按ID获取饮料"""
+        return self.beverages.get(beverage_id)
+
+    def get_condiment(self, condiment_id: str) -> Optional[Condiment]:
+        """按ID获取配料"""
+        return self.condiments.get(condiment_id)
+
+    @classmethod
+    def load(cls) -> 'Catalog':
+        """从配置文件加载目录"""
+        return cls(load_json_config("beverages.json"), load_json_config("condiments.json"),
+                   load_json_config("promotions.json"))
+
+# 进程级共享的目录实例（gunicorn预加载时在fork前构建，由各worker共享）
+# 请求路径只读取该引用，重载时整体替换，无需加锁
+_catalog: Optional[Catalog] = None
+_catalog_mtimes: Tuple[float, ...] = ()
+_catalog_lock = threading.Lock()
+_reload_listeners: List[Callable[[Catalog], None]] = []
+
+def _get_config_mtimes() -> Tuple[float, ...]:
+    """获取目录配置文件的修改时间"""
+    return tuple(os.stat(get_config_path(name)).st_mtime for name in CATALOG_FILES)
+
+def get_catalog() -> Catalog:
+    """获取进程级共享的商品目录，首次调用时加载"""
+    global _catalog, _catalog_mtimes
+    catalog = _catalog
+    if catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog_mtimes = _get_config_mtimes()
+                _catalog = Catalog.load()
+            catalog = _catalog
+    return catalog
+
+def add_reload_listener(listener: Callable[[Catalog], None]):
+    """注册目录重载回调，用于失效依赖目录的缓存"""
+    _reload_listeners.append(listener)
+
+def reload_catalog() -> Catalog:
+    """重新加载目录并原子替换当前快照，加载失败时保留旧目录"""
+    global _catalog, _catalog_mtimes
+    with _catalog_lock:
+        # 先记录修改时间，加载期间的再次修改会在下一轮检测到
+        mtimes = _get_config_mtimes()
+        catalog = Catalog.load()
+        _catalog = catalog
+        _catalog_mtimes = mtimes
+
+    for listener in list(_reload_listeners):
+        try:
+            listener(catalog)
+        except Exception as e:
+            print(f"目录重载回调失败: {str(e)}")
+    return catalog
+
+class CatalogWatcher(threading.Thread):
+    """目录配置文件监视线程，按修改时间轮询并在变化时重载"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="catalog-watcher", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                if _get_config_mtimes() != _catalog_mtimes:
+                    catalog = reload_catalog()
+                    print(f"商品目录已重载，版本: {catalog.version}")
+            except Exception as e:
+                print(f"商品目录重载失败: {str(e)}")
+
+    def stop(self):
+        self._stopped.set()
+
+_watcher: Optional[CatalogWatcher] = None
+
+def start_catalog_watcher(interval: Optional[float] = None) -> Optional[CatalogWatcher]:
+    """启动目录监视线程，间隔由CATALOG_RELOAD_INTERVAL配置，为0时不启动"""
+    global _watcher
+    if interval is None:
+        interval = float(os.environ.get("CATALOG_RELOAD_INTERVAL", "5"))
+    if interval <= 0:
+        return None
+
+    if _watcher is None or not _watcher.is_alive():
+        _watcher = CatalogWatcher(interval)
+        _watcher.start()
+    return _watcher
+
+def _restart_watcher_after_fork():
+    """fork后线程不会被子进程继承，在worker中重新启动监视线程"""
+    global _watcher
+    if _watcher is not None:
+        interval = _watcher.interval
+        _watcher = None
+        start_catalog_watcher(interval)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_watcher_after_fork)
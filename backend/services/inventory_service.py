@@ -0,0 +1,90 @@
+import threading
+from typing import Any, Dict, Optional
+from models.order import OrderLine
+from repositories.inventory_repository import InventoryRepository, StockKey, create_inventory_repository
+from utils.helpers import load_json_config
+
+BEVERAGE = "beverage"
+CONDIMENT = "condiment"
+
+class OutOfStockError(ValueError):
+    """库存不足"""
+    pass
+
+class InventoryService:
+    """库存服务：下单时原子预留饮料和配料，取消时归还"""
+
+    def __init__(self, repository: InventoryRepository, low_stock: Optional[Dict[StockKey, int]] = None,
+                 default_low_stock: int = 0):
+        self.repository = repository
+        # 低库存阈值
+        self.low_stock = low_stock or {}
+        self.default_low_stock = default_low_stock
+
+    @classmethod
+    def load(cls) -> 'InventoryService':
+        """从inventory.json加载初始库存和低库存阈值"""
+        config = load_json_config("inventory.json")
+        default_low_stock = int(config.get("default_low_stock", 0))
+        initial: Dict[StockKey, int] = {}
+        low_stock: Dict[StockKey, int] = {}
+        for kind, section in ((BEVERAGE, "beverages"), (CONDIMENT, "condiments")):
+            for item_id, item in (config.get(section) or {}).items():
+                initial[(kind, item_id)] = int(item.get("stock", 0))
+                low_stock[(kind, item_id)] = int(item.get("low_stock", default_low_stock))
+        return cls(create_inventory_repository(initial), low_stock, default_low_stock)
+
+    @staticmethod
+    def requirements(line: OrderLine) -> Dict[StockKey, int]:
+        """订单行需要扣减的库存，同一配料的数量合并"""
+        items: Dict[StockKey, int] = {(BEVERAGE, line.beverage.id): 1}
+        for condiment, quantity in line.condiments:
+            key = (CONDIMENT, condiment.id)
+            items[key] = items.get(key, 0) + quantity
+        return items
+
+    def reserve(self, line: OrderLine):
+        """预留订单行所需库存，任一项不足时不扣减并抛出OutOfStockError"""
+        shortage = self.repository.reserve(self.requirements(line))
+        if shortage is not None:
+            raise OutOfStockError(f"库存不足: {shortage[1]}")
+
+    def release(self, line: OrderLine):
+        """归还订单行占用的库存"""
+        self.repository.release(self.requirements(line))
+
+    def restock(self, kind: str, item_id: str, quantity: int) -> int:
+        """补充库存，返回补充后的数量"""
+        if kind not in (BEVERAGE, CONDIMENT):
+            raise ValueError("无效的商品类型")
+        if quantity <= 0:
+            raise ValueError("补货数量必须为正数")
+        return self.repository.restock((kind, item_id), quantity)
+
+    def get_availability(self) -> Dict[str, Dict[str, Any]]:
+        """获取各商品的库存和可售状态，未登记的商品不出现在结果中"""
+        result: Dict[str, Dict[str, Any]] = {"beverages": {}, "condiments": {}}
+        for (kind, item_id), stock in self.repository.levels().items():
+            threshold = self.low_stock.get((kind, item_id), self.default_low_stock)
+            section = result["beverages" if kind == BEVERAGE else "condiments"]
+            section[item_id] = {
+                "stock": stock,
+                "available": stock > 0,
+                "low_stock": stock <= threshold
+            }
+        return result
+
+# 进程级共享的库存服务
+_inventory: Optional[InventoryService] = None
+_inventory_lock = threading.Lock()
+
+def get_inventory() -> InventoryService:
+    """获取进程级共享的库存服务，首次调用时加载"""
+    global _inventory
+    inventory = _inventory
+    if inventory is None:
+        with _inventory_lock:
+            if _inventory is None:
+                _inventory = InventoryService.load()
+            inventory = _inventory
+    return inventory
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import queue
+import threading
+import uuid
+from collections import deque
+from typing import Dict, NamedTuple, Optional, Set
+from models.order import Order
+
+class OrderEvent(NamedTuple):
+    """订单事件"""
+    seq: int  # 进程内递增的序号
+    id: str  # 事件ID（纪元-序号），用于Last-Event-ID续传
+    type: str
+    order_id: str
+    status: str
+    data: str  # 预编码的JSON，所有订阅者共享
+
+class TooManySubscribersError(RuntimeError):
+    """订阅数已达上限"""
+    pass
+
+class Subscription:
+    """订单事件订阅，按订单ID或状态过滤
+
+    指定loop时由事件循环中的协程通过aget等待事件，投递时唤醒该循环，等待期间不占用线程。
+    """
+
+    def __init__(self, order_id: Optional[str] = None, status: Optional[str] = None, max_queue: int = 100,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.order_id = order_id
+        self.status = status
+        self.queue: "queue.Queue[OrderEvent]" = queue.Queue(maxsize=max_queue)
+        # 消费过慢导致队列溢出，或续传位置已不在缓冲区内，客户端需要重新同步
+        self.overflowed = False
+        self._loop = loop
+        self._ready = asyncio.Event() if loop is not None else None
+
+    def matches(self, event: OrderEvent) -> bool:
+        return ((self.order_id is None or self.order_id == event.order_id) and
+                (self.status is None or self.status == event.status))
+
+    def offer(self, event: OrderEvent) -> bool:
+        """非阻塞投递事件，队列已满时返回False"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+        finally:
+            self._wake()
+
+    def _wake(self):
+        """唤醒在事件循环中等待的aget（可在任意线程调用）"""
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def get(self, timeout: float) -> Optional[OrderEvent]:
+        """等待下一个事件，超时返回None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout: float) -> Optional[OrderEvent]:
+        """在事件循环中等待下一个事件，超时或订阅溢出时返回None（需在创建时指定loop）"""
+        deadline = self._loop.time() + timeout
+        while True:
+            try:
+                return self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            remaining = deadline - self._loop.time()
+            if self.overflowed or remaining <= 0:
+                return None
+            self._ready.clear()
+            # 清除标志后再检查一次，避免错过检查和清除之间投递的事件
+            if not self.queue.empty():
+                continue
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+class OrderEventBus:
+    """进程内订单事件发布/订阅
+
+    最近的事件保存在有界环形缓冲区中，用于按Last-Event-ID续传。
+    发布方从不阻塞：订阅者队列满时直接断开该订阅，由客户端重新同步。
+    多worker部署时每个进程只能收到本进程内发生的订单变更。
+    事件ID带有每个事件总线随机生成的纪元，进程重启或重连到其他worker后，旧的ID不会被误认为本进程的序号。
+    """
+
+    def __init__(self, buffer_size: int = 1000, max_subscribers: Optional[int] = None):
+        self._buffer: "deque[OrderEvent]" = deque(maxlen=buffer_size)
+        # 同时在线的订阅数上限，为None时不限制
+        self.max_subscribers = max_subscribers
+        self._subscriber_count = 0
+        self.epoch = uuid.uuid4().hex[:8]
+        self._next_id = 1
+        self._lock = threading.Lock()
+        # 按订阅条件分组，发布时只检查可能匹配的订阅
+        self._by_order: Dict[str, Set[Subscription]] = {}
+        self._by_status: Dict[str, Set[Subscription]] = {}
+        self._all: Set[Subscription] = set()
+
+    def _group_for(self, subscription: Subscription) -> Set[Subscription]:
+        if subscription.order_id is not None:
+            return self._by_order.setdefault(subscription.order_id, set())
+        if subscription.status is not None:
+            return self._by_status.setdefault(subscription.status, set())
+        return self._all
+
+    def publish(self, event_type: str, order: Order) -> OrderEvent:
+        """发布订单事件"""
+        data = json.dumps({"type": event_type, "order": order.to_dict(lean=True)},
+                          ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            event = OrderEvent(self._next_id, f"{self.epoch}-{self._next_id}", event_type,
+                               order.id, order.status, data)
+            self._next_id += 1
+            self._buffer.append(event)
+
+            candidates = list(self._all)
+            candidates.extend(self._by_order.get(order.id, ()))
+            candidates.extend(self._by_status.get(order.status, ()))
+            for subscription in candidates:
+                if subscription.matches(event) and not subscription.offer(event):
+                    self._remove(subscription)
+        return event
+
+    def _resume_seq(self, last_event_id: str) -> Optional[int]:
+        """Last-Event-ID对应的本进程序号，不是本纪元的ID（或格式无效）时返回None"""
+        epoch, _, seq = last_event_id.rpartition("-")
+        return int(seq) if epoch == self.epoch and seq.isdigit() else None
+
+    def subscribe(self, order_id: Optional[str] = None, status: Optional[str] = None,
+                  last_event_id: Optional[str] = None, max_queue: int = 100,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        """订阅订单事件，指定last_event_id时先补发缓冲区中之后的事件
+
+        在事件循环中消费时传入loop，之后用Subscription.aget等待事件。
+        订阅数已达上限时抛出TooManySubscribersError。
+        """
+        subscription = Subscription(order_id, status, max_queue, loop)
+        with self._lock:
+            if self.max_subscribers is not None and self._subscriber_count >= self.max_subscribers:
+                raise TooManySubscribersError("订阅数已达上限，请稍后重试")
+            if last_event_id is not None:
+                last_seq = self._resume_seq(last_event_id)
+                oldest = self._buffer[0].seq if self._buffer else self._next_id
+                if last_seq is None or last_seq >= self._next_id or last_seq < oldest - 1:
+                    # 其他进程（或重启前）的事件ID，或续传位置已被环形缓冲区覆盖
+                    subscription.overflowed = True
+                    return subscription
+                for event in self._buffer:
+                    if event.seq > last_seq and subscription.matches(event):
+                        if not subscription.offer(event):
+                            return subscription
+            self._group_for(subscription).add(subscription)
+            self._subscriber_count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._remove(subscription)
+
+    def _remove(self, subscription: Subscription):
+        group = self._group_for(subscription)
+        if subscription not in group:
+            return
+        group.remove(subscription)
+        self._subscriber_count -= 1
+        if not group and group is not self._all:
+            if subscription.order_id is not None:
+                self._by_order.pop(subscription.order_id, None)
+            else:
+                self._by_status.pop(subscription.status, None)
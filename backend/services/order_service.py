@@ -1,105 +1,384 @@
+import hashlib
+import itertools
 import json
-import uuid
 import os
-from typing import Dict, List, Optional, Any
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional, Any, Mapping, Tuple
 from datetime import datetime
-from models.order import Order, OrderStatus
-from models.beverage import Beverage, Condiment, BeverageDecorator
+from models.order import Order, OrderLine, OrderStatus, compose_order_line
+from models.beverage import Beverage, Condiment
+from repositories.order_repository import IdempotencyRecord, OrderRepository, create_order_repository
+from services.analytics_service import AnalyticsService
+from services.catalog_service import Catalog, add_reload_listener, get_catalog
+from services.inventory_service import InventoryService, get_inventory
+from services.order_events import OrderEventBus
+from services.pricing_engine import EncodedOrders, PriceScenario, PricingEngine
+from utils.cache import TTLCache
+from utils.helpers import encode_cursor, decode_cursor
+from utils.singleflight import SingleFlight
+
+class IdempotencyConflictError(ValueError):
+    """幂等键已用于内容不同的订单"""
+    pass
 
 class OrderService:
     """订单服务"""
     
-    def __init__(self):
-        # 获取当前文件所在目录
-        current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    def __init__(self, repository: Optional[OrderRepository] = None,
+                 inventory: Optional[InventoryService] = None):
+        # 订单存储，默认由ORDER_STORE配置决定
+        self.repository = repository or create_order_repository()
+        # 库存，下单时预留，取消时归还
+        self.inventory = inventory or get_inventory()
+        # 订单变更事件，同时在线的事件流订阅数由ORDER_STREAM_MAX_SUBSCRIBERS限制（为0时不限制）
+        max_subscribers = int(os.environ.get("ORDER_STREAM_MAX_SUBSCRIBERS", "1000"))
+        self.events = OrderEventBus(max_subscribers=max_subscribers if max_subscribers > 0 else None)
+        # 销售统计
+        # 存储维护按小时汇总时统计直接查询存储（多worker共享），否则在进程内增量计数
+        self.analytics = AnalyticsService(
+            source=self.repository.sales_by_hour if self.repository.maintains_sales_rollup else None
+        )
+        # 幂等键 -> (订单ID, 请求指纹)，并发的相同键请求合并为一次创建
+        self.idempotency_ttl = float(os.environ.get("IDEMPOTENCY_TTL", "86400"))
+        self._idempotency_keys = TTLCache(
+            max_size=int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "10000")), ttl=self.idempotency_ttl
+        )
+        self._idempotency_flight = SingleFlight()
+        # 报价缓存，键为规范化后的选择，目录重载时清空
+        self._quotes = TTLCache(max_size=int(os.environ.get("QUOTE_CACHE_SIZE", "1024")))
+        add_reload_listener(lambda catalog: self._quotes.clear())
+        # 批量计价引擎，按目录快照缓存
+        self._pricing: Optional[PricingEngine] = None
+        self._pricing_catalog: Optional[Catalog] = None
+        # 归档订单的编码结果：(计价引擎, 文件名 -> (已编码到的偏移, 编码结果))，归档追加时只编码新增部分
+        self._encoded_archive: Optional[Tuple[PricingEngine, Dict[str, Tuple[int, EncodedOrders]]]] = None
+        self._encoded_archive_lock = threading.Lock()
+    
+    @property
+    def beverages(self) -> Mapping[str, Beverage]:
+        """共享目录中的饮料"""
+        return get_catalog().beverages
+    
+    @property
+    def condiments(self) -> Mapping[str, Condiment]:
+        """共享目录中的配料"""
+        return get_catalog().condiments
+    
+    def build_order_line(self, beverage_id: str, condiments: List[Dict[str, Any]],
+                         catalog: Optional[Catalog] = None, at: Optional[datetime] = None) -> OrderLine:
+        """验证饮料和配料并计价，所有计价路径（下单、批量下单、算价）都经过这里
         
-        # 加载饮料和配料数据
-        with open(os.path.join(current_dir, "config/beverages.json"), "r", encoding="utf-8") as f:
-            data = json.load(f)
-            self.beverages: Dict[str, Beverage] = {}
-            for k, v in data.items():
-                self.beverages[k] = Beverage.from_dict(v)
-            
-        with open(os.path.join(current_dir, "config/condiments.json"), "r", encoding="utf-8") as f:
-            data = json.load(f)
-            self.condiments: Dict[str, Condiment] = {}
-            for k, v in data.items():
-                self.condiments[k] = Condiment.from_dict(v)
+        at为计价时间，用于时段类促销，默认为当前时间。
+        """
+        catalog = catalog or get_catalog()
         
-        # 内存中存储订单
-        self.orders: Dict[str, Order] = {}
+        # 验证饮料是否存在
+        beverage = catalog.beverages.get(beverage_id)
+        if beverage is None:
+            raise ValueError("饮料不存在")
+        
+        # 验证配料是否存在
+        items = []
+        for condiment_data in condiments:
+            condiment_id = condiment_data.get("id")
+            condiment = catalog.condiments.get(condiment_id) if condiment_id else None
+            if condiment is None:
+                raise ValueError(f"配料 {condiment_id} 不存在")
+            items.append((condiment, int(condiment_data.get("quantity", 1))))
+        
+        # 一次性合计价格和卡路里，再应用目录中的促销规则
+        return catalog.promotions.apply(compose_order_line(beverage, items), at)
     
-    def create_order(self, beverage_id: str, condiments: List[Dict[str, str]]) -> Optional[Order]:
-        """创建订单"""
-        try:
-            # 验证饮料是否存在
-            if beverage_id not in self.beverages:
-                raise ValueError("饮料不存在")
-            
-            beverage = self.beverages[beverage_id]
-            
-            # 验证配料是否存在并装饰饮料
-            for condiment_data in condiments:
-                condiment_id = condiment_data.get("id")
-                if not condiment_id or condiment_id not in self.condiments:
-                    raise ValueError(f"配料 {condiment_id} 不存在")
-                
-                condiment = self.condiments[condiment_id]
-                quantity = int(condiment_data.get("quantity", 1))
-                
-                # 使用装饰器模式添加配料
-                beverage = BeverageDecorator(beverage, condiment, quantity)
-            
-            # 创建订单
-            order_id = str(uuid.uuid4())
-            order = Order(
-                id=order_id,
-                beverage=beverage,
-                condiments=getattr(beverage, 'condiments', []),
-                status=OrderStatus.PENDING,
-                created_at=datetime.now()
+    def create_order(self, beverage_id: str, condiments: List[Dict[str, str]],
+                     idempotency_key: Optional[str] = None) -> Order:
+        """创建订单，相同幂等键的重复请求返回原订单
+        
+        饮料或配料不存在时抛出ValueError，库存不足时抛出OutOfStockError，
+        幂等键已用于饮料或配料不同的订单时抛出IdempotencyConflictError。
+        """
+        if not idempotency_key:
+            return self._create_order(beverage_id, condiments).order
+        
+        fingerprint = self.selection_fingerprint(beverage_id, condiments)
+        record = self._find_idempotent_order(idempotency_key)
+        if record is None:
+            # 合并的请求共享首个请求的结果，各自校验指纹
+            record = self._idempotency_flight.do(
+                idempotency_key, lambda: self._create_order(beverage_id, condiments, idempotency_key, fingerprint)
             )
-            
-            # 保存订单
-            self.orders[order_id] = order
-            return order
-            
-        except Exception as e:
-            print(f"创建订单失败: {str(e)}")
-            return None
+        if record.fingerprint is not None and record.fingerprint != fingerprint:
+            raise IdempotencyConflictError("Idempotency-Key 已用于内容不同的订单")
+        return record.order
+    
+    def selection_fingerprint(self, beverage_id: str, condiments: List[Dict[str, Any]]) -> str:
+        """请求指纹：饮料和规范化配料选择的哈希，配料顺序和拆分方式不影响结果"""
+        content = json.dumps([beverage_id, self.canonical_selection(condiments)], separators=(",", ":"))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+    
+    def _find_idempotent_order(self, idempotency_key: str) -> Optional[IdempotencyRecord]:
+        """按幂等键查找已创建的订单"""
+        cached = self._idempotency_keys.get(idempotency_key)
+        if cached:
+            order = self.repository.get(cached[0])
+            if order:
+                return IdempotencyRecord(order, cached[1])
+        return None
+    
+    def _remember_idempotency_key(self, idempotency_key: str, record: IdempotencyRecord):
+        """缓存幂等键对应的订单ID和请求指纹"""
+        self._idempotency_keys.set(idempotency_key, (record.order.id, record.fingerprint))
+    
+    def _create_order(self, beverage_id: str, condiments: List[Dict[str, str]],
+                      idempotency_key: Optional[str] = None,
+                      fingerprint: Optional[str] = None) -> IdempotencyRecord:
+        """创建订单，返回订单及幂等键对应的请求指纹（命中已有订单时为原订单的指纹）"""
+        if idempotency_key:
+            # 等待期间其他请求可能已完成创建，持久化存储中也可能已有记录
+            existing = (self._find_idempotent_order(idempotency_key) or
+                        self.repository.find_by_idempotency_key(idempotency_key, self.idempotency_ttl))
+            if existing:
+                self._remember_idempotency_key(idempotency_key, existing)
+                return existing
+        
+        now = datetime.now()
+        line = self.build_order_line(beverage_id, condiments, at=now)
+        
+        # 创建订单
+        order_id = str(uuid.uuid4())
+        order = Order(
+            id=order_id,
+            line=line,
+            status=OrderStatus.PENDING,
+            created_at=now
+        )
+        
+        # 预留库存，保存失败或命中已有订单时归还
+        self.inventory.reserve(line)
+        try:
+            if idempotency_key:
+                saved = self.repository.add_idempotent(order, idempotency_key, self.idempotency_ttl, fingerprint)
+                self._remember_idempotency_key(idempotency_key, saved)
+            else:
+                self.repository.add(order)
+                saved = IdempotencyRecord(order, None)
+        except Exception:
+            self.inventory.release(line)
+            raise
+        if saved.order is not order:
+            self.inventory.release(line)
+            return saved
+        self._after_create(order)
+        return saved
+    
+    def create_orders(self, entries: List[Dict[str, Any]]) -> List[Tuple[Optional[Order], Optional[str]]]:
+        """批量创建订单，返回每项的(订单, 错误信息)，有效订单在同一事务中保存"""
+        catalog = get_catalog()
+        now = datetime.now()
+        results: List[Tuple[Optional[Order], Optional[str]]] = []
+        orders: List[Order] = []
+        
+        for entry in entries:
+            try:
+                if not isinstance(entry, dict) or not entry.get("beverage"):
+                    raise ValueError("未指定饮料")
+                line = self.build_order_line(entry["beverage"], entry.get("condiments") or [], catalog, now)
+                self.inventory.reserve(line)
+                order = Order(
+                    id=str(uuid.uuid4()),
+                    line=line,
+                    status=OrderStatus.PENDING,
+                    created_at=now
+                )
+                orders.append(order)
+                results.append((order, None))
+            except Exception as e:
+                results.append((None, str(e)))
+        
+        if orders:
+            try:
+                self.repository.add_many(orders)
+            except Exception:
+                for order in orders:
+                    self.inventory.release(order.line)
+                raise
+            for order in orders:
+                self._after_create(order)
+        return results
+    
+    def _after_create(self, order: Order):
+        """订单创建后的处理"""
+        self.analytics.record_created(order)
+        self.events.publish("created", order)
+    
+    def _after_status_change(self, order: Order, old_status: str):
+        """订单状态变更后的处理"""
+        if order.status == OrderStatus.CANCELLED:
+            self.inventory.release(order.line)
+        self.analytics.record_status_change(order, old_status)
+        self.events.publish("status", order)
+    
+    def iter_all_orders(self) -> Iterable[Order]:
+        """遍历归档和存储中的全部订单"""
+        archive = getattr(self.repository, "archive", None)
+        archived = archive.iter_orders() if archive else ()
+        return itertools.chain(archived, self.repository.list_all())
+    
+    def rebuild_analytics(self) -> int:
+        """从订单存储和归档重建销售统计，返回统计的订单数"""
+        if self.repository.maintains_sales_rollup:
+            return self.repository.rebuild_sales_by_hour()
+        return self.analytics.rebuild(self.iter_all_orders())
+    
+    @property
+    def pricing(self) -> PricingEngine:
+        """当前目录快照对应的批量计价引擎"""
+        catalog = get_catalog()
+        if self._pricing_catalog is not catalog:
+            self._pricing = PricingEngine(catalog)
+            self._pricing_catalog = catalog
+        return self._pricing
+    
+    def simulate_pricing(self, scenarios: List[PriceScenario], since: Optional[datetime] = None,
+                         until: Optional[datetime] = None, use_current_prices: bool = False) -> Dict[str, Any]:
+        """调价模拟：按多组新单价批量重新计算历史订单的营收
+        
+        use_current_prices为True时以当前目录单价为基础，再叠加各组指定的新单价。
+        """
+        engine = self.pricing
+        if use_current_prices:
+            current_beverages, current_condiments = engine.current_prices()
+            scenarios = [({**current_beverages, **(beverages or {})}, {**current_condiments, **(condiments or {})})
+                         for beverages, condiments in scenarios]
+        return engine.what_if(self._encode_history(engine), scenarios, since, until)
+    
+    def _encode_history(self, engine: PricingEngine) -> EncodedOrders:
+        """编码全部历史订单，归档只追加不修改，每个文件只编码上次之后追加的部分"""
+        archive = getattr(self.repository, "archive", None)
+        parts = []
+        if archive:
+            with self._encoded_archive_lock:
+                cached = self._encoded_archive
+                files = cached[1] if cached is not None and cached[0] is engine else {}
+                encoded_files: Dict[str, Tuple[int, EncodedOrders]] = {}
+                for name, size in archive.file_sizes().items():
+                    offset, encoded = files.get(name, (0, None))
+                    if offset > size:
+                        # 文件被替换，从头重新编码
+                        offset, encoded = 0, None
+                    if offset < size:
+                        orders, offset = archive.read_from(name, offset)
+                        appended = engine.encode(orders)
+                        encoded = appended if encoded is None else EncodedOrders.concat([encoded, appended])
+                    encoded_files[name] = (offset, encoded)
+                self._encoded_archive = (engine, encoded_files)
+            parts.extend(encoded for _, encoded in encoded_files.values() if encoded is not None)
+        parts.append(engine.encode(self.repository.list_all()))
+        return EncodedOrders.concat(parts)
     
     def get_order(self, order_id: str) -> Optional[Order]:
         """获取订单"""
-        return self.orders.get(order_id)
+        return self.repository.get(order_id)
     
-    def get_order_history(self) -> List[Order]:
-        """获取历史订单"""
-        return list(self.orders.values())
+    def get_order_history(self, limit: int = 20, cursor: Optional[str] = None, status: Optional[str] = None,
+                          since: Optional[datetime] = None, until: Optional[datetime] = None
+                          ) -> Tuple[List[Order], Optional[str]]:
+        """按创建时间倒序分页获取历史订单，返回订单列表和下一页游标"""
+        position = None
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 2:
+                raise ValueError("无效的分页游标")
+            position = (float(values[0]), str(values[1]))
+        
+        orders, next_position = self.repository.list_page(limit, position, status, since, until)
+        next_cursor = encode_cursor(list(next_position)) if next_position else None
+        return orders, next_cursor
     
-    def update_order_status(self, order_id: str, status: str) -> Optional[Order]:
-        """更新订单状态"""
-        order = self.orders.get(order_id)
-        if order:
-            order.status = status
-            return order
-        return None
+    # 并发修改导致比较并交换失败时的重试次数
+    STATUS_UPDATE_RETRIES = 3
     
-    def calculate_order_total(self, beverage_id: str, selected_condiments: List[Dict[str, Any]]) -> float:
-        """计算订单总价"""
-        if beverage_id not in self.beverages:
-            raise ValueError("无效的饮料选择")
-        
-        beverage = self.beverages[beverage_id]
-        total = beverage.price
+    def update_order_status(self, order_id: str, status: str,
+                            expected_status: Optional[str] = None) -> Optional[Order]:
+        """按状态机更新订单状态，指定expected_status时仅在当前状态匹配时更新
         
-        for condiment_data in selected_condiments:
-            condiment_id = condiment_data.get('id')
-            quantity = condiment_data.get('quantity', 1)
+        订单不存在或当前状态与expected_status不符时返回None，
+        状态转换不被允许时抛出ValueError。
+        """
+        for _ in range(self.STATUS_UPDATE_RETRIES):
+            order = self.repository.get(order_id)
+            if order is None:
+                return None
+            current = order.status
+            if expected_status and current != expected_status:
+                return None
+            if current == status:
+                return order
+            if not OrderStatus.can_transition(current, status):
+                raise ValueError(f"订单状态不能从 {current} 变更为 {status}")
             
-            if not condiment_id or condiment_id not in self.condiments:
-                raise ValueError(f"无效的配料: {condiment_id}")
-            
-            condiment = self.condiments[condiment_id]
-            total += condiment.price * quantity
+            updated = self.repository.compare_and_set_status(order_id, current, status)
+            if updated:
+                self._after_status_change(updated, current)
+                return updated
+            if expected_status:
+                return None
+        return None
+    
+    def claim_next_order(self) -> Optional[Order]:
+        """取出最早的待处理订单并标记为处理中"""
+        order = self.repository.claim_next(OrderStatus.PENDING, OrderStatus.PROCESSING)
+        if order:
+            self._after_status_change(order, OrderStatus.PENDING)
+        return order
+    
+    @staticmethod
+    def canonical_selection(condiments: List[Dict[str, Any]]) -> Tuple[Tuple[str, int], ...]:
+        """规范化配料选择：合并重复ID的份数并按ID排序"""
+        merged: Dict[str, int] = {}
+        for item in condiments:
+            condiment_id = item.get("id") if isinstance(item, dict) else None
+            if not isinstance(condiment_id, str):
+                raise ValueError(f"配料 {condiment_id} 不存在")
+            try:
+                quantity = int(item.get("quantity", 1))
+            except (TypeError, ValueError):
+                raise ValueError(f"配料 {condiment_id} 的份数无效")
+            merged[condiment_id] = merged.get(condiment_id, 0) + quantity
+        return tuple(sorted(merged.items()))
+    
+    def quote(self, beverage_id: str, condiments: List[Dict[str, Any]],
+              at: Optional[datetime] = None) -> Dict[str, Any]:
+        """报价：计算饮料和配料组合的价格、优惠和卡路里
         
-        return total 
\ No newline at end of file
+        相同组合（配料顺序和拆分方式不同也视为相同）命中缓存时跳过验证和计价。
+        返回的字典在调用方之间共享，不应修改。
+        """
+        catalog = get_catalog()
+        beverage = catalog.beverages.get(beverage_id)
+        if beverage is None:
+            raise ValueError("饮料不存在")
+        at = at or datetime.now()
+        selection = self.canonical_selection(condiments)
+        key = (catalog.version, beverage_id, selection, catalog.promotions.time_key(beverage, at))
+        
+        quote = self._quotes.get(key)
+        if quote is None:
+            items = [{"id": condiment_id, "quantity": quantity} for condiment_id, quantity in selection]
+            line = self.build_order_line(beverage_id, items, catalog, at)
+            quote = {
+                "beverage": beverage_id,
+                "condiments": items,
+                "subtotal": line.price,
+                "discount": line.discount,
+                "total": round(line.price - line.discount, 2),
+                "calories": line.calories,
+                "promotions": [{"id": rule_id, "amount": amount} for rule_id, amount in line.promotions],
+                "catalog_version": catalog.version
+            }
+            self._quotes.set(key, quote)
+        return quote
+    
+    def calculate_order_total(self, beverage_id: str, selected_condiments: List[Dict[str, Any]]) -> float:
+        """计算订单总价（扣除优惠）"""
+        return self.quote(beverage_id, selected_condiments)["total"] 
\ No newline at end of file
@@ -0,0 +1,213 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+import numpy as np
+from models.order import Order, OrderStatus
+from services.catalog_service import Catalog
+
+# 一组调价：(饮料ID -> 新单价, 配料ID -> 新单价)
+PriceScenario = Tuple[Optional[Mapping[str, float]], Optional[Mapping[str, float]]]
+
+class EncodedOrders(NamedTuple):
+    """列式编码的一批订单
+
+    配料按CSR方式存放：第i个订单的配料位于 offsets[i]:offsets[i+1]。
+    ID不在目录中的商品编码为哨兵下标（等于目录商品数），始终按订单记录的单价计算。
+    """
+    ids: Tuple[str, ...]
+    created_at: np.ndarray          # 创建时间戳（秒）
+    cancelled: np.ndarray           # 是否已取消
+    discount: np.ndarray            # 下单时的促销优惠金额
+    beverage_idx: np.ndarray
+    beverage_price: np.ndarray      # 下单时的饮料单价
+    beverage_calories: np.ndarray
+    offsets: np.ndarray
+    condiment_idx: np.ndarray
+    condiment_price: np.ndarray     # 下单时的配料单价
+    condiment_calories: np.ndarray
+    quantity: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self) -> np.ndarray:
+        """每个配料条目所属的订单下标"""
+        return np.repeat(np.arange(len(self.ids)), np.diff(self.offsets))
+
+    @classmethod
+    def concat(cls, parts: List['EncodedOrders']) -> 'EncodedOrders':
+        """拼接多批编码结果"""
+        if len(parts) == 1:
+            return parts[0]
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for part in parts:
+            offsets.append(part.offsets[1:] + base)
+            base += int(part.offsets[-1])
+        return cls(
+            tuple(order_id for part in parts for order_id in part.ids),
+            *(np.concatenate([getattr(part, field) for part in parts])
+              for field in ("created_at", "cancelled", "discount",
+                            "beverage_idx", "beverage_price", "beverage_calories")),
+            np.concatenate(offsets),
+            *(np.concatenate([getattr(part, field) for part in parts])
+              for field in ("condiment_idx", "condiment_price", "condiment_calories", "quantity"))
+        )
+
+    def select(self, mask: np.ndarray) -> 'EncodedOrders':
+        """按布尔掩码筛选订单"""
+        keep = np.flatnonzero(mask)
+        counts = np.diff(self.offsets)[keep]
+        offsets = np.zeros(len(keep) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        item_mask = np.repeat(mask, np.diff(self.offsets))
+        return EncodedOrders(
+            tuple(self.ids[i] for i in keep), self.created_at[keep], self.cancelled[keep], self.discount[keep],
+            self.beverage_idx[keep], self.beverage_price[keep], self.beverage_calories[keep], offsets,
+            self.condiment_idx[item_mask], self.condiment_price[item_mask],
+            self.condiment_calories[item_mask], self.quantity[item_mask]
+        )
+
+class PricingEngine:
+    """向量化的批量计价引擎
+
+    目录商品映射为连续的整数下标，价格和卡路里存为数组；
+    订单编码为下标和份数数组后，用bincount一次算出整批订单的合计，
+    用于批量重新计价和调价模拟（what-if）回放历史订单。
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.catalog_version = catalog.version
+        self.beverage_ids: Tuple[str, ...] = tuple(catalog.beverages)
+        self.condiment_ids: Tuple[str, ...] = tuple(catalog.condiments)
+        self.beverage_index = {item_id: i for i, item_id in enumerate(self.beverage_ids)}
+        self.condiment_index = {item_id: i for i, item_id in enumerate(self.condiment_ids)}
+        self.beverage_prices = np.array([b.price for b in catalog.beverages.values()], dtype=np.float64)
+        self.condiment_prices = np.array([c.price for c in catalog.condiments.values()], dtype=np.float64)
+
+    def encode(self, orders: Iterable[Order]) -> EncodedOrders:
+        """将订单编码为列式数组，每个订单只做一次字典查找"""
+        beverage_missing = len(self.beverage_ids)
+        condiment_missing = len(self.condiment_ids)
+        beverage_index = self.beverage_index
+        condiment_index = self.condiment_index
+
+        ids: List[str] = []
+        created_at: List[float] = []
+        cancelled: List[bool] = []
+        discount: List[float] = []
+        beverage_idx: List[int] = []
+        beverage_price: List[float] = []
+        beverage_calories: List[int] = []
+        offsets: List[int] = [0]
+        condiment_idx: List[int] = []
+        condiment_price: List[float] = []
+        condiment_calories: List[int] = []
+        quantity: List[int] = []
+        # 绑定到局部变量，减少循环内的属性查找
+        add_beverage_idx, add_beverage_price, add_beverage_calories = (
+            beverage_idx.append, beverage_price.append, beverage_calories.append)
+        add_condiment_idx, add_condiment_price, add_condiment_calories, add_quantity = (
+            condiment_idx.append, condiment_price.append, condiment_calories.append, quantity.append)
+
+        for order in orders:
+            line = order.line
+            ids.append(order.id)
+            created_at.append(order.created_at.timestamp())
+            cancelled.append(order.status == OrderStatus.CANCELLED)
+            discount.append(line.discount)
+            beverage = line.beverage
+            add_beverage_idx(beverage_index.get(beverage.id, beverage_missing))
+            add_beverage_price(beverage.price)
+            add_beverage_calories(beverage.calories)
+            for condiment, count in line.condiments:
+                add_condiment_idx(condiment_index.get(condiment.id, condiment_missing))
+                add_condiment_price(condiment.price)
+                add_condiment_calories(condiment.calories)
+                add_quantity(count)
+            offsets.append(len(quantity))
+
+        return EncodedOrders(
+            tuple(ids),
+            np.array(created_at, dtype=np.float64),
+            np.array(cancelled, dtype=bool),
+            np.array(discount, dtype=np.float64),
+            np.array(beverage_idx, dtype=np.int64),
+            np.array(beverage_price, dtype=np.float64),
+            np.array(beverage_calories, dtype=np.int64),
+            np.array(offsets, dtype=np.int64),
+            np.array(condiment_idx, dtype=np.int64),
+            np.array(condiment_price, dtype=np.float64),
+            np.array(condiment_calories, dtype=np.int64),
+            np.array(quantity, dtype=np.int64)
+        )
+
+    def _price_table(self, ids: Tuple[str, ...], index: Mapping[str, int],
+                     overrides: Optional[Mapping[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """生成按下标查找的新单价和是否调价的掩码，末尾为哨兵（不调价）"""
+        prices = np.zeros(len(ids) + 1, dtype=np.float64)
+        changed = np.zeros(len(ids) + 1, dtype=bool)
+        for item_id, price in (overrides or {}).items():
+            i = index.get(item_id)
+            if i is None:
+                raise ValueError(f"商品 {item_id} 不存在")
+            prices[i] = float(price)
+            changed[i] = True
+        return prices, changed
+
+    def totals(self, encoded: EncodedOrders, beverage_prices: Optional[Mapping[str, float]] = None,
+               condiment_prices: Optional[Mapping[str, float]] = None) -> np.ndarray:
+        """计算每个订单的合计价格，未指定新单价的商品按下单时的单价计算
+
+        促销优惠按下单时的金额扣除，调价后不重新评估促销规则。
+        """
+        prices, changed = self._price_table(self.beverage_ids, self.beverage_index, beverage_prices)
+        unit = np.where(changed[encoded.beverage_idx], prices[encoded.beverage_idx], encoded.beverage_price)
+
+        prices, changed = self._price_table(self.condiment_ids, self.condiment_index, condiment_prices)
+        condiment_unit = np.where(changed[encoded.condiment_idx], prices[encoded.condiment_idx],
+                                  encoded.condiment_price)
+        subtotal = unit + np.bincount(encoded.rows(), weights=condiment_unit * encoded.quantity,
+                                      minlength=len(encoded))
+        return np.maximum(subtotal - encoded.discount, 0.0)
+
+    def calories(self, encoded: EncodedOrders) -> np.ndarray:
+        """计算每个订单的合计卡路里"""
+        weights = (encoded.condiment_calories * encoded.quantity).astype(np.float64)
+        extra = np.bincount(encoded.rows(), weights=weights, minlength=len(encoded))
+        return encoded.beverage_calories + extra.astype(np.int64)
+
+    def current_prices(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """当前目录的单价，用于按现价重新计价"""
+        return (dict(zip(self.beverage_ids, self.beverage_prices.tolist())),
+                dict(zip(self.condiment_ids, self.condiment_prices.tolist())))
+
+    def what_if(self, encoded: EncodedOrders, scenarios: List[PriceScenario],
+                since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict[str, Any]:
+        """调价模拟：按多组新单价回放同一批历史订单，比较实际营收和模拟营收（不含已取消订单）
+
+        编码只做一次，每组单价只需一次向量化计算。
+        """
+        mask = ~encoded.cancelled
+        if since is not None:
+            mask &= encoded.created_at >= since.timestamp()
+        if until is not None:
+            mask &= encoded.created_at < until.timestamp()
+        selected = encoded.select(mask)
+
+        actual = self.totals(selected)
+        revenue = float(actual.sum())
+        results = []
+        for beverage_prices, condiment_prices in scenarios:
+            projected = self.totals(selected, beverage_prices, condiment_prices)
+            projected_revenue = float(projected.sum())
+            results.append({
+                "affected_orders": int(np.count_nonzero(~np.isclose(actual, projected))),
+                "projected_revenue": round(projected_revenue, 2),
+                "delta": round(projected_revenue - revenue, 2)
+            })
+        return {
+            "orders": len(selected),
+            "revenue": round(revenue, 2),
+            "scenarios": results,
+            "catalog_version": self.catalog_version
+        }
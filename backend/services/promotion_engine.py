@@ -0,0 +1,213 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from models.beverage import Beverage
+from models.order import OrderLine
+
+class PromotionRule(ABC):
+    """促销规则基类
+
+    适用范围由beverages（饮料ID）和categories（饮料分类）限定，都未指定时适用于所有饮料。
+    同一分组（GROUP）的规则互斥，只取优惠最大的一条；不同分组的优惠按GROUP_ORDER依次叠加，
+    每组在前面各组优惠后的应付金额上计算。
+    """
+
+    TYPE = ""
+    GROUP = ""
+
+    def __init__(self, data: Dict[str, Any]):
+        if not data.get("id"):
+            raise ValueError("促销规则缺少id")
+        self.id: str = data["id"]
+        self.name: str = data.get("name", self.id)
+        self.beverages: Tuple[str, ...] = tuple(data.get("beverages") or ())
+        self.categories: Tuple[str, ...] = tuple(data.get("categories") or ())
+
+    @abstractmethod
+    def discount(self, line: OrderLine, at: datetime, price: float) -> float:
+        """计算该规则对订单行的优惠金额，不适用时返回0
+
+        price为前面各组优惠后的应付金额
+        """
+        pass
+
+class CategoryDiscountRule(PromotionRule):
+    """按分类（或指定饮料）打折"""
+
+    TYPE = "category_discount"
+    GROUP = "percent"
+
+    def __init__(self, data: Dict[str, Any]):
+        super().__init__(data)
+        self.percent = float(data["percent"])
+        if not 0 < self.percent <= 100:
+            raise ValueError(f"促销规则 {self.id} 的折扣必须在0到100之间")
+
+    def discount(self, line: OrderLine, at: datetime, price: float) -> float:
+        return price * self.percent / 100
+
+class HappyHourRule(CategoryDiscountRule):
+    """指定时段内打折，end早于start时跨越午夜"""
+
+    TYPE = "happy_hour"
+
+    def __init__(self, data: Dict[str, Any]):
+        super().__init__(data)
+        self.start = self._parse_time(data["start"])
+        self.end = self._parse_time(data["end"])
+        # 星期几（0为周一），未指定时每天生效
+        self.days = frozenset(int(day) for day in data.get("days") or range(7))
+
+    @staticmethod
+    def _parse_time(value: str) -> int:
+        hour, minute = value.split(":")
+        return int(hour) * 60 + int(minute)
+
+    def active(self, at: datetime) -> bool:
+        minute = at.hour * 60 + at.minute
+        if self.start <= self.end:
+            return at.weekday() in self.days and self.start <= minute < self.end
+        # 跨午夜的时段，凌晨部分属于前一天的活动
+        if minute >= self.start:
+            return at.weekday() in self.days
+        return minute < self.end and (at.weekday() - 1) % 7 in self.days
+
+    def discount(self, line: OrderLine, at: datetime, price: float) -> float:
+        return super().discount(line, at, price) if self.active(at) else 0.0
+
+class ComboRule(PromotionRule):
+    """饮料搭配指定配料（达到份数）时立减"""
+
+    TYPE = "combo"
+    GROUP = "combo"
+
+    def __init__(self, data: Dict[str, Any]):
+        super().__init__(data)
+        self.condiments: Dict[str, int] = {k: int(v) for k, v in (data.get("condiments") or {}).items()}
+        self.amount = float(data["discount"])
+
+    def discount(self, line: OrderLine, at: datetime, price: float) -> float:
+        if self.condiments:
+            quantities: Dict[str, int] = {}
+            for condiment, quantity in line.condiments:
+                quantities[condiment.id] = quantities.get(condiment.id, 0) + quantity
+            for condiment_id, required in self.condiments.items():
+                if quantities.get(condiment_id, 0) < required:
+                    return 0.0
+        return self.amount
+
+class FreeCondimentRule(PromotionRule):
+    """指定配料（未指定时为任意配料）最多免费max_free份，优先免单价低的"""
+
+    TYPE = "free_condiments"
+    GROUP = "free_condiments"
+
+    def __init__(self, data: Dict[str, Any]):
+        super().__init__(data)
+        condiments = data.get("condiments")
+        self.condiments = frozenset(condiments) if condiments else None
+        self.max_free = int(data["max_free"])
+
+    def discount(self, line: OrderLine, at: datetime, price: float) -> float:
+        eligible = sorted((condiment.price, quantity) for condiment, quantity in line.condiments
+                          if self.condiments is None or condiment.id in self.condiments)
+        remaining = self.max_free
+        amount = 0.0
+        for price, quantity in eligible:
+            if remaining <= 0:
+                break
+            free = min(quantity, remaining)
+            amount += price * free
+            remaining -= free
+        return amount
+
+RULE_TYPES = {rule.TYPE: rule for rule in (CategoryDiscountRule, HappyHourRule, ComboRule, FreeCondimentRule)}
+# 分组的计算顺序：先免去配料，折扣只作用于剩余金额，免费的配料不会再被打折
+GROUP_ORDER = (FreeCondimentRule.GROUP, CategoryDiscountRule.GROUP, ComboRule.GROUP)
+
+class PromotionRules:
+    """编译后的促销规则
+
+    规则按饮料ID和分类建立索引，计价时只评估对该饮料适用的规则，
+    单个订单的开销与规则总数无关。
+    """
+
+    def __init__(self, rules: Iterable[PromotionRule]):
+        self.rules: Tuple[PromotionRule, ...] = tuple(rules)
+        self._by_beverage: Dict[str, List[PromotionRule]] = {}
+        self._by_category: Dict[str, List[PromotionRule]] = {}
+        self._global: List[PromotionRule] = []
+        for rule in self.rules:
+            if not rule.beverages and not rule.categories:
+                self._global.append(rule)
+            for beverage_id in rule.beverages:
+                self._by_beverage.setdefault(beverage_id, []).append(rule)
+            for category in rule.categories:
+                self._by_category.setdefault(category, []).append(rule)
+        # (饮料ID, 分类) -> 适用规则，首次计价时生成
+        self._candidates: Dict[Tuple[str, str], Tuple[PromotionRule, ...]] = {}
+
+    @classmethod
+    def from_config(cls, data: Optional[Dict[str, Any]]) -> 'PromotionRules':
+        """从配置编译规则，规则无效时抛出ValueError"""
+        rules = []
+        seen = set()
+        for item in (data or {}).get("rules", []):
+            rule_type = RULE_TYPES.get(item.get("type"))
+            if rule_type is None:
+                raise ValueError(f"未知的促销规则类型: {item.get('type')}")
+            try:
+                rule = rule_type(item)
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"促销规则 {item.get('id')} 配置无效: {e}")
+            if rule.id in seen:
+                raise ValueError(f"促销规则ID重复: {rule.id}")
+            seen.add(rule.id)
+            rules.append(rule)
+        return cls(rules)
+
+    def candidates(self, beverage: Beverage) -> Tuple[PromotionRule, ...]:
+        """对该饮料适用的规则"""
+        key = (beverage.id, beverage.category)
+        rules = self._candidates.get(key)
+        if rules is None:
+            merged = (self._by_beverage.get(beverage.id, []) + self._by_category.get(beverage.category, []) +
+                      self._global)
+            # 同时按ID和分类命中的规则只保留一次
+            rules = tuple({id(rule): rule for rule in merged}.values())
+            self._candidates[key] = rules
+        return rules
+
+    def time_key(self, beverage: Beverage, at: datetime) -> Tuple[str, ...]:
+        """该饮料当前生效的时段规则，计价结果随时段变化，缓存键需包含此项"""
+        return tuple(rule.id for rule in self.candidates(beverage)
+                     if isinstance(rule, HappyHourRule) and rule.active(at))
+
+    def apply(self, line: OrderLine, at: Optional[datetime] = None) -> OrderLine:
+        """计算订单行的优惠，返回带优惠金额和命中规则的新订单行"""
+        rules = self.candidates(line.beverage)
+        if not rules:
+            return line
+        at = at or datetime.now()
+
+        by_group: Dict[str, List[PromotionRule]] = {}
+        for rule in rules:
+            by_group.setdefault(rule.GROUP, []).append(rule)
+
+        # 优惠合计不超过原价
+        remaining = line.price
+        applied = []
+        for group in GROUP_ORDER:
+            best: Tuple[float, Optional[PromotionRule]] = (0.0, None)
+            for rule in by_group.get(group, ()):
+                amount = rule.discount(line, at, remaining)
+                if amount > best[0]:
+                    best = (amount, rule)
+            amount, rule = best
+            amount = round(min(amount, remaining), 2)
+            if rule is not None and amount > 0:
+                applied.append((rule.id, amount))
+                remaining -= amount
+        if not applied:
+            return line
+        return line._replace(discount=round(sum(amount for _, amount in applied), 2), promotions=tuple(applied))
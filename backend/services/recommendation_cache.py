@@ -0,0 +1,145 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Pattern, Tuple
+from repositories.sqlite_connection import SqliteConnectionPool
+from utils.cache import TTLCache
+from utils.helpers import load_json_config
+
+# 缓存键：(提供商, 模型, 归一化后的喜好, 目录版本)
+RecommendationKey = Tuple[str, str, str, str]
+
+def _strip(text: str) -> str:
+    """全角转半角、转小写，去掉空白、标点和符号"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "PZSC")
+
+def _alternation(words: Iterable[str]) -> Optional[Pattern]:
+    """按长度从长到短匹配的正则（如"不要太甜"先于"甜的"）"""
+    words = sorted(set(words), key=len, reverse=True)
+    return re.compile("|".join(re.escape(word) for word in words)) if words else None
+
+class PreferenceNormalizer:
+    """用户喜好归一化：写法不同但含义相同的喜好得到相同的文本，用于推荐缓存的键
+
+    同义写法替换为标准词，去掉"我想喝"、语气词等填充词；只剩标准词时结果为排序去重后的标准词，
+    与书写顺序和重复无关（"冰的，不要太甜" 与 "少糖 冰" 相同）。
+    """
+
+    def __init__(self, synonyms: Optional[Mapping[str, Iterable[str]]] = None,
+                 fillers: Iterable[str] = ()):
+        self.replacements: Dict[str, str] = {}
+        for canonical, variants in (synonyms or {}).items():
+            canonical = _strip(canonical)
+            for variant in (canonical, *variants):
+                variant = _strip(variant)
+                if variant:
+                    self.replacements[variant] = canonical
+        self.pattern = _alternation(self.replacements)
+        self.fillers = _alternation(filter(None, map(_strip, fillers)))
+
+    @classmethod
+    def load(cls) -> 'PreferenceNormalizer':
+        """从preference_synonyms.json加载同义词和填充词"""
+        config = load_json_config("preference_synonyms.json")
+        return cls(config.get("synonyms"), config.get("fillers", ()))
+
+    def _drop_fillers(self, text: str) -> str:
+        return self.fillers.sub("", text) if self.fillers is not None else text
+
+    def normalize(self, text: str) -> str:
+        text = _strip(text)
+        if self.pattern is None:
+            return self._drop_fillers(text)
+        tokens: List[str] = []
+        parts: List[str] = []
+        pos = 0
+        for match in self.pattern.finditer(text):
+            parts.append(self._drop_fillers(text[pos:match.start()]))
+            tokens.append(self.replacements[match.group(0)])
+            parts.append(tokens[-1])
+            pos = match.end()
+        parts.append(self._drop_fillers(text[pos:]))
+        if len("".join(parts)) == len("".join(tokens)):
+            # 只由标准词组成
+            return " ".join(sorted(set(tokens)))
+        return "".join(parts)
+
+class RecommendationCache:
+    """AI推荐结果缓存
+
+    内存层为LRU+TTL缓存，直接保存解析后的推荐，命中时不发请求也不解析JSON；
+    可选的SQLite磁盘层在重启后和多个worker之间保留结果，命中后回填内存层。
+    缓存的推荐由多个请求共享，调用方不应修改。
+    """
+
+    _SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS recommendation_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_recommendation_cache_expires_at ON recommendation_cache (expires_at)",
+    )
+    # 每写入多少条清理一次磁盘层的过期条目
+    PRUNE_INTERVAL = 256
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600, db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+        self.disk = SqliteConnectionPool(db_path, schema=self._SCHEMA) if db_path else None
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _disk_key(key: RecommendationKey) -> str:
+        return hashlib.sha256("\x1f".join(key).encode("utf-8")).hexdigest()
+
+    def get(self, key: RecommendationKey) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            row = self.disk.get().execute(
+                "SELECT value, expires_at FROM recommendation_cache WHERE key = ? AND expires_at > ?",
+                (self._disk_key(key), time.time())
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self.memory.set(key, value, ttl=row[1] - time.time())
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: RecommendationKey, value: Dict[str, Any]):
+        self.memory.set(key, value)
+        if self.disk is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_INTERVAL == 0
+        conn = self.disk.get()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO recommendation_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (self._disk_key(key), json.dumps(value, ensure_ascii=False), now + self.ttl)
+            )
+            if prune:
+                conn.execute("DELETE FROM recommendation_cache WHERE expires_at <= ?", (now,))
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            conn = self.disk.get()
+            with conn:
+                conn.execute("DELETE FROM recommendation_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self.memory), "hits": self.hits, "misses": self.misses}
@@ -1,15 +1,48 @@
 import os
 import json
-from typing import Dict, Any
+import base64
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+def get_config_path(filename: str) -> str:
+    """获取配置文件路径"""
+    return os.path.join(os.path.dirname(__file__), '..', 'config', filename)
 
 def load_json_config(filename: str) -> Dict[str, Any]:
     """加载JSON配置文件"""
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', filename)
-    with open(config_path, 'r', encoding='utf-8') as f:
+    with open(get_config_path(filename), 'r', encoding='utf-8') as f:
         return json.load(f)
 
 def safe_get_request_data(request) -> Dict[str, Any]:
     """安全获取请求数据"""
     if request.is_json:
         return request.json
-    return {} 
\ No newline at end of file
+    return {}
+
+def encode_cursor(values: List[Any]) -> str:
+    """将分页位置编码为不透明游标"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """解码分页游标，格式无效时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, list):
+        raise ValueError("无效的分页游标")
+    return values
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """解析ISO 8601时间参数，格式无效时抛出ValueError
+
+    带时区的时间转换为本地时间并去掉时区，与订单创建时间的表示一致。
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
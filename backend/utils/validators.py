@@ -0,0 +1,87 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Tuple
+
+class ValidationError(ValueError):
+    """请求数据校验失败，details为逐字段的错误"""
+
+    def __init__(self, details: List[Dict[str, str]]):
+        super().__init__(details[0]["message"] if details else "请求数据无效")
+        self.details = details
+
+class OrderRequest(NamedTuple):
+    """校验后的下单请求，配料已合并重复ID并按ID排序"""
+    beverage: str
+    condiments: Tuple[Tuple[str, int], ...]
+
+    def condiment_list(self) -> List[Dict[str, Any]]:
+        return [{"id": condiment_id, "quantity": quantity} for condiment_id, quantity in self.condiments]
+
+class OrderSchema:
+    """下单请求结构，由目录中的ID集合预先构建，校验时只做集合查找和整数比较"""
+
+    # 单次请求中配料条目数上限（合并前），限制畸形请求的处理开销
+    MAX_ENTRIES = 50
+    # 最多返回的错误条数
+    MAX_ERRORS = 10
+
+    def __init__(self, beverage_ids: Iterable[str], condiment_ids: Iterable[str],
+                 max_quantity: int = 10, max_condiments: int = 10):
+        self.beverage_ids: FrozenSet[str] = frozenset(beverage_ids)
+        self.condiment_ids: FrozenSet[str] = frozenset(condiment_ids)
+        # 每种配料的份数上限（合并后）和不同配料的种数上限
+        self.max_quantity = max_quantity
+        self.max_condiments = max_condiments
+
+    def validate(self, data: Any) -> OrderRequest:
+        """校验下单请求，失败时抛出ValidationError"""
+        if not isinstance(data, dict):
+            raise ValidationError([{"field": "", "message": "无效的请求数据"}])
+
+        errors: List[Dict[str, str]] = []
+        beverage = data.get("beverage")
+        if not beverage:
+            errors.append({"field": "beverage", "message": "未指定饮料"})
+        elif not isinstance(beverage, str) or beverage not in self.beverage_ids:
+            errors.append({"field": "beverage", "message": "饮料不存在"})
+
+        condiments = data.get("condiments")
+        if condiments is None:
+            condiments = []
+        if not isinstance(condiments, list):
+            errors.append({"field": "condiments", "message": "condiments 必须是列表"})
+            raise ValidationError(errors)
+        if len(condiments) > self.MAX_ENTRIES:
+            errors.append({"field": "condiments", "message": f"配料条目不能超过 {self.MAX_ENTRIES} 个"})
+            raise ValidationError(errors)
+
+        merged: Dict[str, int] = {}
+        for index, item in enumerate(condiments):
+            if len(errors) >= self.MAX_ERRORS:
+                break
+            field = f"condiments[{index}]"
+            if not isinstance(item, dict):
+                errors.append({"field": field, "message": "配料必须是对象"})
+                continue
+            condiment_id = item.get("id")
+            if not isinstance(condiment_id, str) or condiment_id not in self.condiment_ids:
+                errors.append({"field": f"{field}.id", "message": f"配料 {condiment_id} 不存在"})
+                continue
+            quantity = item.get("quantity", 1)
+            # bool是int的子类，需单独排除
+            if isinstance(quantity, bool) or not isinstance(quantity, int):
+                errors.append({"field": f"{field}.quantity", "message": "份数必须是整数"})
+                continue
+            if quantity < 1:
+                errors.append({"field": f"{field}.quantity", "message": "份数必须大于0"})
+                continue
+            merged[condiment_id] = merged.get(condiment_id, 0) + quantity
+
+        for condiment_id, quantity in merged.items():
+            if quantity > self.max_quantity:
+                errors.append({"field": "condiments",
+                               "message": f"配料 {condiment_id} 最多 {self.max_quantity} 份"})
+        if len(merged) > self.max_condiments:
+            errors.append({"field": "condiments", "message": f"最多选择 {self.max_condiments} 种配料"})
+
+        if errors:
+            raise ValidationError(errors[:self.MAX_ERRORS])
+        return OrderRequest(beverage, tuple(sorted(merged.items())))
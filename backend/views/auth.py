@@ -0,0 +1,22 @@
+import functools
+import hmac
+import os
+from typing import Callable
+from flask import request
+from views.response import ApiResponse
+
+def require_admin_token(func: Callable) -> Callable:
+    """管理接口装饰器：校验X-Admin-Token请求头
+
+    未配置ADMIN_TOKEN时管理接口一律返回403，令牌不匹配时返回401。
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        admin_token = os.environ.get("ADMIN_TOKEN")
+        if not admin_token:
+            return ApiResponse.forbidden("未配置管理令牌，管理接口已停用"), 403
+        provided = request.headers.get("X-Admin-Token", "")
+        if not hmac.compare_digest(provided.encode("utf-8"), admin_token.encode("utf-8")):
+            return ApiResponse.unauthorized("管理令牌无效"), 401
+        return func(*args, **kwargs)
+    return wrapper
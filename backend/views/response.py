@@ -1,4 +1,8 @@
-from typing import Dict, Any, Optional, Union
+import gzip
+import hashlib
+import json
+from typing import Dict, Any, Iterable, Optional, Tuple, Union
+from flask import Response
 
 class ApiResponse:
     """API响应类"""
@@ -23,6 +27,13 @@ class ApiResponse:
             "code": code
         }
 
+    @staticmethod
+    def validation_error(message: str, details: list) -> Dict[str, Any]:
+        """请求校验失败响应，details为逐字段的错误"""
+        response = ApiResponse.error(message, 400)
+        response["details"] = details
+        return response
+
     @staticmethod
     def not_found(message: str = "Resource not found") -> Dict:
         """404响应"""
@@ -41,4 +52,70 @@ class ApiResponse:
     @staticmethod
     def forbidden(message: str = "Forbidden") -> Dict:
         """403响应"""
-        return ApiResponse.error(message, 403) 
\ No newline at end of file
+        return ApiResponse.error(message, 403)
+
+class CachedJsonBody:
+    """预编码的JSON响应体，附带gzip版本和强ETag"""
+    
+    # 小于该字节数的响应体不做压缩
+    GZIP_MIN_SIZE = 512
+    
+    def __init__(self, payload: Dict[str, Any]):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.gzip_body = None
+        if len(self.body) >= self.GZIP_MIN_SIZE:
+            self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+    
+    def make_response(self, request) -> Response:
+        """根据If-None-Match和Accept-Encoding生成响应，命中ETag时返回304"""
+        use_gzip = self.gzip_body is not None and request.accept_encodings["gzip"] > 0
+        etag = f"{self.etag}-gzip" if use_gzip else self.etag
+        
+        if_none_match = request.if_none_match
+        if if_none_match.contains_weak(self.etag) or if_none_match.contains_weak(f"{self.etag}-gzip"):
+            response = Response(status=304)
+        else:
+            response = Response(self.gzip_body if use_gzip else self.body,
+                                content_type="application/json; charset=utf-8")
+            if use_gzip:
+                response.headers["Content-Encoding"] = "gzip"
+        
+        response.set_etag(etag)
+        response.headers["Vary"] = "Accept-Encoding"
+        # 客户端每次都需重新校验，配置变更后可立即生效
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+class EventStream:
+    """SSE（text/event-stream）响应格式"""
+    
+    CONTENT_TYPE = "text/event-stream; charset=utf-8"
+    # 禁止缓存和反向代理缓冲，事件产生后立即送达客户端
+    HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    
+    # 保持连接的注释行，客户端会忽略
+    KEEP_ALIVE = b": keep-alive\n\n"
+    
+    @staticmethod
+    def encode(event: str, data: Any, event_id: Optional[str] = None) -> bytes:
+        """编码一个事件，data为str时视为已编码的JSON"""
+        if not isinstance(data, str):
+            data = json.dumps(data, ensure_ascii=False)
+        prefix = f"id: {event_id}\n" if event_id is not None else ""
+        return f"{prefix}event: {event}\ndata: {data}\n\n".encode("utf-8")
+    
+    @staticmethod
+    def retry(milliseconds: int) -> bytes:
+        """设置客户端断线后的重连间隔"""
+        return f"retry: {milliseconds}\n\n".encode("utf-8")
+    
+    @classmethod
+    def stream(cls, chunks: Iterable[bytes]) -> Response:
+        """将已编码的事件序列包装为流式响应"""
+        return Response(chunks, content_type=cls.CONTENT_TYPE, headers=cls.HEADERS)
+    
+    @classmethod
+    def make_response(cls, events: Iterable[Tuple[str, Any]]) -> Response:
+        """将(事件名, 数据)序列包装为流式响应"""
+        return cls.stream(cls.encode(event, data) for event, data in events)
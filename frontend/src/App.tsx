@@ -22,6 +22,7 @@ import {
   fetchOrderHistory
 } from './services/api';
 import { Beverage, Condiment, Order } from './types';
+import { MAX_CONDIMENT_QUANTITY } from './types/constants';
 import VendingMachineContainer from './components/VendingMachineContainer';
 import './App.css';
 import { ControlPanel } from './components/ControlPanel';
@@ -47,6 +48,8 @@ const App: React.FC = () => {
   const [selectedCondiments, setSelectedCondiments] = useState<CondimentQuantity[]>([]);
   const [order, setOrder] = useState<Order | null>(null);
   const [orderHistory, setOrderHistory] = useState<Order[]>([]);
+  const [historyCursor, setHistoryCursor] = useState<string | null>(null);
+  const [isLoadingMoreHistory, setIsLoadingMoreHistory] = useState(false);
   const [loading, setLoading] = useState<boolean>(false);
   const [activeTab, setActiveTab] = useState<string>("vending");
   const [dispensedBeverage, setDispensedBeverage] = useState<Beverage | null>(null);
@@ -88,17 +91,40 @@ const App: React.FC = () => {
     fetchData();
   }, []);
 
-  // 获取历史订单
+  // 获取历史订单（第一页）
   const fetchHistoryData = useCallback(async () => {
     try {
       const response = await fetchOrderHistory();
       if (response.success && response.data) {
         setOrderHistory(response.data.history);
+        setHistoryCursor(response.data.next_cursor);
       }
     } catch (error) {
       console.error('获取历史订单失败:', error);
     }
   }, []);
+
+  // 加载下一页历史订单
+  const loadMoreHistory = useCallback(async () => {
+    if (!historyCursor) return;
+    setIsLoadingMoreHistory(true);
+    try {
+      const response = await fetchOrderHistory(historyCursor);
+      if (response.success && response.data) {
+        const { history, next_cursor } = response.data;
+        setOrderHistory(prev => {
+          // 翻页期间新下的订单可能使页面边界移动，按ID去重
+          const seen = new Set(prev.map(order => order.id));
+          return [...prev, ...history.filter(order => !seen.has(order.id))];
+        });
+        setHistoryCursor(next_cursor);
+      }
+    } catch (error) {
+      console.error('获取历史订单失败:', error);
+    } finally {
+      setIsLoadingMoreHistory(false);
+    }
+  }, [historyCursor]);
   
   useEffect(() => {
     fetchHistoryData();
@@ -177,7 +203,9 @@ const App: React.FC = () => {
     }
   };
 
-  const handleCondimentQuantityChange = (condimentId: string, quantity: number) => {
+  const handleCondimentQuantityChange = (condimentId: string, requested: number) => {
+    // 与后端校验一致，超出上限的份数按上限处理
+    const quantity = Math.min(requested, MAX_CONDIMENT_QUANTITY);
     setSelectedCondiments(prev => {
       const existing = prev.find(c => c.id === condimentId);
       if (quantity > 0) {
@@ -387,6 +415,9 @@ const App: React.FC = () => {
                 orders={orderHistory} 
                 beverages={beverages} 
                 condiments={condiments} 
+                hasMore={historyCursor !== null}
+                isLoadingMore={isLoadingMoreHistory}
+                onLoadMore={loadMoreHistory}
               />
             </div>
           </Tab>
@@ -3,7 +3,7 @@ import { Card, CardHeader, CardBody, CardFooter, Input, Button, ScrollShadow, Dr
 import Draggable from 'react-draggable';
 import { ResizableBox, ResizeCallbackData } from 'react-resizable';
 import { SendIcon } from './SendIcon';
-import { sendChatMessage, fetchAvailableModels, fetchAiRecommendation } from '../services/api';
+import { sendChatMessage, streamChatMessage, fetchAvailableModels, fetchAiRecommendation } from '../services/api';
 import { ModelInfo } from '../types';
 import { AUTO_SELECT_TEMPLATE } from '../types/constants';
 import ReactMarkdown from 'react-markdown';
@@ -81,6 +81,8 @@ export const ChatBot: React.FC = () => {
   const [selectedProvider, setSelectedProvider] = useState<string>('');
   const [selectedModel, setSelectedModel] = useState<string>('');
   const [isLoading, setIsLoading] = useState(false);
+  // 流式回复已开始输出时不再显示"思考中"
+  const [isStreaming, setIsStreaming] = useState(false);
   const [size, setSize] = useState(() => {
     // 从本地存储中获取窗口大小设置
     const savedSize = localStorage.getItem('chatbot-size');
@@ -199,6 +201,27 @@ export const ChatBot: React.FC = () => {
     try {
       if (currentInput.toLowerCase().includes('推荐') || currentInput.toLowerCase().includes('recommend')) {
         await handleRecommendation(currentInput);
+      } else if (useAI) {
+        // AI聊天：流式显示回复，结束时以服务端的完整回复为准
+        const replyTime = Date.now();
+        const isReply = (msg: Message) => msg.sender === 'bot' && msg.timestamp === replyTime;
+        let started = false;
+        const result = await streamChatMessage(currentInput, selectedProvider, selectedModel, (text) => {
+          if (!started) {
+            started = true;
+            setIsStreaming(true);
+            setMessages(prev => [...prev, { text, sender: 'bot', timestamp: replyTime }]);
+          } else {
+            setMessages(prev => prev.map(msg => isReply(msg) ? { ...msg, text: msg.text + text } : msg));
+          }
+        });
+        const botMessage: Message = {
+          text: result.content || '抱歉，我无法处理您的请求。',
+          sender: 'bot',
+          modelInfo: result.model_info,
+          timestamp: replyTime
+        };
+        setMessages(prev => started ? prev.map(msg => isReply(msg) ? botMessage : msg) : [...prev, botMessage]);
       } else {
         // 正常的聊天消息
         const response = await sendChatMessage(
@@ -225,6 +248,7 @@ export const ChatBot: React.FC = () => {
       setMessages(prev => [...prev, errorMessage]);
     } finally {
       setIsLoading(false);
+      setIsStreaming(false);
     }
   };
 
@@ -822,7 +846,7 @@ export const ChatBot: React.FC = () => {
                     {msg.code && renderCodeAccordion(msg.code)}
                   </div>
                 ))}
-                {isLoading && (
+                {isLoading && !isStreaming && (
                   <div className="py-2 px-3 rounded-2xl bg-zinc-700 self-start rounded-bl-none max-w-[85%] w-fit">
                     <div className="flex space-x-2 items-center">
                       <div className="w-2 h-2 bg-gray-300 rounded-full animate-pulse"></div>
@@ -1,6 +1,7 @@
 import React, { useRef, useEffect } from 'react';
 import { Card, CardHeader, CardBody, CardFooter, Button, Image, Chip } from '@nextui-org/react';
 import { Condiment } from '../types';
+import { MAX_CONDIMENT_QUANTITY } from '../types/constants';
 import gsap from 'gsap';
 
 export interface CondimentCardProps {
@@ -182,6 +183,9 @@ export const CondimentCard: React.FC<CondimentCardProps> = ({
   
   // 按钮点击动画
   const handlePlusClick = () => {
+    if (quantity >= MAX_CONDIMENT_QUANTITY) {
+      return;
+    }
     if (buttonPlusRef.current) {
       gsap.timeline()
         .to(buttonPlusRef.current, {
@@ -313,6 +317,7 @@ export const CondimentCard: React.FC<CondimentCardProps> = ({
             variant="flat"
             className="bg-secondary/50 text-white"
             onPress={handlePlusClick}
+            isDisabled={quantity >= MAX_CONDIMENT_QUANTITY}
             ref={buttonPlusRef}
             data-action="increase"
           >
@@ -5,7 +5,8 @@ import {
   CardBody,
   Divider,
   Image,
-  Chip
+  Chip,
+  Button
 } from '@nextui-org/react';
 import { Order, Beverage, Condiment, OrderItem } from '../types';
 
@@ -13,6 +14,9 @@ interface OrderHistoryProps {
   orders: Order[];
   beverages: Record<string, Beverage>;
   condiments: Record<string, Condiment>;
+  hasMore?: boolean;
+  isLoadingMore?: boolean;
+  onLoadMore?: () => void;
 }
 
 const statusColorMap = {
@@ -29,7 +33,14 @@ const statusTextMap = {
   cancelled: '已取消'
 } as const;
 
-export const OrderHistory: React.FC<OrderHistoryProps> = ({ orders, beverages, condiments }) => {
+export const OrderHistory: React.FC<OrderHistoryProps> = ({
+  orders,
+  beverages,
+  condiments,
+  hasMore = false,
+  isLoadingMore = false,
+  onLoadMore
+}) => {
   if (!orders || orders.length === 0) {
     return (
       <Card className="bg-gradient-to-br from-zinc-800 to-zinc-900 text-white shadow-lg">
@@ -118,6 +129,13 @@ export const OrderHistory: React.FC<OrderHistoryProps> = ({ orders, beverages, c
           </Card>
         );
       })}
+      {hasMore && onLoadMore && (
+        <div className="flex justify-center">
+          <Button color="warning" variant="bordered" isLoading={isLoadingMore} onPress={onLoadMore}>
+            加载更多
+          </Button>
+        </div>
+      )}
     </div>
   );
 }; 
\ No newline at end of file
@@ -1,6 +1,7 @@
 import React from 'react';
 import { Card, CardHeader, CardBody, CardFooter, Button, Divider, Chip, Modal, ModalContent, ModalHeader, ModalBody, ModalFooter } from '@nextui-org/react';
-import { Order, Beverage, Condiment } from '../types';
+import { Order, Beverage, Condiment, Quote } from '../types';
+import { fetchQuote } from '../services/api';
 
 interface CondimentQuantity {
   id: string;
@@ -39,9 +40,22 @@ export const OrderSummary: React.FC<OrderSummaryProps> = ({
   const [isPaymentModalOpen, setPaymentModalOpen] = React.useState(false);
   const [isPaymentProcessing, setPaymentProcessing] = React.useState(false);
   const [paymentComplete, setPaymentComplete] = React.useState(false);
+  const [quote, setQuote] = React.useState<Quote | null>(null);
+  
+  // 选择变化时向后端获取报价（含促销优惠），失败时使用本地计算的原价
+  React.useEffect(() => {
+    setQuote(null);
+    if (!selectedBeverage) return;
+    let cancelled = false;
+    fetchQuote(selectedBeverage, selectedCondiments)
+      .then(result => { if (!cancelled) setQuote(result); })
+      .catch(error => console.error('获取报价失败:', error));
+    return () => { cancelled = true; };
+  }, [selectedBeverage, selectedCondiments]);
   
   // 计算总价
   const calculateTotalPrice = () => {
+    if (quote) return quote.total;
     if (!selectedBeverage || !beverages[selectedBeverage]) return 0;
     
     let total = beverages[selectedBeverage].price;
@@ -57,6 +71,7 @@ export const OrderSummary: React.FC<OrderSummaryProps> = ({
   
   // 计算总热量
   const calculateTotalCalories = () => {
+    if (quote) return quote.calories;
     if (!selectedBeverage || !beverages[selectedBeverage]) return 0;
     
     let total = beverages[selectedBeverage].calories;
@@ -187,6 +202,13 @@ export const OrderSummary: React.FC<OrderSummaryProps> = ({
                 
                 <Divider className="my-3 bg-gray-700" />
                 
+                {quote && quote.discount > 0 && (
+                  <div className="flex justify-between items-center mb-2 text-small">
+                    <span className="text-gray-300">促销优惠</span>
+                    <span className="text-success">-¥{quote.discount.toFixed(2)}</span>
+                  </div>
+                )}
+                
                 <div className="flex justify-between items-center">
                   <div>
                     <p className="font-medium text-white">总价</p>
@@ -297,6 +319,12 @@ export const OrderSummary: React.FC<OrderSummaryProps> = ({
                           </span>
                         </div>
                       ))}
+                      {quote && quote.discount > 0 && (
+                        <div className="flex justify-between mb-2">
+                          <span className="text-gray-300">促销优惠</span>
+                          <span className="text-success">-¥{quote.discount.toFixed(2)}</span>
+                        </div>
+                      )}
                       <Divider className="my-2 bg-gray-700" />
                       <div className="flex justify-between font-medium">
                         <span className="text-gray-300">总计</span>
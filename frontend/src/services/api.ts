@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Beverage, Condiment, Order, Recommendation, ChatMessage, ApiResponse, AiRecommendationResult, ModelInfo } from '../types';
+import { Beverage, Condiment, Order, Quote, Recommendation, ChatMessage, ApiResponse, AiRecommendationResult, ModelInfo } from '../types';
 import { API_BASE_URL } from '../types/constants';
 
 const api = axios.create({
@@ -9,6 +9,15 @@ const api = axios.create({
   },
 });
 
+// 4xx/5xx响应体仍是ApiResponse格式，抛出服务端给出的错误信息
+api.interceptors.response.use(
+  (response) => response,
+  (error) => {
+    const message = error.response?.data?.error;
+    return Promise.reject(message ? new Error(message) : error);
+  }
+);
+
 // 获取所有饮料
 export const fetchBeverages = async (): Promise<Record<string, Beverage>> => {
   const response = await api.get<ApiResponse<Record<string, Beverage>>>('/beverages');
@@ -27,6 +36,21 @@ export const fetchCondiments = async (): Promise<Record<string, Condiment>> => {
   return response.data.data || {};
 };
 
+// 获取报价（含促销优惠）
+export const fetchQuote = async (
+  beverageId: string,
+  condiments: { id: string; quantity: number; }[]
+): Promise<Quote> => {
+  const response = await api.post<ApiResponse<Quote>>('/quote', {
+    beverage: beverageId,
+    condiments,
+  });
+  if (!response.data.success || !response.data.data) {
+    throw new Error(response.data.error || '获取报价失败');
+  }
+  return response.data.data;
+};
+
 // 提交订单
 export const placeOrder = async (
   beverageId: string,
@@ -42,9 +66,13 @@ export const placeOrder = async (
   return response.data;
 };
 
-// 获取历史订单
-export const fetchOrderHistory = async (): Promise<ApiResponse<{ history: Order[] }>> => {
-  const response = await api.get<ApiResponse<{ history: Order[] }>>('/orders/history');
+// 获取历史订单（按创建时间倒序分页，cursor为上一页返回的next_cursor）
+export const fetchOrderHistory = async (
+  cursor?: string | null
+): Promise<ApiResponse<{ history: Order[]; next_cursor: string | null }>> => {
+  const response = await api.get<ApiResponse<{ history: Order[]; next_cursor: string | null }>>('/orders/history', {
+    params: cursor ? { cursor } : undefined
+  });
   if (!response.data.success) {
     throw new Error(response.data.error || '获取历史订单失败');
   }
@@ -102,4 +130,59 @@ export const sendChatMessage = async (
     throw new Error(response.data.error || '发送消息失败');
   }
   return response.data;
-}; 
\ No newline at end of file
+};
+
+// 流式发送AI聊天消息（SSE），每收到一段文本调用onDelta，返回done事件中的完整回复
+export const streamChatMessage = async (
+  message: string,
+  provider: string | undefined,
+  model: string | undefined,
+  onDelta: (text: string) => void
+): Promise<{ content: string; model_info?: ModelInfo }> => {
+  const response = await fetch(`${API_BASE_URL}/chat?stream=1`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ message, use_ai: true, provider, model }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error('发送消息失败');
+  }
+  // 请求无效时服务端返回普通JSON
+  if (!response.headers.get('Content-Type')?.includes('text/event-stream')) {
+    const data: ApiResponse<{ content: string; model_info?: ModelInfo }> = await response.json();
+    if (!data.success || !data.data) {
+      throw new Error(data.error || '发送消息失败');
+    }
+    return data.data;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result: { content: string; model_info?: ModelInfo } | null = null;
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    // 事件之间以空行分隔
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary >= 0) {
+      const lines = buffer.slice(0, boundary).split('\n');
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+      const event = lines.find(line => line.startsWith('event:'))?.slice(6).trim();
+      const data = lines.find(line => line.startsWith('data:'))?.slice(5).trim();
+      if (!data) continue;
+      const payload = JSON.parse(data);
+      if (event === 'delta') {
+        onDelta(payload.content);
+      } else if (event === 'done') {
+        result = payload;
+      }
+    }
+  }
+  if (!result) {
+    throw new Error('回复不完整');
+  }
+  return result;
+};
@@ -3,6 +3,9 @@
 // API基础URL
 export const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:5000/api';
 
+// 每种配料的份数上限，与后端 ORDER_MAX_CONDIMENT_QUANTITY 保持一致
+export const MAX_CONDIMENT_QUANTITY = Number(process.env.REACT_APP_MAX_CONDIMENT_QUANTITY) || 10;
+
 // 自动选择饮品和配料的代码模板
 export const AUTO_SELECT_TEMPLATE = `// 自动选择饮品和配料
 // 可以根据需要修改以下变量
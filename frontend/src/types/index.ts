@@ -42,6 +42,18 @@ export interface Order {
   updatedAt: string;
 }
 
+// 报价类型
+export interface Quote {
+  beverage: string;
+  condiments: { id: string; quantity: number; }[];
+  subtotal: number;
+  discount: number;
+  total: number;
+  calories: number;
+  promotions: { id: string; amount: number; }[];
+  catalog_version: string;
+}
+
 // 推荐类型
 export interface Recommendation {
   beverage: string;